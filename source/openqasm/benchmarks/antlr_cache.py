@@ -0,0 +1,66 @@
+"""Compare the time a fresh process takes to parse a program with and without the ANTLR cache.
+
+Each measurement is made in a fresh subprocess, because the cache is only loaded when
+:mod:`openqasm3` is first imported.  Run as ``python benchmarks/antlr_cache.py`` from the root of the
+Python package.
+"""
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+EXAMPLES = pathlib.Path(__file__).resolve().parents[3] / "examples"
+
+
+def measure() -> float:
+    """Get the time in seconds taken to import :mod:`openqasm3` and parse all the examples."""
+    start = time.perf_counter()
+    import openqasm3  # pylint: disable=import-outside-toplevel
+
+    for path in sorted(EXAMPLES.glob("*.qasm")):
+        openqasm3.parse(path.read_text())
+    return time.perf_counter() - start
+
+
+def _run(cache: str) -> float:
+    env = {**os.environ, "OPENQASM3_ANTLR_CACHE": cache}
+    output = subprocess.run(
+        [sys.executable, __file__, "--measure"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--repeats", type=int, default=5, help="number of processes to time")
+    arg_parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.measure:
+        print(measure())
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The first run fills the cache for all the later ones.
+        _run(directory)
+        results = {
+            "cold": min(_run("0") for _ in range(args.repeats)),
+            "cached": min(_run(directory) for _ in range(args.repeats)),
+        }
+
+    print(f"{'start':10} {'seconds':>10}")
+    for name, seconds in results.items():
+        print(f"{name:10} {seconds:>10.3f}")
+    print(f"speed-up: {results['cold'] / results['cached']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
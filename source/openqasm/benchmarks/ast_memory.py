@@ -0,0 +1,58 @@
+"""Compare the memory used by parsed ASTs in the default and slotted builds of :mod:`openqasm3.ast`.
+
+The build is chosen when :mod:`openqasm3` is first imported, so each measurement is made in a fresh
+subprocess.  Run as ``python benchmarks/ast_memory.py`` from the root of the Python package.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tracemalloc
+
+
+def measure(n_gates: int) -> float:
+    """Get the number of bytes retained per two-qubit :class:`~openqasm3.ast.QuantumGate` statement
+    (including its spans and child nodes) by a parsed program in the current build."""
+    import openqasm3  # pylint: disable=import-outside-toplevel
+
+    source = "".join(f"cx q[{i % 64}], q[{(i + 1) % 64}];\n" for i in range(n_gates))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    program = openqasm3.parse(source, fast_path=True)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(program.statements) == n_gates
+    return (after - before) / n_gates
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=100_000, help="number of gates to parse")
+    arg_parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.measure:
+        print(measure(args.gates))
+        return
+
+    results = {}
+    for name, flag in (("default", "0"), ("slotted", "1")):
+        env = {**os.environ, "OPENQASM3_SLOTTED_AST": flag}
+        output = subprocess.run(
+            [sys.executable, __file__, "--measure", "--gates", str(args.gates)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[name] = float(output)
+
+    print(f"{'build':10} {'bytes per QuantumGate':>22}")
+    for name, size in results.items():
+        print(f"{name:10} {size:>22.0f}")
+    print(f"reduction: {1 - results['slotted'] / results['default']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Time writing parsed programs back out as OpenQASM 3 with :func:`openqasm3.dump` and
+:func:`openqasm3.dumps`, and count the calls made to the ``write`` method of the output stream.
+
+``dumps`` is compared with a printer that visits every node, because it overrides one of the visitor
+methods that the printer's fast path for flat statements depends on.
+
+``dump`` is timed writing to a normal buffered text file, and to a text stream over a raw file with
+``write_through`` set, in which every call to ``write`` is a system call, as it is for a socket.
+
+Run as ``python benchmarks/dump.py`` from the root of the Python package.
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+import openqasm3
+
+from programs import best_time, gate_list_program, structured_program
+
+
+class _CountingStream(io.StringIO):
+    """A text stream that records the number of calls to :meth:`write`."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+class _GenericPrinter(openqasm3.printer.Printer):
+    """A printer with the same output that cannot use the fast path."""
+
+    def visit_Identifier(self, node, context):
+        self.stream.write(node.name)
+
+
+def _dumps_generic(program):
+    out = io.StringIO()
+    _GenericPrinter(out).visit(program)
+    return out.getvalue()
+
+
+def _dump_to_file(program, path, **kwargs):
+    with open(path, "w", encoding="utf-8", **kwargs) as file:
+        openqasm3.dump(program, file)
+
+
+def _dump_write_through(program, path):
+    with io.TextIOWrapper(io.FileIO(path, "w"), encoding="utf-8", write_through=True) as file:
+        openqasm3.dump(program, file)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=50_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=500, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        f"gate list ({args.gates} gates)": gate_list_program(args.gates),
+        f"structured ({args.blocks} blocks)": structured_program(args.blocks),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "out.qasm")
+        print(
+            f"{'workload':28} {'writes':>8} {'generic (s)':>12} {'dumps (s)':>10} {'speedup':>8}"
+            f" {'file (s)':>9} {'write-through (s)':>18}"
+        )
+        for name, source in workloads.items():
+            program = openqasm3.parse(source)
+            counter = _CountingStream()
+            openqasm3.dump(program, counter)
+            assert _dumps_generic(program) == openqasm3.dumps(program)
+            generic_time = best_time(_dumps_generic, program, repeat=args.repeat)
+            dumps_time = best_time(openqasm3.dumps, program, repeat=args.repeat)
+            file_time = best_time(_dump_to_file, program, path, repeat=args.repeat)
+            raw_time = best_time(_dump_write_through, program, path, repeat=args.repeat)
+            print(
+                f"{name:28} {counter.writes:>8} {generic_time:>12.3f} {dumps_time:>10.3f}"
+                f" {generic_time / dumps_time:>7.1f}x {file_time:>9.3f} {raw_time:>18.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
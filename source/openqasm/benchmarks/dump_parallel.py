@@ -0,0 +1,44 @@
+"""Measure how :func:`openqasm3.dumps` scales with the number of worker processes, printing a long
+gate-level program.
+
+Run as ``python benchmarks/dump_parallel.py`` from the root of the Python package.
+"""
+
+import argparse
+import os
+import pickle
+
+import openqasm3
+from openqasm3 import _transfer
+
+from programs import best_time, gate_list_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=500_000, help="size of the gate list")
+    arg_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    program = openqasm3.parse(gate_list_program(args.gates), fast_path=True)
+    counts = sorted({1, 2, 4, 8, 16, args.max_workers} & set(range(1, args.max_workers + 1)))
+
+    print(f"{len(program.statements)} statements, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8}")
+    serial = None
+    for workers in counts:
+        elapsed = best_time(openqasm3.dumps, program, workers=workers, repeat=args.repeat)
+        serial = serial or elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {serial / elapsed:>7.2f}x")
+
+    # Where the workers cannot be forked, the statements are pickled to send them to the workers,
+    # which takes longer than printing them in the calling process.
+    print(f"{'transfer':>8} {'dump (s)':>9}")
+    for name, dumps in (("pickle", pickle.dumps), ("compact", _transfer.dumps)):
+        elapsed = best_time(dumps, program.statements, repeat=args.repeat)
+        print(f"{name:>8} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
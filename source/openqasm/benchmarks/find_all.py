@@ -0,0 +1,74 @@
+"""Compare answering repeated queries for all the nodes of a type in a program with a
+:class:`~openqasm3.visitor.QASMVisitor` walk per query, and with :meth:`openqasm3.ast.Program.find_all`,
+which builds a :class:`~openqasm3.visitor.NodeIndex` once.
+
+Run as ``python benchmarks/find_all.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+from openqasm3 import ast
+from openqasm3.visitor import QASMVisitor
+
+from programs import best_time, gate_list_program, structured_program
+
+QUERIES = (
+    ast.QuantumGate,
+    ast.QuantumMeasurementStatement,
+    ast.DelayInstruction,
+    ast.BranchingStatement,
+    ast.Statement,
+)
+
+
+class _FindAll(QASMVisitor):
+    def __init__(self, node_type):
+        self.node_type = node_type
+        self.found = []
+
+    def generic_visit(self, node, context=None):
+        if isinstance(node, self.node_type):
+            self.found.append(node)
+        super().generic_visit(node, context)
+
+
+def _visitor_queries(program, rounds):
+    for _ in range(rounds):
+        for node_type in QUERIES:
+            finder = _FindAll(node_type)
+            finder.visit(program)
+
+
+def _index_queries(program, rounds):
+    program.index(refresh=True)
+    for _ in range(rounds):
+        for node_type in QUERIES:
+            program.find_all(node_type)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=50_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=500, help="size of the structured one")
+    arg_parser.add_argument("--rounds", type=int, default=6, help="times to make each query")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        f"gate list ({args.gates} gates)": gate_list_program(args.gates),
+        f"structured ({args.blocks} blocks)": structured_program(args.blocks),
+    }
+    queries = args.rounds * len(QUERIES)
+    print(f"{queries} queries of {len(QUERIES)} node types")
+    print(f"{'workload':28} {'visitor (s)':>12} {'build (s)':>10} {'index (s)':>10} {'speedup':>8}")
+    for name, source in workloads.items():
+        program = openqasm3.parse(source, fast_path=True)
+        visitor = best_time(_visitor_queries, program, args.rounds, repeat=args.repeat)
+        build = best_time(program.index, refresh=True, repeat=args.repeat)
+        index = best_time(_index_queries, program, args.rounds, repeat=args.repeat)
+        print(f"{name:28} {visitor:>12.3f} {build:>10.3f} {index:>10.3f} {visitor / index:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
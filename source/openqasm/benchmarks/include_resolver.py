@@ -0,0 +1,43 @@
+"""Time inlining ``stdgates.inc`` into many small programs with one shared
+:class:`openqasm3.parser.IncludeResolver`, against parsing the included file afresh for each one.
+
+Run as ``python benchmarks/include_resolver.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+from openqasm3.parser import IncludeResolver
+
+from programs import EXAMPLES_DIR, best_time, gate_list_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--programs", type=int, default=200, help="number of programs")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    program = openqasm3.parse(gate_list_program(10), fast_path=True)
+    programs = [program] * args.programs
+
+    def shared():
+        resolver = IncludeResolver([EXAMPLES_DIR])
+        for item in programs:
+            resolver.inline(item)
+
+    def separate():
+        for item in programs:
+            IncludeResolver([EXAMPLES_DIR]).inline(item)
+
+    shared_time = best_time(shared, repeat=args.repeat)
+    separate_time = best_time(separate, repeat=args.repeat)
+    print(f"{'programs':>8} {'shared (s)':>11} {'separate (s)':>13} {'speedup':>8}")
+    print(
+        f"{args.programs:>8} {shared_time:>11.3f} {separate_time:>13.3f}"
+        f" {separate_time / shared_time:>7.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
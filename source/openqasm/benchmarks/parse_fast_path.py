@@ -0,0 +1,43 @@
+"""Compare the parse time of :func:`openqasm3.parse` with and without the gate-list fast path.
+
+Run as ``python benchmarks/parse_fast_path.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+
+from programs import best_time, example_sources, gate_list_program, structured_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=20_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=50, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        "examples/*.qasm": list(example_sources().values()),
+        f"gate list ({args.gates} gates)": [gate_list_program(args.gates)],
+        f"structured ({args.blocks} blocks)": [structured_program(args.blocks)],
+    }
+
+    def parse_all(sources, fast_path):
+        for source in sources:
+            openqasm3.parse(source, fast_path=fast_path)
+
+    # Warm the ANTLR DFA cache, which both paths share.
+    for sources in workloads.values():
+        parse_all(sources, False)
+
+    print(f"{'workload':32} {'chars':>10} {'antlr (s)':>10} {'fast path (s)':>14} {'speedup':>8}")
+    for name, sources in workloads.items():
+        size = sum(len(source) for source in sources)
+        antlr = best_time(parse_all, sources, False, repeat=args.repeat)
+        fast = best_time(parse_all, sources, True, repeat=args.repeat)
+        print(f"{name:32} {size:>10} {antlr:>10.3f} {fast:>14.3f} {antlr / fast:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Measure how :func:`openqasm3.parse_many` scales with the number of worker processes, parsing the
+``examples/`` corpus.
+
+Run as ``python benchmarks/parse_many.py`` from the root of the Python package.
+"""
+
+import argparse
+import os
+import pickle
+
+import openqasm3
+from openqasm3 import _transfer
+
+from programs import EXAMPLES_DIR, best_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--copies", type=int, default=20, help="times to include each example")
+    arg_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    paths = sorted(EXAMPLES_DIR.glob("*.qasm")) * args.copies
+    counts = sorted({1, 2, 4, 8, 16, args.max_workers} & set(range(1, args.max_workers + 1)))
+
+    # Warm the DFA in this process, so that workers started by forking it begin warm too.
+    programs = openqasm3.parse_many(paths, workers=1)
+
+    print(f"{len(paths)} files, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8}")
+    serial = None
+    for workers in counts:
+        elapsed = best_time(openqasm3.parse_many, paths, workers=workers, repeat=args.repeat)
+        serial = serial or elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {serial / elapsed:>7.2f}x")
+
+    # The results are unpickled serially in the calling process, so their transfer format limits
+    # how far parsing can scale.
+    print(f"{'transfer':>8} {'bytes':>9} {'load (s)':>9}")
+    for name, dumps in (("pickle", pickle.dumps), ("compact", _transfer.dumps)):
+        data = [dumps(program) for program in programs]
+        elapsed = best_time(lambda: [pickle.loads(item) for item in data], repeat=args.repeat)
+        print(f"{name:>8} {sum(len(item) for item in data):>9} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
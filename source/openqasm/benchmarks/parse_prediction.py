@@ -0,0 +1,44 @@
+"""Compare the parse time of the two ANTLR prediction modes of :func:`openqasm3.parse`.
+
+Run as ``python benchmarks/parse_prediction.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+
+from programs import best_time, example_sources, gate_list_program, structured_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=5_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=50, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        "examples/*.qasm": list(example_sources().values()),
+        f"gate list ({args.gates} gates)": [gate_list_program(args.gates)],
+        f"structured ({args.blocks} blocks)": [structured_program(args.blocks)],
+    }
+
+    def parse_all(sources, mode):
+        for source in sources:
+            openqasm3.parse(source, prediction_mode=mode)
+
+    # Warm the shared DFA cache in both modes, so that neither benefits from running second.
+    for sources in workloads.values():
+        for mode in openqasm3.parser.PREDICTION_MODES:
+            parse_all(sources, mode)
+
+    print(f"{'workload':32} {'chars':>10} {'ll (s)':>9} {'two-stage (s)':>14} {'speedup':>8}")
+    for name, sources in workloads.items():
+        size = sum(len(source) for source in sources)
+        ll = best_time(parse_all, sources, "ll", repeat=args.repeat)
+        sll = best_time(parse_all, sources, "two-stage", repeat=args.repeat)
+        print(f"{name:32} {size:>10} {ll:>9.3f} {sll:>14.3f} {ll / sll:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare the parse time of many small programs with :func:`openqasm3.parse` and with a reused
+:class:`openqasm3.parser.Parser`.
+
+Run as ``python benchmarks/parse_reuse.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+from openqasm3.parser import Parser
+
+from programs import best_time, example_sources, gate_list_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--programs", type=int, default=2_000, help="number of small programs")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        f"{args.programs} x 4 gates": [gate_list_program(4, 2)] * args.programs,
+        f"{args.programs // 10} x 40 gates": [gate_list_program(40, 8)] * (args.programs // 10),
+        "examples/*.qasm": list(example_sources().values()),
+    }
+    parser = Parser()
+
+    def parse_all(sources, parse):
+        for source in sources:
+            parse(source)
+
+    # Warm the shared DFA cache, so that neither benefits from running second.
+    for sources in workloads.values():
+        parse_all(sources, openqasm3.parse)
+
+    print(f"{'workload':32} {'chars':>10} {'parse (s)':>10} {'Parser (s)':>11} {'speedup':>8}")
+    for name, sources in workloads.items():
+        size = sum(len(source) for source in sources)
+        fresh = best_time(parse_all, sources, openqasm3.parse, repeat=args.repeat)
+        reused = best_time(parse_all, sources, parser.parse, repeat=args.repeat)
+        print(f"{name:32} {size:>10} {fresh:>10.3f} {reused:>11.3f} {fresh / reused:>7.2f}x")
+    print(parser.statistics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare the time taken to build the AST from an ANTLR parse tree in each of the ``spans`` modes of
+:func:`openqasm3.parse`, and the total parse time in each mode with and without the fast path.
+
+Run as ``python benchmarks/parse_spans.py`` from the root of the Python package.
+"""
+
+import argparse
+
+from antlr4 import CommonTokenStream, InputStream
+
+import openqasm3
+from openqasm3.parser import SPAN_MODES, QASMNodeVisitor, qasm3Lexer, qasm3Parser
+
+from programs import best_time, example_sources, gate_list_program, structured_program
+
+
+def parse_tree(source: str):
+    """Run the ANTLR part of parsing ``source``, without building the AST."""
+    parser = qasm3Parser(CommonTokenStream(qasm3Lexer(InputStream(source))))
+    return parser.program()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=5_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=50, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        "examples/*.qasm": list(example_sources().values()),
+        f"gate list ({args.gates} gates)": [gate_list_program(args.gates)],
+        f"structured ({args.blocks} blocks)": [structured_program(args.blocks)],
+    }
+
+    def build_all(trees, spans):
+        for tree in trees:
+            QASMNodeVisitor(spans=spans).visitProgram(tree)
+
+    def parse_all(sources, spans, fast_path):
+        for source in sources:
+            openqasm3.parse(source, spans=spans, fast_path=fast_path)
+
+    print(f"{'workload':32} {'spans':6} {'build (s)':>10} {'parse (s)':>10} {'fast path (s)':>14}")
+    for name, sources in workloads.items():
+        trees = [parse_tree(source) for source in sources]
+        for spans in SPAN_MODES:
+            build = best_time(build_all, trees, spans, repeat=args.repeat)
+            parse = best_time(parse_all, sources, spans, False, repeat=args.repeat)
+            fast = best_time(parse_all, sources, spans, True, repeat=args.repeat)
+            print(f"{name:32} {spans:6} {build:>10.3f} {parse:>10.3f} {fast:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Inputs shared by the benchmark scripts in this directory.
+
+The scripts are run directly (for example ``python benchmarks/parse.py``) from the root of the
+Python package, so this module is imported as a top-level module by them.
+"""
+
+import pathlib
+import time
+
+EXAMPLES_DIR = pathlib.Path(__file__).resolve().parents[3] / "examples"
+
+
+def example_sources():
+    """Get a dictionary mapping the file names of the OpenQASM examples in the repository to their
+    contents."""
+    return {path.name: path.read_text() for path in sorted(EXAMPLES_DIR.glob("*.qasm"))}
+
+
+def gate_list_program(n_gates: int, n_qubits: int = 64) -> str:
+    """A straight-line program of the form that is typically output by code generators: register
+    declarations followed by a long list of gates with literal arguments, barriers and measurements.
+    """
+    lines = [
+        "OPENQASM 3.0;",
+        'include "stdgates.inc";',
+        f"qubit[{n_qubits}] q;",
+        f"bit[{n_qubits}] c;",
+    ]
+    for i in range(n_gates):
+        a, b = i % n_qubits, (i * 7 + 1) % n_qubits
+        kind = i % 5
+        if kind == 0:
+            lines.append(f"rz(0.{i % 997 + 1}) q[{a}];")
+        elif kind == 1:
+            lines.append(f"cx q[{a}], q[{b if b != a else (a + 1) % n_qubits}];")
+        elif kind == 2:
+            lines.append(f"h q[{a}];")
+        elif kind == 3:
+            lines.append(f"u3(0.5, -1.25, pi) q[{a}];")
+        else:
+            lines.append(f"barrier q[{a}], q[{b}];")
+    lines.extend(f"c[{i}] = measure q[{i}];" for i in range(n_qubits))
+    return "\n".join(lines) + "\n"
+
+
+def structured_program(n_blocks: int) -> str:
+    """A program that uses more of the language: gate and subroutine definitions, classical
+    expressions, control flow and timing."""
+    lines = [
+        "OPENQASM 3.0;",
+        'include "stdgates.inc";',
+        "qubit[8] q;",
+        "bit[8] c;",
+        "const int[32] n = 8;",
+        "def parity(bit[8] b) -> bit { return b[0] ^ b[1] ^ b[2] ^ b[3]; }",
+    ]
+    for i in range(n_blocks):
+        lines.extend(
+            [
+                f"gate g{i}(theta) a, b {{ ctrl @ rz(theta / 2) a, b; U(theta, 0, pi) b; }}",
+                f"angle[32] theta{i} = {i + 1} * pi / (n + {i});",
+                f"for int i in [0:n - 1] {{ g{i}(theta{i}) q[i], q[(i + 1) % n]; }}",
+                f"c = measure q;",
+                f"if (parity(c) == 1) {{ x q[{i % 8}]; }} else {{ delay[{i + 1}0ns] q; }}",
+                f"while (c[0] != 0) {{ reset q[0]; c[0] = measure q[0]; }}",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+def best_time(function, *args, repeat: int = 3, **kwargs) -> float:
+    """Get the best wall-clock time in seconds of ``repeat`` calls of ``function``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -0,0 +1,48 @@
+"""Compare updating a parsed program for a small edit with :func:`openqasm3.parser.reparse` against
+parsing the whole edited source again, as an editor does on every keystroke.
+
+Run as ``python benchmarks/reparse.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+from openqasm3.parser import TextEdit, reparse
+
+from programs import best_time, gate_list_program, structured_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=20_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=200, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        f"gate list ({args.gates} gates)": gate_list_program(args.gates),
+        f"structured ({args.blocks} blocks)": structured_program(args.blocks),
+    }
+    print(f"{'workload':28} {'edit':8} {'parse (s)':>10} {'reparse (s)':>12} {'speedup':>8}")
+    for name, source in workloads.items():
+        lines = source.splitlines()
+        edits = {}
+        for where, index in (("start", 3), ("middle", len(lines) // 2), ("end", len(lines) - 2)):
+            # Insert a space at the start of the line, which shifts the rest of the statements on it.
+            edits[where] = TextEdit(index + 1, 0, index + 1, 0, " ")
+        for where, edit in edits.items():
+            new_source = edit.apply(source)
+            full = best_time(openqasm3.parse, new_source, repeat=args.repeat)
+            # Each update consumes the program it is given, so every call gets a fresh one.
+            programs = [openqasm3.parse(source) for _ in range(args.repeat)]
+            incremental = best_time(
+                lambda: reparse(programs.pop(), source, edit), repeat=args.repeat
+            )
+            print(
+                f"{name:28} {where:8} {full:>10.3f} {incremental:>12.4f}"
+                f" {full / incremental:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
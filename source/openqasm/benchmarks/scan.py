@@ -0,0 +1,60 @@
+"""Compare the time taken to find the comments of a program with :func:`openqasm3.parser.scan`, with
+running the ANTLR lexer over it, and with parsing it.
+
+Run as ``python benchmarks/scan.py`` from the root of the Python package.
+"""
+
+import argparse
+
+from antlr4 import CommonTokenStream, InputStream
+
+import openqasm3
+from openqasm3.parser import qasm3Lexer, scan
+
+from programs import best_time, example_sources, gate_list_program, structured_program
+
+
+def lexer_comments(source: str):
+    """Find the comments of ``source`` with the ANTLR lexer."""
+    stream = CommonTokenStream(qasm3Lexer(InputStream(source)))
+    stream.fill()
+    return [token.text for token in stream.tokens if token.channel == token.HIDDEN_CHANNEL]
+
+
+def commented(source: str) -> str:
+    """Add a comment to every other line of ``source``, as in hand-written or annotated programs."""
+    lines = source.splitlines()
+    return "\n".join(
+        f"{line} // line {i}" if i % 2 else f"/* line {i} */ {line}" for i, line in enumerate(lines)
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=20_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=50, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        "examples/*.qasm": list(example_sources().values()),
+        f"gate list ({args.gates} gates)": [commented(gate_list_program(args.gates))],
+        f"structured ({args.blocks} blocks)": [commented(structured_program(args.blocks))],
+    }
+
+    def run_all(function, sources):
+        for source in sources:
+            function(source)
+
+    print(f"{'workload':32} {'scan (s)':>9} {'lexer (s)':>10} {'parse (s)':>10} {'speedup':>8}")
+    for name, sources in workloads.items():
+        for source in sources:
+            assert [comment["text"] for comment in scan(source).comments] == lexer_comments(source)
+        scanned = best_time(run_all, scan, sources, repeat=args.repeat)
+        lexed = best_time(run_all, lexer_comments, sources, repeat=args.repeat)
+        parsed = best_time(run_all, openqasm3.parse, sources, repeat=args.repeat)
+        print(f"{name:32} {scanned:>9.3f} {lexed:>10.3f} {parsed:>10.3f} {lexed / scanned:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
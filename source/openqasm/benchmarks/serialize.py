@@ -0,0 +1,50 @@
+"""Compare the binary AST format of :mod:`openqasm3.serialize` with :mod:`pickle` and with printing
+and re-parsing the program.
+
+Run as ``python benchmarks/serialize.py`` from the root of the Python package.
+"""
+
+import argparse
+import pickle
+
+import openqasm3
+from openqasm3.serialize import dump_binary, load_binary
+
+from programs import best_time, example_sources, gate_list_program, structured_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=5_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=50, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        "examples/*.qasm": list(example_sources().values()),
+        f"gate list ({args.gates} gates)": [gate_list_program(args.gates)],
+        f"structured ({args.blocks} blocks)": [structured_program(args.blocks)],
+    }
+    formats = {
+        "binary": (dump_binary, load_binary),
+        "pickle": (lambda program: pickle.dumps(program, pickle.HIGHEST_PROTOCOL), pickle.loads),
+        "source": (openqasm3.dumps, openqasm3.parse),
+    }
+
+    def run(function, inputs):
+        for item in inputs:
+            function(item)
+
+    print(f"{'workload':32} {'format':8} {'bytes':>10} {'dump (s)':>9} {'load (s)':>9}")
+    for name, sources in workloads.items():
+        programs = [openqasm3.parse(source) for source in sources]
+        for format_name, (dump, load) in formats.items():
+            data = [dump(program) for program in programs]
+            size = sum(len(item) for item in data)
+            dump_time = best_time(run, dump, programs, repeat=args.repeat)
+            load_time = best_time(run, load, data, repeat=args.repeat)
+            print(f"{name:32} {format_name:8} {size:>10} {dump_time:>9.3f} {load_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Measure the memory retained by a parsed gate list with and without ``share_identifiers`` in
+:func:`openqasm3.parse`, and the time taken to parse it each way, with and without the fast path.
+
+Run as ``python benchmarks/share_identifiers.py`` from the root of the Python package.
+"""
+
+import argparse
+import tracemalloc
+
+import openqasm3
+
+from programs import best_time, gate_list_program
+
+
+def retained(source: str, **kwargs) -> int:
+    """Get the number of bytes retained by the program parsed from ``source``."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    program = openqasm3.parse(source, **kwargs)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del program
+    return after - before
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=100_000, help="size of the gate list")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source = gate_list_program(args.gates)
+    modes = {
+        "default": {},
+        "share_identifiers": {"share_identifiers": True},
+        "share_subtrees": {"share_subtrees": True},
+    }
+    print(f"gate list ({args.gates} gates), spans='none'")
+    print(f"{'sharing':18} {'fast path':>9} {'bytes per gate':>15} {'parse (s)':>10}")
+    for fast_path in (True, False):
+        for name, options in modes.items():
+            kwargs = {"spans": "none", "fast_path": fast_path, **options}
+            size = retained(source, **kwargs) / args.gates
+            parse_time = best_time(openqasm3.parse, source, repeat=args.repeat, **kwargs)
+            print(f"{name:18} {str(fast_path):>9} {size:>15.0f} {parse_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measure the memory retained by a parsed gate list with and without ``share_subtrees`` in
+:func:`openqasm3.parse`, the time taken to parse it each way, and the time taken by
+:func:`openqasm3.ast.structural_hash` on the result.
+
+Run as ``python benchmarks/share_subtrees.py`` from the root of the Python package.
+"""
+
+import argparse
+import tracemalloc
+
+import openqasm3
+from openqasm3 import ast
+
+from programs import best_time, gate_list_program
+
+
+def retained(source: str, **kwargs) -> int:
+    """Get the number of bytes retained by the program parsed from ``source``."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    program = openqasm3.parse(source, **kwargs)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del program
+    return after - before
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=100_000, help="size of the gate list")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source = gate_list_program(args.gates)
+    print(f"gate list ({args.gates} gates), spans='none', fast path")
+    print(f"{'share_subtrees':>15} {'bytes per gate':>15} {'parse (s)':>10} {'hash (s)':>9}")
+    for share in (False, True):
+        kwargs = {"spans": "none", "fast_path": True, "share_subtrees": share}
+        size = retained(source, **kwargs) / args.gates
+        parse_time = best_time(openqasm3.parse, source, repeat=args.repeat, **kwargs)
+        program = openqasm3.parse(source, **kwargs)
+        hash_time = best_time(ast.structural_hash, program, repeat=args.repeat)
+        print(f"{str(share):>15} {size:>15.0f} {parse_time:>10.3f} {hash_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Time building a :class:`openqasm3.symbols.SymbolTable` for parsed programs, compared with a plain
+:class:`~openqasm3.visitor.QASMVisitor` walk of the same tree, and time resolving every identifier
+in the program with the table.
+
+Run as ``python benchmarks/symbols.py`` from the root of the Python package.
+"""
+
+import argparse
+
+import openqasm3
+from openqasm3 import ast
+from openqasm3.symbols import SymbolTable
+from openqasm3.visitor import QASMVisitor, walk
+
+from programs import best_time, gate_list_program, structured_program
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--gates", type=int, default=50_000, help="size of the gate list")
+    arg_parser.add_argument("--blocks", type=int, default=500, help="size of the structured one")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    workloads = {
+        f"gate list ({args.gates} gates)": gate_list_program(args.gates),
+        f"structured ({args.blocks} blocks)": structured_program(args.blocks),
+    }
+    print(
+        f"{'workload':28} {'identifiers':>12} {'walk (s)':>9} {'build (s)':>10}"
+        f" {'lookups (s)':>12}"
+    )
+    for name, source in workloads.items():
+        program = openqasm3.parse(source, fast_path=True)
+        identifiers = [node for node in walk(program) if isinstance(node, ast.Identifier)]
+        table = SymbolTable(program)
+        walk_time = best_time(QASMVisitor().visit, program, repeat=args.repeat)
+        build_time = best_time(SymbolTable, program, repeat=args.repeat)
+        lookup_time = best_time(lambda: [table.lookup(node) for node in identifiers])
+        print(
+            f"{name:28} {len(identifiers):>12} {walk_time:>9.3f} {build_time:>10.3f}"
+            f" {lookup_time:>12.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
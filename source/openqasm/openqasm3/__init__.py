@@ -11,8 +11,9 @@ The AST itself is in the :obj:`.ast` module.  There is a reference parser in the
 :obj:`.parser` module, which requires the ``[parser]`` extra to be installed.
 
 With the ``[parser]`` extra installed, the simplest interface to the parser is
-the :obj:`~parser.parse` function.  You can use :func:`.parse_version` to check
-the potential version of an OpenQASM program before invoking your own parser.
+the :obj:`~parser.parse` function, and :obj:`~parser.parse_many` parses many
+programs in parallel.  You can use :func:`.parse_version` to check the potential
+version of an OpenQASM program before invoking your own parser.
 """
 
 __all__ = [
@@ -20,18 +21,22 @@ __all__ = [
     "visitor",
     "properties",
     "spec",
+    "serialize",
+    "symbols",
     "dump",
     "dumps",
+    "dump_statements",
     "parser",
     "parse",
+    "parse_many",
     "parse_version",
 ]
 
 __version__ = "1.0.1"
 
-from . import ast, visitor, properties, spec
+from . import ast, visitor, properties, spec, serialize, symbols
 
-from .printer import dump, dumps
+from .printer import dump, dumps, dump_statements
 
 # Try to initialise the 'parsing' extra components.
 try:
@@ -42,4 +47,4 @@ else:
     # Any import errors in section are of interest to the user, and should be propagated.
     del antlr4
     from . import parser
-    from .parser import parse, parse_version
+    from .parser import parse, parse_many, parse_version
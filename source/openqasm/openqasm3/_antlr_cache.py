@@ -0,0 +1,209 @@
+"""
+Persistence of the prediction state that the ANTLR runtime builds up while parsing.
+
+The generated lexer and parser share DFA tables between all their instances in a process, which
+start empty and are filled in as ANTLR makes predictions.  Until they are warm, parsing is several
+times slower than it is afterwards.  This module saves those tables to disk and loads them into a
+new process, so that it can parse at full speed immediately.
+
+The ATNs themselves are not stored: deserializing them from the generated code is faster than
+unpickling them.  Instead, references to ATN states, lexer actions and the runtime's singleton
+objects are stored by name, and resolved against the ATNs of the loading process.  Some of the
+runtime's objects cache hash codes that are only valid in the process that computed them, so these
+are recomputed after loading.  The cache file is keyed on
+the versions of Python and the ANTLR runtime, and on the serialized ATNs, so it can only be loaded
+by a process that has exactly the same grammar.
+"""
+
+import functools
+import hashlib
+import io
+import os
+import pathlib
+import pickle
+import platform
+import sys
+import tempfile
+from typing import List, Optional, Tuple, Union
+
+from antlr4.atn.ATN import ATN
+from antlr4.atn.ATNSimulator import ATNSimulator
+from antlr4.atn.ATNState import ATNState
+from antlr4.atn.LexerAction import LexerAction
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.SemanticContext import SemanticContext
+from antlr4.PredictionContext import PredictionContext
+
+from ._antlr import RUNTIME_VERSION
+from ._antlr.qasm3Lexer import (  # type: ignore[import-not-found]
+    qasm3Lexer,
+    serializedATN as _lexer_atn,
+)
+from ._antlr.qasm3Parser import (  # type: ignore[import-not-found]
+    qasm3Parser,
+    serializedATN as _parser_atn,
+)
+
+__all__ = ["default_directory", "cache_file", "load", "save", "states"]
+
+_SINGLETONS = {
+    "no-predicate": SemanticContext.NONE,
+    "empty-context": PredictionContext.EMPTY,
+    "error": ATNSimulator.ERROR,
+    "lexer-error": LexerATNSimulator.ERROR,
+}
+_SINGLETON_NAMES = {id(value): key for key, value in _SINGLETONS.items()}
+_RECOGNIZERS = {"lexer": qasm3Lexer, "parser": qasm3Parser}
+
+
+def default_directory() -> pathlib.Path:
+    """Get the per-user cache directory for this package, following the platform's conventions."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join("~", "AppData", "Local")
+    elif sys.platform == "darwin":
+        base = os.path.join("~", "Library", "Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return pathlib.Path(base).expanduser() / "openqasm3"
+
+
+def cache_file(directory: Union[str, os.PathLike]) -> pathlib.Path:
+    """Get the path to the cache file in ``directory`` that matches this process."""
+    return pathlib.Path(directory) / f"antlr-{_key()}.pickle"
+
+
+@functools.lru_cache(maxsize=None)
+def _key() -> str:
+    key = hashlib.sha256()
+    for part in (
+        platform.python_implementation(),
+        ".".join(str(x) for x in sys.version_info[:2]),
+        ".".join(str(x) for x in RUNTIME_VERSION),
+        _lexer_atn(),
+        _parser_atn(),
+    ):
+        key.update(str(part).encode("utf-8") + b"\0")
+    return key.hexdigest()[:16]
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, recognizer: str):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        lexer_actions = _RECOGNIZERS[recognizer].atn.lexerActions or ()
+        self._lexer_actions = {id(action): i for i, action in enumerate(lexer_actions)}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, ATNState):
+            return ("state", obj.stateNumber)
+        if isinstance(obj, ATN):
+            return ("atn",)
+        if isinstance(obj, LexerAction) and id(obj) in self._lexer_actions:
+            return ("lexer-action", self._lexer_actions[id(obj)])
+        name = _SINGLETON_NAMES.get(id(obj))
+        if name is not None:
+            return (name,)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, recognizer: str):
+        super().__init__(file)
+        self._atn = _RECOGNIZERS[recognizer].atn
+
+    def persistent_load(self, pid):
+        if pid[0] == "state":
+            return self._atn.states[pid[1]]
+        if pid[0] == "atn":
+            return self._atn
+        if pid[0] == "lexer-action":
+            return self._atn.lexerActions[pid[1]]
+        return _SINGLETONS[pid[0]]
+
+
+def states() -> int:
+    """Get the total number of DFA states currently known to the shared lexer and parser."""
+    return sum(
+        len(dfa._states)  # pylint: disable=protected-access
+        for recognizer in _RECOGNIZERS.values()
+        for dfa in recognizer.decisionsToDFA
+    )
+
+
+def _dump(recognizer: str) -> bytes:
+    cls = _RECOGNIZERS[recognizer]
+    # The DFA states refer to each other in cycles, so their dictionaries cannot be pickled
+    # directly; the keys would be hashed before they were fully reconstructed.
+    tables: List[Tuple[object, list]] = [
+        (dfa.s0, list(dfa._states))
+        for dfa in cls.decisionsToDFA  # pylint: disable=protected-access
+    ]
+    context_cache = getattr(cls, "sharedContextCache", None)
+    stream = io.BytesIO()
+    _Pickler(stream, recognizer).dump(
+        (tables, None if context_cache is None else context_cache.cache)
+    )
+    return stream.getvalue()
+
+
+def _load(recognizer: str, data: bytes) -> Tuple[list, Optional[dict]]:
+    tables, contexts = _Unpickler(io.BytesIO(data), recognizer).load()
+    if len(tables) != len(_RECOGNIZERS[recognizer].decisionsToDFA):
+        raise ValueError("cached DFA does not match the ATN")
+    for _, dfa_states in tables:
+        for state in dfa_states:
+            state.configs.cachedHashCode = -1
+            for config in state.configs:
+                executor = getattr(config, "lexerActionExecutor", None)
+                if executor is not None:
+                    # pylint: disable=unnecessary-dunder-call
+                    executor.__init__(executor.lexerActions)
+    return tables, contexts
+
+
+def _install(recognizer: str, tables: list, contexts: Optional[dict]) -> None:
+    cls = _RECOGNIZERS[recognizer]
+    # Every recognizer instance holds a reference to the shared list of DFAs, so they are updated
+    # in place rather than replaced.
+    for dfa, (start, dfa_states) in zip(cls.decisionsToDFA, tables):
+        dfa.s0 = start
+        dfa._states = {state: state for state in dfa_states}  # pylint: disable=protected-access
+    if contexts is not None:
+        cls.sharedContextCache.cache = contexts
+
+
+def load(directory: Union[str, os.PathLike]) -> bool:
+    """Replace the shared prediction state of the lexer and parser with the state cached in
+    ``directory``.  Returns whether there was a usable cache file.  Any state built up in this process
+    before the call is discarded, so this should be called before parsing."""
+    try:
+        with open(cache_file(directory), "rb") as file:
+            recognizers = pickle.load(file)
+        loaded = {name: _load(name, recognizers[name]) for name in _RECOGNIZERS}
+    except Exception:  # pylint: disable=broad-except
+        # A missing, corrupt or incompatible cache is equivalent to an empty one.
+        return False
+    for name, (tables, contexts) in loaded.items():
+        _install(name, tables, contexts)
+    return True
+
+
+def save(directory: Union[str, os.PathLike]) -> Optional[pathlib.Path]:
+    """Write the current shared prediction state of the lexer and parser to the cache in
+    ``directory``, creating it if necessary.  The file is replaced atomically, so concurrent
+    processes may safely save to and load from the same directory.  Returns the path to the file,
+    or ``None`` if the state could not be serialized."""
+    try:
+        data = pickle.dumps({name: _dump(name) for name in _RECOGNIZERS})
+    except RecursionError:
+        return None
+    path = cache_file(directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return path
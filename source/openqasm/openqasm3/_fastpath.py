@@ -0,0 +1,412 @@
+"""
+A hand-written parser for the straight-line "gate list" subset of OpenQASM 3, which is used as a
+fast path by :func:`openqasm3.parse` when ``fast_path=True``.
+
+The subset is the top-level statements that fit on one line with no comments and that consist only
+of ASCII identifiers, decimal literals, hardware qubits and single integer indices:
+
+* the ``OPENQASM`` version statement,
+* ``include``, ``pragma``, ``qubit``, ``bit``, ``qreg`` and ``creg`` statements,
+* gate calls without modifiers or durations, whose arguments are (possibly negated) literals or
+  identifiers,
+* ``measure`` (in both the arrow and assignment forms), ``barrier`` and ``reset``.
+
+These build exactly the same AST nodes with the same spans as :class:`.QASMNodeVisitor` would, or no
+spans at all if they are turned off.  Any other top-level statement is handed back to the ANTLR-based
+parser, in contiguous runs.
+"""
+
+import re
+import string
+import sys
+from typing import Callable, Dict, List, Optional, Union
+
+from . import ast
+from ._scanner import KEYWORDS, skip_trivia, statement_end
+
+__all__ = ["parse", "parse_statement"]
+
+ChunkParser = Callable[[int, int, int, int], Optional[ast.Program]]
+"""A function that takes a ``start`` and ``end`` index into the program, and the line and column
+that ``start`` corresponds to, and returns the ANTLR-parsed :class:`~.ast.Program` of that part of
+the program, or ``None`` if it could not be parsed."""
+
+_VERSION = re.compile(r"OPENQASM[ \t]+([0-9]+(?:\.[0-9]+)?)[ \t]*;")
+_PRAGMA = re.compile(r"#?pragma(?!\w)[ \t]*([^ \t\r\n][^\r\n]*)")
+# Each match is a triple of the preceding whitespace, the token, and any character that cannot
+# start a token in the subset.  The kind of a token is determined by its first character.
+_TOKEN = re.compile(
+    r"""([ \t]*)(?:(
+    [A-Za-z_][A-Za-z0-9_]*
+    |(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[0-9]+(?:[eE][+-]?[0-9]+)?
+    |\$[0-9]+
+    |"[^"\r\t\n]+"|'[^'\r\t\n]+'
+    |->|[-()\[\],;=]
+    )|(.))""",
+    re.VERBOSE,
+)
+_KINDS = {
+    **{character: "identifier" for character in string.ascii_letters + "_"},
+    **{character: "number" for character in string.digits + "."},
+    "$": "hardware",
+    '"': "string",
+    "'": "string",
+    **{character: "symbol" for character in "-()[],;="},
+}
+
+
+class _NotInSubset(Exception):
+    """Raised internally when a statement is not in the subset handled by this module."""
+
+
+class _Statement:
+    """A recursive-descent parser of a single tokenized statement from the subset."""
+
+    __slots__ = ("kinds", "texts", "columns", "line", "index", "spans", "identifiers")
+
+    def __init__(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        line: int,
+        line_start: int,
+        spans: bool = True,
+        identifiers: Optional[Dict[str, ast.Identifier]] = None,
+    ):
+        self.texts: List[str] = []
+        self.columns: List[int] = []
+        column = start - line_start
+        for space, token, other in _TOKEN.findall(text, start, end):
+            if other:
+                raise _NotInSubset
+            column += len(space)
+            self.texts.append(token)
+            self.columns.append(column)
+            column += len(token)
+        self.kinds = [_KINDS[token[0]] for token in self.texts]
+        self.line = line
+        self.index = 0
+        self.spans = spans
+        self.identifiers = identifiers
+
+    def _span(self, start: int, end: int) -> Optional[ast.Span]:
+        if not self.spans:
+            return None
+        return ast.Span(self.line, self.columns[start], self.line, self.columns[end])
+
+    def _peek(self) -> str:
+        return self.texts[self.index] if self.index < len(self.texts) else ""
+
+    def _accept(self, symbol: str) -> bool:
+        if self._peek() == symbol and self.kinds[self.index] == "symbol":
+            self.index += 1
+            return True
+        return False
+
+    def _expect(self, symbol: str) -> int:
+        if not self._accept(symbol):
+            raise _NotInSubset
+        return self.index - 1
+
+    def _next(self, kind: str) -> int:
+        index = self.index
+        if index >= len(self.kinds) or self.kinds[index] != kind:
+            raise _NotInSubset
+        if kind == "identifier" and self.texts[index] in KEYWORDS:
+            raise _NotInSubset
+        self.index += 1
+        return index
+
+    def _name(self, index: int) -> ast.Identifier:
+        """An identifier without a span for the token at ``index``, or the shared one of its name."""
+        name = sys.intern(self.texts[index])
+        if self.identifiers is None:
+            return ast.Identifier(name)
+        if (out := self.identifiers.get(name)) is None:
+            out = self.identifiers[name] = ast.Identifier(name)
+        return out
+
+    def _identifier(self) -> ast.Identifier:
+        """An identifier with the span of its whole token."""
+        index = self._next("identifier")
+        out = self._name(index)
+        if self.spans:
+            name = self.texts[index]
+            column = self.columns[index]
+            out.span = ast.Span(self.line, column, self.line, column + len(name) - 1)
+        return out
+
+    def _integer(self) -> ast.IntegerLiteral:
+        index = self._next("number")
+        if not self.texts[index].isdigit():
+            raise _NotInSubset
+        out = ast.IntegerLiteral(int(self.texts[index]))
+        out.span = self._span(index, index)
+        return out
+
+    def _designator(self) -> ast.IntegerLiteral:
+        start = self._expect("[")
+        out = self._integer()
+        out.span = self._span(start, self._expect("]"))
+        return out
+
+    def _indexed_identifier(self) -> Union[ast.Identifier, ast.IndexedIdentifier]:
+        start = self.index
+        name = self._identifier()
+        if not self._accept("["):
+            name.span = self._span(start, start)
+            return name
+        index = self._integer()
+        out = ast.IndexedIdentifier(name, [[index]])
+        out.span = self._span(start, self._expect("]"))
+        return out
+
+    def _operand(self) -> Union[ast.Identifier, ast.IndexedIdentifier]:
+        if self.index < len(self.kinds) and self.kinds[self.index] == "hardware":
+            out = self._name(self.index)
+            out.span = self._span(self.index, self.index)
+            self.index += 1
+            return out
+        return self._indexed_identifier()
+
+    def _operands(self) -> list:
+        out = [self._operand()]
+        while self._accept(","):
+            out.append(self._operand())
+        return out
+
+    def _argument(self) -> ast.Expression:
+        negate: Optional[int] = self.index
+        if not self._accept("-"):
+            negate = None
+        index = self.index
+        out: ast.Expression
+        if index < len(self.kinds) and self.kinds[index] == "number":
+            text = self.texts[index]
+            out = ast.IntegerLiteral(int(text)) if text.isdigit() else ast.FloatLiteral(float(text))
+            self.index += 1
+        else:
+            out = self._name(self._next("identifier"))
+        out.span = self._span(index, index)
+        if negate is None:
+            return out
+        unary = ast.UnaryExpression(ast.UnaryOperator["-"], out)
+        unary.span = self._span(negate, index)
+        return unary
+
+    def _measurement(self, start: int) -> ast.QuantumMeasurement:
+        qubit = self._operand()
+        out = ast.QuantumMeasurement(qubit)
+        out.span = self._span(start, self.index - 1)
+        return out
+
+    def _finish(self, node: ast.Statement) -> ast.Statement:
+        end = self._expect(";")
+        if end != len(self.kinds) - 1:
+            raise _NotInSubset
+        node.span = self._span(0, end)
+        return node
+
+    def parse(self) -> ast.Statement:
+        """Parse the statement, raising :class:`_NotInSubset` if it is not in the subset."""
+        if not self.kinds or self.kinds[0] != "identifier":
+            raise _NotInSubset
+        keyword = self.texts[0]
+        if keyword in KEYWORDS:
+            self.index = 1
+            method = getattr(self, "_statement_" + keyword, None)
+            if method is None:
+                raise _NotInSubset
+            return self._finish(method())
+        target = self._indexed_identifier()
+        if self._accept("="):
+            if self._peek() != "measure":
+                raise _NotInSubset
+            self.index += 1
+            return self._finish(
+                ast.QuantumMeasurementStatement(self._measurement(self.index - 1), target)
+            )
+        if isinstance(target, ast.IndexedIdentifier):
+            raise _NotInSubset
+        self.index = 0
+        name = self._identifier()
+        arguments: List[ast.Expression] = []
+        if self._accept("("):
+            arguments.append(self._argument())
+            while self._accept(","):
+                arguments.append(self._argument())
+            self._expect(")")
+        return self._finish(ast.QuantumGate([], name, arguments, self._operands()))
+
+    def _statement_qubit(self):
+        size = self._designator() if self._peek() == "[" else None
+        return ast.QubitDeclaration(self._identifier(), size)
+
+    def _statement_bit(self):
+        if self._peek() == "[":
+            size: Optional[ast.IntegerLiteral] = self._designator()
+            type_span = self._span(0, self.index - 1)
+        else:
+            size, type_span = None, self._span(0, 0)
+        type_ = ast.BitType(size)
+        type_.span = type_span
+        return ast.ClassicalDeclaration(type_, self._identifier(), None)
+
+    def _statement_qreg(self):
+        name = self._identifier()
+        size = self._designator() if self._peek() == "[" else None
+        if size is not None and size.value == 0:
+            raise _NotInSubset
+        return ast.QubitDeclaration(name, size)
+
+    def _statement_creg(self):
+        name = self._identifier()
+        size = self._designator() if self._peek() == "[" else None
+        if size is None:
+            type_span = self._span(0, 0)
+            if type_span is not None:
+                type_span.end_column += 3
+        elif size.value == 0:
+            raise _NotInSubset
+        else:
+            type_span = self._span(0, self.index - 1)
+        type_ = ast.BitType(size)
+        type_.span = type_span
+        return ast.ClassicalDeclaration(type_, name, None)
+
+    def _statement_measure(self):
+        measure = self._measurement(0)
+        target = self._indexed_identifier() if self._accept("->") else None
+        return ast.QuantumMeasurementStatement(measure, target)
+
+    def _statement_barrier(self):
+        return ast.QuantumBarrier(self._operands() if self._peek() != ";" else [])
+
+    def _statement_reset(self):
+        return ast.QuantumReset(self._operand())
+
+    def _statement_include(self):
+        return ast.Include(self.texts[self._next("string")][1:-1])
+
+
+def _pragma(match: re.Match, line: int, line_start: int, spans: bool = True) -> ast.Pragma:
+    out = ast.Pragma(match.group(1))
+    if spans:
+        out.span = ast.Span(line, match.start() - line_start, line, match.start(1) - line_start)
+    return out
+
+
+def parse_statement(
+    text: str, start: int, end: int, line: int, column: int
+) -> Union[ast.Statement, ast.Pragma, None]:
+    """Parse the single top-level statement ``text[start:end]`` whose first character is at the
+    given line and column, such as is delimited by :func:`.statement_end`.  Returns ``None`` if the
+    statement is not in the subset."""
+    line_start = start - column
+    if (match := _PRAGMA.match(text, start, end)) is not None:
+        return _pragma(match, line, line_start)
+    if text[end - 1] != ";" or text.find("\n", start, end) >= 0:
+        return None
+    try:
+        return _Statement(text, start, end, line, line_start).parse()
+    except _NotInSubset:
+        return None
+
+
+def parse(
+    text: str,
+    parse_chunk: ChunkParser,
+    *,
+    spans: bool = True,
+    identifiers: Optional[Dict[str, ast.Identifier]] = None,
+) -> Optional[ast.Program]:
+    """Parse a complete program, using ``parse_chunk`` for the runs of statements that are not in
+    the subset.  Returns ``None`` if the program must be parsed entirely by ANTLR instead, which is
+    always the case for programs that fail to parse.  If ``spans`` is false, the nodes built here
+    have no spans; ``parse_chunk`` should then not set them either.  If ``identifiers`` is given,
+    spans must be false, and each name is given one :class:`~ast.Identifier` node that is kept in
+    the dictionary and shared between all its occurrences."""
+    statements: List[Union[ast.Statement, ast.Pragma]] = []
+    version = None
+    length = len(text)
+    line, line_start = 1, 0
+    # The position of the start of the first token, and the start of the last token so far.
+    first: Optional[ast.Span] = None
+    last = (0, 0)
+    chunk = None
+    pos = 0
+
+    def advance(new: int):
+        nonlocal pos, line, line_start
+        newlines = text.count("\n", pos, new)
+        if newlines:
+            line += newlines
+            line_start = text.rindex("\n", pos, new) + 1
+        pos = new
+
+    def flush() -> bool:
+        nonlocal chunk, last
+        if chunk is None:
+            return True
+        start, end, chunk_line, chunk_column = chunk
+        chunk = None
+        if text.startswith("OPENQASM", start):
+            return False
+        program = parse_chunk(start, end, chunk_line, chunk_column)
+        if program is None:
+            return False
+        statements.extend(program.statements)
+        if spans:
+            last = (program.span.end_line, program.span.end_column)  # type: ignore[union-attr]
+        return True
+
+    # The index of the next semicolon, which is the end of the next statement if it is in the
+    # subset.  This is cached so that programs with few semicolons are not scanned quadratically.
+    semicolon = -1
+    advance(skip_trivia(text, 0))
+    if text.startswith("OPENQASM", pos):
+        match = _VERSION.match(text, pos)
+        if match is None:
+            return None
+        version = match.group(1)
+        first = ast.Span(line, pos - line_start, line, pos - line_start)
+        last = (line, match.end() - 1 - line_start)
+        advance(skip_trivia(text, match.end()))
+    while pos < length:
+        column = pos - line_start
+        if first is None:
+            first = ast.Span(line, column, line, column)
+        node: Union[ast.Statement, ast.Pragma, None] = None
+        if semicolon < pos:
+            semicolon = text.find(";", pos)
+            if semicolon < 0:
+                semicolon = length
+        if (match := _PRAGMA.match(text, pos)) is not None:
+            node = _pragma(match, line, line_start, spans)
+            end = match.end()
+        elif semicolon < length and text.find("\n", pos, semicolon) < 0:
+            end = semicolon + 1
+            try:
+                node = _Statement(text, pos, end, line, line_start, spans, identifiers).parse()
+            except _NotInSubset:
+                pass
+        if node is None:
+            end = statement_end(text, pos)
+            if chunk is None:
+                chunk = (pos, end, line, column)
+            else:
+                chunk = (chunk[0], end, chunk[2], chunk[3])
+        else:
+            if not flush():
+                return None
+            statements.append(node)
+            if spans:
+                last = (node.span.end_line, node.span.end_column)  # type: ignore[union-attr]
+        advance(skip_trivia(text, end))
+    if not flush() or first is None:
+        return None
+    program = ast.Program(statements, version=version)
+    if spans:
+        program.span = ast.Span(first.start_line, first.start_column, *last)
+    return program
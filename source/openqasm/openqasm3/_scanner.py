@@ -0,0 +1,324 @@
+"""
+Pure-Python lexical helpers that mirror the parts of the ANTLR lexer needed to find the boundaries
+of top-level statements, and to pick out the comments, version, includes and pragmas of a program,
+without running the full lexer or parser.
+
+None of the functions here validate their input; they are only intended to split syntactically
+valid programs at the same places that the ANTLR parser would, and to find the same tokens in them
+that the ANTLR lexer would.  Invalid programs may be split or scanned arbitrarily, and it is up to
+the caller to parse the resulting pieces properly.
+"""
+
+import dataclasses
+import re
+from typing import List, Optional, Tuple
+
+__all__ = [
+    "KEYWORDS",
+    "skip_trivia",
+    "statement_end",
+    "partial_statement_end",
+    "leading_version",
+    "ScanResult",
+    "scan",
+]
+
+KEYWORDS = frozenset(
+    {
+        "OPENQASM",
+        "include",
+        "defcalgrammar",
+        "def",
+        "cal",
+        "defcal",
+        "gate",
+        "extern",
+        "box",
+        "let",
+        "break",
+        "continue",
+        "if",
+        "else",
+        "end",
+        "return",
+        "for",
+        "while",
+        "in",
+        "switch",
+        "case",
+        "default",
+        "nop",
+        "pragma",
+        "input",
+        "output",
+        "const",
+        "readonly",
+        "mutable",
+        "qreg",
+        "qubit",
+        "creg",
+        "bool",
+        "bit",
+        "int",
+        "uint",
+        "float",
+        "angle",
+        "complex",
+        "array",
+        "void",
+        "duration",
+        "stretch",
+        "gphase",
+        "inv",
+        "pow",
+        "ctrl",
+        "negctrl",
+        "durationof",
+        "delay",
+        "reset",
+        "measure",
+        "barrier",
+        "true",
+        "false",
+        "im",
+    }
+)
+"""Words that the lexer never produces as an ``Identifier`` token."""
+
+_TRIVIA = re.compile(r"(?:[ \t\r\n]+|//[^\r\n]*|/\*[\s\S]*?\*/)*")
+_REST_OF_LINE = re.compile(r"[^\r\n]*")
+_ELSE = re.compile(r"else(?!\w)")
+_TOKEN = re.compile(
+    r"""
+    (?P<trivia>[ \t\r\n]+|//[^\r\n]*|/\*[\s\S]*?\*/)
+    # Tokens that make the lexer consume the rest of the line.
+    |(?P<pragma>\#?pragma(?!\w))
+    |(?P<annotation>@[^\W\d]\w*(?:\.[^\W\d]\w*)*)
+    |(?P<word>[^\W\d]\w*)
+    |(?P<number>\d[\w.]*)
+    |(?P<string>"[^"\r\n]*"|'[^'\r\n]*')
+    # Comments and strings that are not terminated before the end of the text.
+    |(?P<unterminated>/\*|"[^"\r\n]*\Z|'[^'\r\n]*\Z)
+    |(?P<open>[(\[{])
+    |(?P<close>[)\]}])
+    |(?P<semicolon>;)
+    |(?P<operator>(?:[=!<>+\-*%&|^~]|/(?![/*]))+)
+    |(?P<other>[\s\S])
+    """,
+    re.VERBOSE,
+)
+
+
+def skip_trivia(text: str, pos: int) -> int:
+    """Get the index of the first character at or after ``pos`` that is not whitespace or part of a
+    comment.  This is ``len(text)`` if there are no more tokens."""
+    return _TRIVIA.match(text, pos).end()  # type: ignore[union-attr]
+
+
+def _calibration_block_end(text: str, pos: int) -> int:
+    """Get the index of the ``}`` that closes the calibration block whose opening ``{`` is
+    immediately before ``pos``.  The lexer treats the contents as opaque text that only needs to
+    have balanced braces, so comments and strings inside the block are not special."""
+    depth = 1
+    while depth:
+        close = text.find("}", pos)
+        if close < 0:
+            return len(text)
+        opened = text.count("{", pos, close)
+        pos = close + 1
+        depth += opened - 1
+    return pos - 1
+
+
+def statement_end(text: str, pos: int) -> int:
+    """Get the index one past the end of the top-level statement that starts at index ``pos`` of
+    ``text``, or ``len(text)`` if the statement is not terminated.
+
+    ``pos`` must be the index of the first character of the statement, such as is returned by
+    :func:`skip_trivia`.  Statements end at a top-level semicolon, at the closing brace of a
+    top-level block (unless the block is an array or set literal, or is followed by an ``else``),
+    or at the end of the line for a pragma.
+    """
+    return _statement_end(text, pos, final=True)  # type: ignore[return-value]
+
+
+def partial_statement_end(text: str, pos: int) -> Optional[int]:
+    """Like :func:`statement_end`, but for when ``text`` is only the start of the program.
+
+    Returns ``None`` if the end of the statement cannot be determined without more of the program,
+    including if the statement is complete but it is not yet known whether an ``else`` follows."""
+    return _statement_end(text, pos, final=False)
+
+
+def _statement_end(text: str, pos: int, final: bool) -> Optional[int]:
+    depth = 0
+    # Whether the top-level brace we are inside is a literal, rather than a block.
+    literal_brace = False
+    calibration = False
+    previous = ""
+    first = True
+    length = len(text)
+    while pos < length:
+        match = _TOKEN.match(text, pos)
+        kind = match.lastgroup  # type: ignore[union-attr]
+        token = match.group()  # type: ignore[union-attr]
+        pos = match.end()  # type: ignore[union-attr]
+        if kind == "trivia":
+            continue
+        if kind == "unterminated" and not final:
+            return None
+        if kind == "pragma" or kind == "annotation":
+            pos = _REST_OF_LINE.match(text, pos).end()  # type: ignore[union-attr]
+            if pos == length and not final:
+                return None
+            if first and kind == "pragma":
+                return pos
+        elif kind == "word" and token in ("cal", "defcal"):
+            calibration = True
+        elif kind == "open":
+            if token == "{":
+                if calibration:
+                    calibration = False
+                    pos = _calibration_block_end(text, pos)
+                    if pos == length:
+                        return length if final else None
+                    if depth == 0:
+                        end = _after_statement(text, pos + 1, final)
+                        if end is None or end == pos + 1:
+                            return end
+                        pos, previous, first = end, "else", False
+                        continue
+                    # Leave the closing brace to be handled as a normal token.
+                elif depth == 0:
+                    literal_brace = previous in ("=", "in")
+            depth += 1
+        elif kind == "close":
+            depth = max(depth - 1, 0)
+            if depth == 0 and token == "}" and not literal_brace:
+                end = _after_statement(text, pos, final)
+                if end is None or end == pos:
+                    return end
+                pos, previous, first = end, "else", False
+                continue
+        elif kind == "semicolon" and depth == 0:
+            end = _after_statement(text, pos, final)
+            if end is None or end == pos:
+                return end
+            pos, previous, first = end, "else", False
+            continue
+        previous = token
+        first = False
+    return length if final else None
+
+
+def _after_statement(text: str, pos: int, final: bool) -> Optional[int]:
+    """Given that a complete statement could end at ``pos``, return ``pos`` if it does, or the index
+    after the ``else`` that continues it.  If ``final`` is false, return ``None`` if this cannot be
+    known without more of the program."""
+    next_token = skip_trivia(text, pos)
+    if not final:
+        rest = text[next_token : next_token + 5]
+        # An unterminated comment or a possible prefix of `else` could be continued.
+        if rest.startswith("/*") or (len(rest) < 5 and "else".startswith(rest)):
+            return None
+    match = _ELSE.match(text, next_token)
+    return pos if match is None else match.end()
+
+
+_LEADING_VERSION = re.compile(
+    r"OPENQASM(?:[ \t\r\n]+|//[^\r\n]*|/\*[\s\S]*?\*/)*(?P<version>\d+(?:\.\d+)*)"
+)
+# Everything that can start a token that :func:`scan` records, or one whose contents must be skipped
+# so that they are not mistaken for a comment: a string, the rest of the line after a pragma or
+# annotation, and the prelude and body of a calibration block.  Keywords only count when they are
+# not part of a longer word, as the lexer always takes the longest match.
+_INTERESTING = re.compile(
+    r"""
+    (?P<line>//[^\r\n]*)
+    |(?P<block>/\*[\s\S]*?\*/)
+    |(?P<string>"[^"\r\n]*"?|'[^'\r\n]*'?)
+    |@[^\W\d]\w*(?:\.[^\W\d]\w*)*[^\r\n]*
+    |(?<!\w)(?:
+        \#?pragma(?!\w)[ \t]*(?P<command>[^\r\n]*)
+        |include(?!\w)[ \t\r\n]*(?:"(?P<double>[^"\r\t\n]+)"|'(?P<single>[^'\r\t\n]+)')?
+        |(?P<calibration>(?:def)?cal)(?!\w)
+    )
+    """,
+    re.VERBOSE,
+)
+# Inside the prelude of a calibration block, the only things that matter are comments, and the brace
+# that opens the block.  Bit-string literals can appear in the prelude, but they cannot contain
+# either.
+_PRELUDE = re.compile(r"(?P<line>//[^\r\n]*)|(?P<block>/\*[\s\S]*?\*/)|\{")
+
+
+def leading_version(text: str) -> Optional[Tuple[int, ...]]:
+    """Get the version number of an ``OPENQASM <version>`` statement that is the first
+    non-comment statement of ``text``, as a tuple of ``int``, or ``None`` if there is none."""
+    match = _LEADING_VERSION.match(text, skip_trivia(text, 0))
+    if match is None:
+        return None
+    return tuple(int(x) for x in match.group("version").split("."))
+
+
+@dataclasses.dataclass
+class ScanResult:
+    """The tokens of a program found by :func:`scan`.  Line numbers start from one and column
+    numbers from zero, as they do in the ANTLR lexer."""
+
+    version: Optional[Tuple[int, ...]] = None
+    """The version of the program, as returned by :func:`leading_version`."""
+    comments: List[dict] = dataclasses.field(default_factory=list)
+    """The comments in the program, in the form returned by
+    :func:`openqasm3.parser.get_comments`."""
+    includes: List[dict] = dataclasses.field(default_factory=list)
+    """The ``include`` statements of the program, as dictionaries with the ``"filename"`` (without
+    the quotes), ``"line"`` and ``"column"`` of each."""
+    pragmas: List[dict] = dataclasses.field(default_factory=list)
+    """The pragmas of the program, as dictionaries with the ``"command"`` (the same as the
+    :attr:`.Pragma.command` of the parsed statement), ``"line"`` and ``"column"`` of each."""
+
+
+def scan(text: str) -> ScanResult:
+    """Find the version, comments, includes and pragmas of a program in a single pass over the text.
+
+    This is much quicker than running the ANTLR lexer, but gives the same results for any program
+    that the lexer accepts.  Comments inside strings, pragmas, annotations and the bodies of
+    calibration blocks are not comments, just as they are not to the lexer, but those in the
+    preludes of ``cal`` and ``defcal`` blocks are."""
+    out = ScanResult(version=leading_version(text))
+    # The line number of the character at index ``previous``, and the index of the start of its
+    # line.  Matches are found in order, so the newlines only need counting once.
+    state = [1, 0, 0]
+
+    def record(records, match, **values):
+        line, line_start, previous = state
+        start = match.start()
+        newlines = text.count("\n", previous, start)
+        if newlines:
+            line += newlines
+            line_start = text.rindex("\n", previous, start) + 1
+        state[:] = line, line_start, start
+        values.update(line=line, column=start - line_start)
+        records.append(values)
+
+    pos = 0
+    while (match := _INTERESTING.search(text, pos)) is not None:
+        pos = match.end()
+        kind = match.lastgroup
+        if kind in ("line", "block"):
+            record(out.comments, match, type=kind, text=match.group())
+        elif kind == "command":
+            record(out.pragmas, match, command=match.group(kind))
+        elif kind in ("double", "single"):
+            record(out.includes, match, filename=match.group(kind))
+        elif kind == "calibration":
+            while (match := _PRELUDE.search(text, pos)) is not None:
+                pos = match.end()
+                if match.lastgroup is None:
+                    pos = _calibration_block_end(text, pos) + 1
+                    break
+                record(out.comments, match, type=match.lastgroup, text=match.group())
+            else:
+                break
+    return out
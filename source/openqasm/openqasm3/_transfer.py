@@ -0,0 +1,42 @@
+"""
+Pickling of ASTs for sending them between processes.
+
+A parsed program is a large graph of small objects, and when one is sent back from a worker process
+it is the unpickling in the receiving process that is the bottleneck, because that is done serially.
+The AST nodes themselves are already unpickled entirely in C, but the default pickling of enumeration
+members calls back into the ``Enum`` constructor in Python for each one.  Here they are pickled by
+name instead, which is resolved by a plain attribute lookup.  The output can be read with the
+standard :func:`pickle.loads`.
+"""
+
+import copyreg
+import enum
+import io
+import pickle
+
+from . import ast
+
+__all__ = ["dumps", "loads"]
+
+
+def _reduce_enum(member: enum.Enum):
+    return getattr, (type(member), member.name)
+
+
+class _Pickler(pickle.Pickler):
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table.update(
+        (value, _reduce_enum)
+        for value in vars(ast).values()
+        if isinstance(value, type) and issubclass(value, enum.Enum)
+    )
+
+
+def dumps(obj: object) -> bytes:
+    """Pickle an object, which may contain AST nodes, to bytes."""
+    stream = io.BytesIO()
+    _Pickler(stream, protocol=pickle.HIGHEST_PROTOCOL).dump(obj)
+    return stream.getvalue()
+
+
+loads = pickle.loads
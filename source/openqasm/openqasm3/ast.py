@@ -6,12 +6,30 @@ Abstract Syntax Tree (``openqasm3.ast``)
 .. currentmodule:: openqasm3.ast
 
 The reference abstract syntax tree (AST) for OpenQASM 3 programs.
+
+All the nodes are :mod:`dataclasses`.  By default, each node instance stores its attributes in a
+per-instance ``__dict__``, like any other Python object.  For very large programs, the memory used
+by these dictionaries dominates, so the module can instead be built with ``__slots__`` on every node
+class, which roughly halves the size of each node.  To opt in to this, set the environment variable
+``OPENQASM3_SLOTTED_AST=1`` before :mod:`openqasm3` is first imported; whether it is active can be
+checked with :data:`SLOTTED`.  The two builds have the same classes, fields and equality semantics,
+but in the slotted build, no attributes other than the dataclass fields can be set on nodes.
+
+Queries for all the nodes of a type in a program, such as ``program.find_all(QuantumGate)``, can be
+made with :meth:`Program.find_all`, which builds a :class:`~openqasm3.visitor.NodeIndex` of the
+program the first time that it is used.
+
+Nodes are mutable, so they are not hashable, but :func:`structural_hash` computes a hash of a tree
+that is consistent with the equality of nodes, and :class:`StructuralKey` wraps a node for use as a
+dictionary key.  :class:`SubtreeInterner` shares equal subtrees of expressions between their
+occurrences, which :func:`openqasm3.parse` can do as it parses with ``share_subtrees=True``.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import List, Optional, Union, Tuple
+import os
+from dataclasses import MISSING, Field, dataclass, field, fields
+from typing import TYPE_CHECKING, Container, Dict, List, Optional, Type, TypeVar, Union, Tuple
 from enum import Enum
 
 __all__ = [
@@ -40,6 +58,7 @@ __all__ = [
     "ClassicalAssignment",
     "ClassicalDeclaration",
     "ClassicalType",
+    "Comment",
     "ComplexType",
     "Concatenation",
     "ConstantDeclaration",
@@ -85,9 +104,12 @@ __all__ = [
     "QubitDeclaration",
     "RangeDefinition",
     "ReturnStatement",
+    "SLOTTED",
     "SizeOf",
     "Span",
     "Statement",
+    "StructuralKey",
+    "SubtreeInterner",
     "SwitchStatement",
     "CompoundStatement",
     "StretchType",
@@ -97,6 +119,7 @@ __all__ = [
     "UnaryExpression",
     "UnaryOperator",
     "WhileLoop",
+    "structural_hash",
 ]
 
 AccessControl = Enum("AccessControl", "readonly mutable")
@@ -107,6 +130,57 @@ IOKeyword = Enum("IOKeyword", "input output")
 TimeUnit = Enum("TimeUnit", "dt ns us ms s")
 UnaryOperator = Enum("UnaryOperator", "~ ! -")
 
+_NodeT = TypeVar("_NodeT", bound="QASMNode")
+
+SLOTTED = os.environ.get("OPENQASM3_SLOTTED_AST", "") not in ("", "0")
+"""Whether the node classes of this module were built with ``__slots__``."""
+
+
+if TYPE_CHECKING:
+    from dataclasses import dataclass as _node
+
+    from .visitor import NodeIndex
+else:
+
+    def _node(cls):
+        """Make a node class into a dataclass, which also has ``__slots__`` if :data:`SLOTTED` is
+        set.  Every class in the node hierarchy must have slots for them to be effective, so classes
+        that are not dataclasses themselves define an empty ``__slots__``.  A node class may define
+        its own ``__slots__`` for attributes that are not fields, which are kept."""
+        if not SLOTTED:
+            return dataclass(cls)
+        own_fields = tuple(cls.__dict__.get("__annotations__", {}))
+        own_slots = tuple(cls.__dict__.get("__slots__", ()))
+        for name in own_fields:
+            default = cls.__dict__.get(name)
+            if isinstance(default, Field) and not default.init and default.default is not MISSING:
+                # A slot cannot have a class-level default, but `dataclass` only assigns defaults
+                # to non-init fields in `__init__` if they come from a factory.
+                setattr(
+                    cls,
+                    name,
+                    field(  # pylint: disable=invalid-field-call
+                        init=False,
+                        default_factory=lambda value=default.default: value,
+                        repr=default.repr,
+                        hash=default.hash,
+                        compare=default.compare,
+                        metadata=default.metadata,
+                    ),
+                )
+        cls = dataclass(cls)
+        namespace = {
+            key: value
+            for key, value in cls.__dict__.items()
+            if key not in own_fields
+            and key not in own_slots
+            and key not in ("__dict__", "__weakref__")
+        }
+        namespace["__slots__"] = own_fields + own_slots
+        slotted = type(cls)(cls.__name__, cls.__bases__, namespace)
+        slotted.__qualname__ = cls.__qualname__
+        return slotted
+
 
 @dataclass
 class Span:
@@ -115,13 +189,15 @@ class Span:
     We use the Antlr convention. The starting line number is 1 and starting column number is 0.
     """
 
+    __slots__ = ("start_line", "start_column", "end_line", "end_column")
+
     start_line: int
     start_column: int
     end_line: int
     end_column: int
 
 
-@dataclass
+@_node
 class QASMNode:
     """Base class for all OpenQASM 3 nodes"""
 
@@ -133,7 +209,7 @@ class QASMNode:
     """
 
 
-@dataclass
+@_node
 class Program(QASMNode):
     """
     An entire OpenQASM 3 program represented by a list of top level statements
@@ -141,9 +217,42 @@ class Program(QASMNode):
 
     statements: List[Union[Statement, Pragma]]
     version: Optional[str] = None
-
-
-@dataclass
+    comments: Optional[List[Comment]] = field(init=False, default=None, compare=False)
+    """The comments that are not attached to any statement, if they were kept by the parser.  These
+    are the comments before the version statement, which are not :attr:`~Comment.trailing`, and
+    those after the last statement, which are."""
+    version_comments: Optional[List[Comment]] = field(init=False, default=None, compare=False)
+    """The trailing comments of the version statement, if they were kept by the parser.  These are
+    the comments that follow it on the same line."""
+
+    # The index kept by `index`, which is not a field, so that it is never compared, printed or
+    # serialized.
+    __slots__ = ("_index",)
+
+    def index(self, refresh: bool = False) -> NodeIndex:
+        """Get a :class:`~openqasm3.visitor.NodeIndex` of the nodes of this program.  The index is
+        built the first time that this is called, and kept with the program until it is
+        :attr:`~openqasm3.visitor.NodeIndex.stale`.
+
+        :param refresh: Build the index again even if it is not stale, for example after the program
+            has been modified other than by a :class:`~openqasm3.visitor.QASMTransformer`.
+        """
+        from .visitor import NodeIndex  # pylint: disable=import-outside-toplevel,cyclic-import
+
+        index = getattr(self, "_index", None)
+        if refresh or index is None or index.stale or index.root is not self:
+            index = self._index = NodeIndex(self)
+        return index
+
+    def find_all(self, node_type: Type[_NodeT]) -> List[_NodeT]:
+        """Get every node in this program that is an instance of ``node_type``, in the order that
+        they appear in the source.  The first call builds the :meth:`index` of the program, which
+        takes as long as a traversal of the tree, and later calls take time proportional to the
+        number of nodes that they return."""
+        return self.index().find_all(node_type)
+
+
+@_node
 class Annotation(QASMNode):
     """An annotation applied to a statement."""
 
@@ -151,21 +260,36 @@ class Annotation(QASMNode):
     command: Optional[str] = None
 
 
-@dataclass
+@_node
+class Comment(QASMNode):
+    """A comment from the source of a program.  The parser only keeps these if it is asked to, and
+    attaches them to the statement that they are nearest to."""
+
+    text: str
+    """The text of the comment, including the ``//`` or ``/*`` and ``*/`` that delimit it."""
+    trailing: bool = False
+    """Whether the comment follows its statement on the same line as the statement ends, rather
+    than being on a line of its own before the statement."""
+
+
+@_node
 class Statement(QASMNode):
     """A statement: anything that can appear on its own line"""
 
     annotations: List[Annotation] = field(init=False, default_factory=list)
+    comments: Optional[List[Comment]] = field(init=False, default=None, compare=False)
+    """The comments attached to this statement, if they were kept by the parser.  Like the span,
+    these are not included in comparisons of nodes."""
 
 
-@dataclass
+@_node
 class CompoundStatement(Statement):
     """A sequence of statements enclosed within an anonymous scope block"""
 
     statements: List[Statement]
 
 
-@dataclass
+@_node
 class Include(Statement):
     """
     An include statement
@@ -174,7 +298,7 @@ class Include(Statement):
     filename: str
 
 
-@dataclass
+@_node
 class ExpressionStatement(Statement):
     """A statement that contains a single expression"""
 
@@ -183,7 +307,7 @@ class ExpressionStatement(Statement):
 
 # Note that QubitDeclaration is not a valid QuantumStatement, because qubits
 # can only be declared in global scopes, not in gates.
-@dataclass
+@_node
 class QubitDeclaration(Statement):
     """
     Global qubit declaration
@@ -202,7 +326,7 @@ class QubitDeclaration(Statement):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class QuantumGateDefinition(Statement):
     """
     Define a new quantum gate
@@ -224,8 +348,10 @@ class QuantumGateDefinition(Statement):
 class QuantumStatement(Statement):
     """Statements that may appear inside a gate declaration"""
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class ExternDeclaration(Statement):
     """
     A extern declaration
@@ -248,8 +374,10 @@ class ExternDeclaration(Statement):
 class Expression(QASMNode):
     """An expression: anything that returns a value"""
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class Identifier(Expression):
     """
     An identifier
@@ -263,7 +391,7 @@ class Identifier(Expression):
     name: str
 
 
-@dataclass
+@_node
 class UnaryExpression(Expression):
     """
     A unary expression
@@ -280,7 +408,7 @@ class UnaryExpression(Expression):
     expression: Expression
 
 
-@dataclass
+@_node
 class BinaryExpression(Expression):
     """
     A binary expression
@@ -296,7 +424,7 @@ class BinaryExpression(Expression):
     rhs: Expression
 
 
-@dataclass
+@_node
 class IntegerLiteral(Expression):
     """
     An integer literal
@@ -310,7 +438,7 @@ class IntegerLiteral(Expression):
     value: int
 
 
-@dataclass
+@_node
 class FloatLiteral(Expression):
     """
     An real number literal
@@ -324,7 +452,7 @@ class FloatLiteral(Expression):
     value: float
 
 
-@dataclass
+@_node
 class ImaginaryLiteral(Expression):
     """
     An real number literal
@@ -338,7 +466,7 @@ class ImaginaryLiteral(Expression):
     value: float
 
 
-@dataclass
+@_node
 class BooleanLiteral(Expression):
     """
     A boolean expression
@@ -353,7 +481,7 @@ class BooleanLiteral(Expression):
     value: bool
 
 
-@dataclass
+@_node
 class BitstringLiteral(Expression):
     """A literal bitstring value.  The ``value`` is the numerical value of the
     bitstring, and the ``width`` is the number of digits given."""
@@ -362,7 +490,7 @@ class BitstringLiteral(Expression):
     width: int
 
 
-@dataclass
+@_node
 class DurationLiteral(Expression):
     """
     A duration literal
@@ -377,7 +505,7 @@ class DurationLiteral(Expression):
     unit: TimeUnit
 
 
-@dataclass
+@_node
 class ArrayLiteral(Expression):
     """Array literal, used to initialise declared arrays.
 
@@ -391,7 +519,7 @@ class ArrayLiteral(Expression):
     values: List[Expression]
 
 
-@dataclass
+@_node
 class FunctionCall(Expression):
     """
     A function call expression
@@ -408,7 +536,7 @@ class FunctionCall(Expression):
     arguments: List[Expression]
 
 
-@dataclass
+@_node
 class Cast(Expression):
     """
     A cast call expression
@@ -423,7 +551,7 @@ class Cast(Expression):
     argument: Expression
 
 
-@dataclass
+@_node
 class DiscreteSet(QASMNode):
     """
     A set of discrete values.  This can be used for the values in a ``for``
@@ -436,7 +564,7 @@ class DiscreteSet(QASMNode):
     values: List[Expression]
 
 
-@dataclass
+@_node
 class RangeDefinition(QASMNode):
     """
     Range definition.
@@ -456,7 +584,7 @@ class RangeDefinition(QASMNode):
 IndexElement = Union[DiscreteSet, List[Union[Expression, RangeDefinition]]]
 
 
-@dataclass
+@_node
 class IndexExpression(Expression):
     """
     An index expression.
@@ -470,7 +598,7 @@ class IndexExpression(Expression):
     index: IndexElement
 
 
-@dataclass
+@_node
 class IndexedIdentifier(QASMNode):
     """An indentifier with index operators, such that it can be used as an
     lvalue.  The list of indices is subsequent index brackets, so in::
@@ -486,7 +614,7 @@ class IndexedIdentifier(QASMNode):
     indices: List[IndexElement]
 
 
-@dataclass
+@_node
 class Concatenation(Expression):
     """
     Concatenation of two registers, for example::
@@ -499,7 +627,7 @@ class Concatenation(Expression):
     rhs: Expression
 
 
-@dataclass
+@_node
 class QuantumGate(QuantumStatement):
     """
     Invoking a quantum gate
@@ -524,7 +652,7 @@ class QuantumGate(QuantumStatement):
     duration: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class QuantumGateModifier(QASMNode):
     """
     A quantum gate modifier
@@ -544,7 +672,7 @@ class QuantumGateModifier(QASMNode):
     argument: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class QuantumPhase(QuantumStatement):
     """
     A quantum phase instruction
@@ -564,7 +692,7 @@ class QuantumPhase(QuantumStatement):
     qubits: List[Union[IndexedIdentifier, Identifier]]
 
 
-@dataclass
+@_node
 class QuantumNop(QuantumStatement):
     """A ``nop`` statment.
 
@@ -579,7 +707,7 @@ class QuantumNop(QuantumStatement):
 
 
 # Not a full expression because it can only be used in limited contexts.
-@dataclass
+@_node
 class QuantumMeasurement(QASMNode):
     """
     A quantum measurement instruction
@@ -593,7 +721,7 @@ class QuantumMeasurement(QASMNode):
 
 
 # Not a full expression because it can only be used in limited contexts.
-@dataclass
+@_node
 class QuantumCallExpression(QASMNode):
     """
     A quantum call expression that invokes a defcal with an identifier
@@ -613,7 +741,7 @@ class QuantumCallExpression(QASMNode):
 
 # Note that this is not a QuantumStatement because it involves access to
 # classical bits.
-@dataclass
+@_node
 class QuantumMeasurementStatement(Statement):
     """Stand-alone statement of a quantum measurement, potentially assigning the
     result to a classical variable.  This is not the only statement that
@@ -624,7 +752,7 @@ class QuantumMeasurementStatement(Statement):
     target: Optional[Union[IndexedIdentifier, Identifier]]
 
 
-@dataclass
+@_node
 class QuantumBarrier(QuantumStatement):
     """
     A quantum barrier instruction
@@ -638,7 +766,7 @@ class QuantumBarrier(QuantumStatement):
 
 
 # Note that this is not a QuantumStatement because a reset is not a unitary operation.
-@dataclass
+@_node
 class QuantumReset(Statement):
     """
     A reset instruction.
@@ -651,7 +779,7 @@ class QuantumReset(Statement):
     qubits: Union[IndexedIdentifier, Identifier]
 
 
-@dataclass
+@_node
 class ClassicalArgument(QASMNode):
     """
     Classical argument for a gate or subroutine declaration
@@ -662,7 +790,7 @@ class ClassicalArgument(QASMNode):
     access: Optional[AccessControl] = None
 
 
-@dataclass
+@_node
 class ExternArgument(QASMNode):
     """Classical argument for an extern declaration."""
 
@@ -670,7 +798,7 @@ class ExternArgument(QASMNode):
     access: Optional[AccessControl] = None
 
 
-@dataclass
+@_node
 class ClassicalDeclaration(Statement):
     """
     Classical variable declaration
@@ -685,7 +813,7 @@ class ClassicalDeclaration(Statement):
     init_expression: Optional[Union[Expression, QuantumMeasurement, QuantumCallExpression]] = None
 
 
-@dataclass
+@_node
 class IODeclaration(Statement):
     """
     Input/output variable declaration
@@ -701,7 +829,7 @@ class IODeclaration(Statement):
     identifier: Identifier
 
 
-@dataclass
+@_node
 class ConstantDeclaration(Statement):
     """
     Constant declaration
@@ -721,8 +849,10 @@ class ClassicalType(QASMNode):
     Base class for classical type
     """
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class IntType(ClassicalType):
     """
     Node representing a classical ``int`` (signed integer) type, with an
@@ -737,7 +867,7 @@ class IntType(ClassicalType):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class UintType(ClassicalType):
     """
     Node representing a classical ``uint`` (unsigned integer) type, with an
@@ -752,7 +882,7 @@ class UintType(ClassicalType):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class FloatType(ClassicalType):
     """
     Node representing the classical ``float`` type, with the particular IEEE-754
@@ -767,7 +897,7 @@ class FloatType(ClassicalType):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class ComplexType(ClassicalType):
     """
     Complex ClassicalType. Its real and imaginary parts are based on other classical types.
@@ -781,7 +911,7 @@ class ComplexType(ClassicalType):
     base_type: Optional[FloatType]
 
 
-@dataclass
+@_node
 class AngleType(ClassicalType):
     """
     Node representing the classical ``angle`` type, with an optional precision.
@@ -795,7 +925,7 @@ class AngleType(ClassicalType):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class BitType(ClassicalType):
     """
     Node representing the classical ``bit`` type, with an optional size.
@@ -814,8 +944,10 @@ class BoolType(ClassicalType):
     Leaf node representing the Boolean classical type.
     """
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class ArrayType(ClassicalType):
     """Type of arrays that include allocation of the storage.
 
@@ -829,7 +961,7 @@ class ArrayType(ClassicalType):
     dimensions: List[Expression]
 
 
-@dataclass
+@_node
 class ArrayReferenceType(ClassicalType):
     """Type of arrays that are a reference to an array with allocated storage.
 
@@ -858,14 +990,18 @@ class DurationType(ClassicalType):
     Leaf node representing the ``duration`` type.
     """
 
+    __slots__ = ()
+
 
 class StretchType(ClassicalType):
     """
     Leaf node representing the ``stretch`` type.
     """
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class CalibrationGrammarDeclaration(Statement):
     """
     Calibration grammar declaration
@@ -878,7 +1014,7 @@ class CalibrationGrammarDeclaration(Statement):
     name: str
 
 
-@dataclass
+@_node
 class CalibrationStatement(Statement):
     """An inline ``cal`` statement for embedded pulse-grammar interactions.
 
@@ -892,7 +1028,7 @@ class CalibrationStatement(Statement):
     body: str
 
 
-@dataclass
+@_node
 class CalibrationDefinition(Statement):
     """
     Calibration definition
@@ -911,7 +1047,7 @@ class CalibrationDefinition(Statement):
     body: str
 
 
-@dataclass
+@_node
 class SubroutineDefinition(Statement):
     """
     Subroutine definition
@@ -931,7 +1067,7 @@ class SubroutineDefinition(Statement):
     return_type: Optional[ClassicalType] = None
 
 
-@dataclass
+@_node
 class QuantumArgument(QASMNode):
     """
     Quantum argument for a subroutine declaration
@@ -941,7 +1077,7 @@ class QuantumArgument(QASMNode):
     size: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class ReturnStatement(Statement):
     """
     Classical or quantum return statement
@@ -966,6 +1102,8 @@ class BreakStatement(Statement):
         break;
     """
 
+    __slots__ = ()
+
 
 class ContinueStatement(Statement):
     """
@@ -976,6 +1114,8 @@ class ContinueStatement(Statement):
         continue;
     """
 
+    __slots__ = ()
+
 
 class EndStatement(Statement):
     """
@@ -986,8 +1126,10 @@ class EndStatement(Statement):
         end;
     """
 
+    __slots__ = ()
 
-@dataclass
+
+@_node
 class BranchingStatement(Statement):
     """
     Branch (``if``) statement
@@ -1004,7 +1146,7 @@ class BranchingStatement(Statement):
     else_block: List[Statement]
 
 
-@dataclass
+@_node
 class WhileLoop(Statement):
     """
     While loop
@@ -1022,7 +1164,7 @@ class WhileLoop(Statement):
     block: List[Statement]
 
 
-@dataclass
+@_node
 class ForInLoop(Statement):
     """
     For in loop
@@ -1040,7 +1182,7 @@ class ForInLoop(Statement):
     block: List[Statement]
 
 
-@dataclass
+@_node
 class SwitchStatement(Statement):
     """A switch-case statement.
 
@@ -1060,7 +1202,7 @@ class SwitchStatement(Statement):
     default: Optional[CompoundStatement]
 
 
-@dataclass
+@_node
 class DelayInstruction(Statement):
     """
     Delay instruction
@@ -1074,7 +1216,7 @@ class DelayInstruction(Statement):
     qubits: List[Union[IndexedIdentifier, Identifier]]
 
 
-@dataclass
+@_node
 class Box(Statement):
     """
     Timing box
@@ -1091,7 +1233,7 @@ class Box(Statement):
     body: List[Statement]
 
 
-@dataclass
+@_node
 class DurationOf(Expression):
     """
     Duration Of
@@ -1104,7 +1246,7 @@ class DurationOf(Expression):
     target: List[Statement]
 
 
-@dataclass
+@_node
 class SizeOf(Expression):
     """``sizeof`` an array's dimensions."""
 
@@ -1112,7 +1254,7 @@ class SizeOf(Expression):
     index: Optional[Expression] = None
 
 
-@dataclass
+@_node
 class AliasStatement(Statement):
     """
     Alias statement
@@ -1127,7 +1269,7 @@ class AliasStatement(Statement):
     value: Union[Identifier, Concatenation]
 
 
-@dataclass
+@_node
 class ClassicalAssignment(Statement):
     """
     Classical assignment
@@ -1142,7 +1284,7 @@ class ClassicalAssignment(Statement):
     rvalue: Expression
 
 
-@dataclass
+@_node
 class Pragma(QASMNode):
     """
     Pragma
@@ -1152,3 +1294,270 @@ class Pragma(QASMNode):
     """
 
     command: str
+    comments: Optional[List[Comment]] = field(init=False, default=None, compare=False)
+    """The comments attached to this pragma, if they were kept by the parser.  These can only
+    precede it, since the pragma runs to the end of its line."""
+
+
+_COMPARED_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _compared_fields(node_class: type) -> Tuple[str, ...]:
+    """Get the names of the fields of a node class that take part in comparisons of its nodes."""
+    out = _COMPARED_FIELDS.get(node_class)
+    if out is None:
+        out = _COMPARED_FIELDS[node_class] = tuple(
+            field.name for field in fields(node_class) if field.compare
+        )
+    return out
+
+
+def _push_nodes(value: object, stack: list) -> None:
+    """Push the nodes in a field value, which may be in nested lists and tuples, onto a stack."""
+    if isinstance(value, QASMNode):
+        stack.append(value)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _push_nodes(item, stack)
+
+
+def _postorder(node: QASMNode, done: Container[int]) -> List[QASMNode]:
+    """Get the nodes of a tree with each node after all of its descendants, using an explicit stack.
+    The descendants of nodes whose identities are in ``done`` are skipped.  A node that appears more
+    than once in the tree is included once for each time, with its descendants, so the first time
+    that it is reached in the output is after all of its descendants."""
+    out = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        out.append(node)
+        if id(node) not in done:
+            for name in _COMPARED_FIELDS.get(node.__class__) or _compared_fields(node.__class__):
+                value = getattr(node, name)
+                if isinstance(value, QASMNode):
+                    stack.append(value)
+                elif value.__class__ is list:
+                    for item in value:
+                        if isinstance(item, QASMNode):
+                            stack.append(item)
+                        else:
+                            _push_nodes(item, stack)
+                elif isinstance(value, tuple):
+                    _push_nodes(value, stack)
+    out.reverse()
+    return out
+
+
+def structural_hash(node: QASMNode, cache: Optional[Dict[int, int]] = None) -> int:
+    """Get a hash of a tree that is consistent with the equality of nodes, so it ignores the
+    :attr:`~QASMNode.span` of each node, and any other fields that are not compared.  Nodes are
+    mutable, so they are not hashable themselves; the hash describes the tree as it is at the time
+    of the call.  Like the hashes of strings, it is only the same between runs of Python if hash
+    randomization is disabled.
+
+    The tree is traversed with an explicit stack, so it may be of any depth.
+
+    :param node: The root of the tree to hash.
+    :param cache: A dictionary in which to store the hash of each node in the tree, keyed by the
+        identity of the node, which should be empty or come from earlier calls.  The hashes of
+        nodes that are already in it are reused without traversing them again, so hashing many
+        overlapping subtrees, such as every statement of a program and then the whole program, only
+        hashes each node once.  The dictionary must not be reused after any of its nodes have been
+        modified, or once they may have been freed.
+    :return: The hash.
+    """
+    if cache is None:
+        cache = {}
+    for current in _postorder(node, cache):
+        key = id(current)
+        if key in cache:
+            continue
+        cls = current.__class__
+        values: list = [cls]
+        for name in _COMPARED_FIELDS.get(cls) or _compared_fields(cls):
+            value = getattr(current, name)
+            if isinstance(value, QASMNode):
+                values.append(cache[id(value)])
+            elif value.__class__ is list:
+                values.append(
+                    (
+                        list,
+                        tuple(
+                            (
+                                cache[id(item)]
+                                if isinstance(item, QASMNode)
+                                else _hash_value(item, cache)
+                            )
+                            for item in value
+                        ),
+                    )
+                )
+            elif isinstance(value, (list, tuple)):
+                values.append(_hash_value(value, cache))
+            else:
+                values.append(value)
+        cache[key] = hash(tuple(values))
+    return cache[id(node)]
+
+
+def _hash_value(value: object, cache: Dict[int, int]) -> object:
+    """Get a hashable stand-in for a field value, whose nodes have all been hashed already."""
+    if isinstance(value, QASMNode):
+        return cache[id(value)]
+    if isinstance(value, list):
+        return (list, tuple(_hash_value(item, cache) for item in value))
+    if isinstance(value, tuple):
+        return (tuple, tuple(_hash_value(item, cache) for item in value))
+    return value
+
+
+class StructuralKey:
+    """A hashable wrapper of a node, for using trees as the keys of dictionaries and members of
+    sets, for example to memoize a pass over the AST.  Two keys are equal if their nodes are equal,
+    and the hash is the :func:`structural_hash` of the node when the key was made, so the node must
+    not be modified while the key is in use.
+
+    :param node: The node to wrap.
+    :param cache: As for :func:`structural_hash`, for making keys for many overlapping subtrees.
+    """
+
+    __slots__ = ("node", "_hash")
+
+    def __init__(self, node: QASMNode, cache: Optional[Dict[int, int]] = None):
+        self.node = node
+        self._hash = structural_hash(node, cache)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StructuralKey):
+            return NotImplemented
+        return self._hash == other._hash and (self.node is other.node or self.node == other.node)
+
+    def __repr__(self) -> str:
+        return f"StructuralKey({self.node!r})"
+
+
+class SubtreeInterner:
+    """Share identical subtrees between and within trees, which is known as hash-consing.
+
+    :meth:`intern` replaces each subtree of literals, identifiers, types and the expressions made
+    of them with the first equal subtree that the interner has seen, so each distinct subtree is
+    only stored once.  For example, every ``pi / 2`` in a program becomes the same node, as does
+    every ``q[0]``.  This cuts the memory used by large programs, and equal interned subtrees are
+    the same object, so they can be compared by identity in constant time.
+
+    A tree with shared subtrees is no longer a tree, so it should only be interned if nothing will
+    modify the shared nodes in place, and if nothing needs to tell apart their occurrences, as a
+    :class:`~openqasm3.symbols.SymbolTable` and the parents recorded by a
+    :class:`~openqasm3.visitor.NodeIndex` do.  A shared node can only have one span, so trees
+    should be interned without spans, such as those parsed with ``spans="none"``.
+    """
+
+    # The classes of nodes that are shared, if all of their children are.
+    _SHARED = (
+        Expression,
+        ClassicalType,
+        IndexedIdentifier,
+        QuantumGateModifier,
+        QuantumMeasurement,
+        RangeDefinition,
+        DiscreteSet,
+    )
+
+    def __init__(self):
+        self._table: Dict[tuple, QASMNode] = {}
+        self._shareable_classes: Dict[type, bool] = {}
+
+    def __len__(self) -> int:
+        """The number of distinct subtrees that have been interned."""
+        return len(self._table)
+
+    def intern(self, node: _NodeT) -> _NodeT:
+        """Replace the shareable subtrees of a tree with their interned equivalents, in place.
+
+        :param node: The root of the tree.
+        :return: The root of the tree, which is only a different node if the whole tree could be
+            shared.
+        """
+        table = self._table
+        shareable_classes = self._shareable_classes
+        # The interned node for each node of the tree, or None for nodes that cannot be shared.
+        interned: Dict[int, Optional[QASMNode]] = {}
+        for current in _postorder(node, ()):
+            key = id(current)
+            if key in interned:
+                continue
+            cls = current.__class__
+            shareable = shareable_classes.get(cls)
+            if shareable is None:
+                shareable = shareable_classes[cls] = issubclass(cls, self._SHARED)
+            values: list = [cls]
+            for name in _COMPARED_FIELDS.get(cls) or _compared_fields(cls):
+                value = getattr(current, name)
+                if isinstance(value, QASMNode):
+                    replacement = interned[id(value)]
+                    if replacement is None:
+                        shareable = False
+                    elif replacement is not value:
+                        setattr(current, name, replacement)
+                    values.append(id(replacement))
+                elif value.__class__ is list:
+                    # Most lists are of nodes, such as the qubits of a gate, so those are handled
+                    # here, and anything else is left to the general function.
+                    keys: list = [list]
+                    for index, item in enumerate(value):
+                        if isinstance(item, QASMNode):
+                            replacement = interned[id(item)]
+                            if replacement is None:
+                                shareable = False
+                            elif replacement is not item:
+                                value[index] = replacement
+                            keys.append(id(replacement))
+                        else:
+                            value[index], item_key = _intern_value(item, interned)
+                            if item_key is None:
+                                shareable = False
+                            keys.append(item_key)
+                    values.append(tuple(keys))
+                elif isinstance(value, (list, tuple)):
+                    replaced, value_key = _intern_value(value, interned)
+                    if replaced is not value:
+                        setattr(current, name, replaced)
+                    if value_key is None:
+                        shareable = False
+                    values.append(value_key)
+                elif value.__class__ is float:
+                    # Keep 0.0 and -0.0 apart, which compare equal but are printed differently.
+                    values.append((float, value.hex()))
+                else:
+                    values.append((value.__class__, value))
+            interned[key] = table.setdefault(tuple(values), current) if shareable else None
+        return interned[id(node)] or node  # type: ignore[return-value]
+
+
+def _intern_value(value: object, interned: Dict[int, Optional[QASMNode]]) -> Tuple[object, object]:
+    """Get a field value with its nodes replaced by their interned equivalents, and a key for the
+    value, which is None if it contains nodes that cannot be shared.  Lists are updated in place."""
+    if isinstance(value, QASMNode):
+        replacement = interned[id(value)]
+        if replacement is None:
+            return value, None
+        return replacement, id(replacement)
+    if isinstance(value, (list, tuple)):
+        items = []
+        keys: list = [value.__class__]
+        for item in value:
+            item, key = _intern_value(item, interned)
+            items.append(item)
+            keys.append(key)
+        if isinstance(value, list):
+            value[:] = items
+        elif any(a is not b for a, b in zip(items, value)):
+            value = tuple(items)
+        return value, None if None in keys else tuple(keys)
+    if isinstance(value, float):
+        # Keep 0.0 and -0.0 apart, which compare equal but are printed differently.
+        return value, (float, value.hex())
+    return value, (value.__class__, value)
@@ -10,9 +10,69 @@ The quick-start interface is simply to call ``openqasm3.parse``:
 .. currentmodule:: openqasm3
 .. autofunction:: openqasm3.parse
 
-The rest of this module provides some lower-level internals of the parser.
+Programs that are too large to hold in memory all at once can be parsed one top-level statement at a
+time:
 
 .. currentmodule:: openqasm3.parser
+.. autofunction:: iter_statements
+
+Editors and language servers can update a program after each edit to its source, without parsing
+the whole program again:
+
+.. autofunction:: reparse
+.. autoclass:: TextEdit
+    :members:
+
+Services that parse many programs can keep a single :class:`Parser`, which reuses its ANTLR objects
+between calls and counts how much of the parsing was done with the shared prediction tables:
+
+.. autoclass:: Parser
+    :members:
+.. autoclass:: ParserStatistics
+    :members:
+
+Collections of programs can be parsed in parallel in several processes:
+
+.. currentmodule:: openqasm3
+.. autofunction:: openqasm3.parse_many
+.. currentmodule:: openqasm3.parser
+
+Applications that parse the same sources repeatedly can keep the results in a :class:`ParseCache`:
+
+.. autoclass:: ParseCache
+    :members:
+
+The files named by ``include`` statements can be found, parsed and cached by an
+:class:`IncludeResolver`, which parses each file only once for as long as it is unchanged:
+
+.. autoclass:: IncludeResolver
+    :members:
+
+ANTLR learns how to parse faster as it goes, by building up prediction tables that are shared by
+all parses in the same process.  A new process starts with empty tables, so its first few parses
+are several times slower than later ones.  Short-lived processes (command-line tools and workers,
+for example) can avoid this by opting in to a persistent cache of the tables, by setting the
+environment variable ``OPENQASM3_ANTLR_CACHE`` before :mod:`openqasm3.parser` is first imported.
+If it is set to ``1``, the cache is kept in a per-user cache directory (such as
+``~/.cache/openqasm3`` on Linux), and any other value except ``0`` is used as the path to the cache
+directory.  The tables are then loaded from the cache on import, and saved back to it when the
+process exits if they have grown.  The cache is only ever used by processes with the same versions
+of Python, ANTLR and the OpenQASM grammar.  It is stored with :mod:`pickle`, so the cache directory
+must not be writeable by untrusted users.  The cache can also be managed manually:
+
+.. autofunction:: load_antlr_cache
+.. autofunction:: save_antlr_cache
+
+The comments, version, includes and pragmas of a program can be found much more quickly than by
+parsing it, with a single pass over the text that does not use ANTLR:
+
+.. autofunction:: scan
+.. autoclass:: ScanResult
+    :members:
+.. autofunction:: get_comments
+
+The rest of this module provides some lower-level internals of the parser.
+
 .. autofunction:: span
 .. autofunction:: add_span
 .. autofunction:: combine_span
@@ -24,6 +84,16 @@ The rest of this module provides some lower-level internals of the parser.
 
 __all__ = [
     "parse",
+    "iter_statements",
+    "reparse",
+    "TextEdit",
+    "Parser",
+    "ParserStatistics",
+    "parse_many",
+    "ParseCache",
+    "IncludeResolver",
+    "load_antlr_cache",
+    "save_antlr_cache",
     "get_span",
     "add_span",
     "combine_span",
@@ -31,11 +101,39 @@ __all__ = [
     "QASMNodeVisitor",
     "QASM3ParsingError",
     "get_comments",
+    "scan",
+    "ScanResult",
 ]
 
-import re
+import atexit
+import bisect
+import collections
+import concurrent.futures
+import dataclasses
+import functools
+import hashlib
+import itertools
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import threading
 from contextlib import contextmanager
-from typing import Union, TypeVar, List, Optional, Protocol, Tuple, cast
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    TextIO,
+    Union,
+    TypeVar,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    cast,
+)
 
 try:
     from antlr4 import (
@@ -43,11 +141,16 @@ try:
         InputStream,
         ParserRuleContext,
         RecognitionException,
+        Token,
     )
+    from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+    from antlr4.atn.ParserATNSimulator import ParserATNSimulator
+    from antlr4.atn.PredictionMode import PredictionMode
     from antlr4.error.Errors import ParseCancellationException
-    from antlr4.error.ErrorStrategy import BailErrorStrategy
+    from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
     from antlr4.tree.Tree import TerminalNode
     from antlr4.error.ErrorListener import ErrorListener
+    from antlr4.PredictionContext import PredictionContextCache
 except ImportError as exc:
     raise ImportError(
         "Parsing is not available unless the [parser] extra is installed,"
@@ -57,7 +160,17 @@ except ImportError as exc:
 from ._antlr.qasm3Lexer import qasm3Lexer  # type: ignore[import-not-found]
 from ._antlr.qasm3Parser import qasm3Parser  # type: ignore[import-not-found]
 from ._antlr.qasm3ParserVisitor import qasm3ParserVisitor  # type: ignore[import-not-found]
-from . import ast
+from . import __version__, _antlr_cache, _fastpath, _transfer, ast
+from .visitor import _child_fields
+from ._scanner import (
+    _LEADING_VERSION,
+    ScanResult,
+    leading_version,
+    partial_statement_end,
+    scan,
+    skip_trivia,
+    statement_end,
+)
 
 _TYPE_NODE_INIT = {
     "int": ast.IntType,
@@ -72,7 +185,11 @@ class QASM3ParsingError(Exception):
     given program could not be correctly parsed."""
 
     def __init__(
-        self, message: str, line: Optional[int] = None, column: Optional[int] = None
+        self,
+        message: str,
+        line: Optional[int] = None,
+        column: Optional[int] = None,
+        filename: Optional[str] = None,
     ) -> None:
         if line is not None and column is not None:
             prefix = f"L{line}:C{column}: "
@@ -80,10 +197,14 @@ class QASM3ParsingError(Exception):
             prefix = f"L{line}: "
         else:
             prefix = ""
+        if filename is not None:
+            prefix = f"{filename}: {prefix}"
 
         super().__init__(f"{prefix}{message}")
+        self.message = message
         self.line = line
         self.column = column
+        self.filename = filename
 
 
 class _RaiseOnErrorListener(ErrorListener):
@@ -129,9 +250,6 @@ class _TerminalNodeWithSymbol(Protocol):
     symbol: _TokenWithSpan
 
 
-_VERSION_NUM = re.compile(r"\d+(\.\d+)*")
-
-
 def parse_version(prog: str) -> Optional[Tuple[int, ...]]:
     """Extract the version number from a potential OpenQASM program.
 
@@ -144,45 +262,35 @@ def parse_version(prog: str) -> Optional[Tuple[int, ...]]:
 
     This function may return version tuples that are longer than two parts, although OpenQASM 2.0
     and 3.0 both specified a maximum of two components.
+
+    Only the start of the program is read, up to the version number.
     """
-    in_multiline_comment = False
-    found_openqasm = False
-    for line in prog.splitlines():
-        while line:
-            line = line.strip()
-            if in_multiline_comment:
-                if (loc := line.find("*/")) < 0:
-                    break
-                line = line[loc + 2 :]
-                in_multiline_comment = False
-                continue
-            if line.startswith("//"):
-                break
-            if line.startswith("/*"):
-                in_multiline_comment = True
-                line = line[2:]
-                continue
-            if found_openqasm:
-                # If here, we've got a non-space, non-comment token after an `OPENQASM` one, so it's
-                # either a valid version or the file is syntactically invalid.
-                if (m := _VERSION_NUM.match(line)) is not None:
-                    return tuple(int(x) for x in m.group(0).split("."))
-                return None
-            if line.startswith("OPENQASM"):
-                found_openqasm = True
-                line = line[len("OPENQASM") :]
-                continue
-            # We've got a non-OPENQASM token as the first non-comment token, so there's no
-            # syntactically valid version statement.
-            return None
-    return None
+    return leading_version(prog)
 
 
 MIN_SUPPORTED_VERSION = (3,)
 MAX_SUPPORTED_VERSION = (3, 1)
 
 
-def parse(input_: str, *, permissive=False, ignore_version=False) -> ast.Program:
+PREDICTION_MODES = ("two-stage", "ll")
+"""The values accepted by the ``prediction_mode`` argument of :func:`parse`."""
+
+SPAN_MODES = ("eager", "lazy", "none")
+"""The values accepted by the ``spans`` argument of :func:`parse`."""
+
+
+def parse(
+    input_: str,
+    *,
+    permissive=False,
+    ignore_version=False,
+    prediction_mode="two-stage",
+    fast_path=False,
+    spans="eager",
+    comments=False,
+    share_subtrees=False,
+    share_identifiers=False,
+) -> ast.Program:
     """
     Parse a complete OpenQASM 3 program from a string.
 
@@ -194,9 +302,170 @@ def parse(input_: str, *, permissive=False, ignore_version=False) -> ast.Program
     :param ignore_version: If true, ignore the specified version of the OpenQASM program, and
         attempt to parse it anyway.  There is no guarantee that the output was syntactically or
         semantically valid for the given version if this is set.
+    :param prediction_mode: The ANTLR prediction strategy to use.  The default, ``"two-stage"``,
+        first attempts the parse with ANTLR's faster SLL prediction, and only falls back to a full
+        LL parse if that fails; this produces exactly the same AST as ``"ll"`` (the full LL
+        prediction on its own), but is usually considerably faster.  Syntactically invalid
+        programs are parsed twice in two-stage mode before the error is raised.
+    :param fast_path: If true, parse the top-level statements that are in the simple "gate list"
+        subset of the language (declarations, gate calls with literal arguments, ``measure``,
+        ``barrier``, ``reset``, ``include`` and ``pragma``, each on a single line) with a
+        hand-written parser, and only pass the remaining statements to ANTLR.  The output is
+        identical to the ANTLR parser's, but straight-line programs are parsed much faster;
+        programs that are mostly outside the subset may be parsed slightly slower.  This has no
+        effect if ``permissive`` is true.
+    :param spans: How the :attr:`~ast.QASMNode.span` of each node is set.  The default,
+        ``"eager"``, sets a complete :class:`~ast.Span` on every node as it is built.  With
+        ``"lazy"``, each node instead refers to the tokens that it starts and ends with, and the
+        line and column numbers are only looked up when the span is first read; this makes
+        building the AST faster, but keeps the tokens of the program alive as long as there are
+        unread spans.  With ``"none"``, no spans are set at all, and every span is ``None``.
+    :param comments: If true, keep the comments of the program as :class:`~ast.Comment` nodes.
+        Each is attached to the :attr:`~ast.Statement.comments` of the nearest statement: as a
+        trailing comment of the statement that ends just before it on the same line, or otherwise
+        as a leading comment of the next statement.  Inside a statement, the comments at the end of
+        a block are trailing comments of the last statement in the block, and those after the
+        ``}`` of a block, or with no statement after them in the statement, are trailing comments
+        of the statement itself.  Comments after the version statement on the same line are
+        attached to the :attr:`~ast.Program.version_comments` of the program, and those after the
+        last statement to its :attr:`~ast.Program.comments`.  The comments are collected from the
+        same tokens that are parsed, so this costs little extra time.  This cannot be used with
+        ``spans="none"``, because the spans are needed to place the comments.
+    :param share_subtrees: If true, share equal subtrees of literals, identifiers, types and the
+        expressions made of them between their occurrences in the program, using a
+        :class:`~ast.SubtreeInterner`.  This cuts the memory used by programs that repeat the same
+        expressions many times, but nothing must modify the shared nodes in place.  This can only
+        be used with ``spans="none"``, because a shared node cannot have the span of each of its
+        occurrences.
+    :param share_identifiers: If true, build one :class:`~ast.Identifier` node for each name in the
+        program, and share it between all the occurrences of the name.  This cuts the memory used
+        by long programs that use the same few names many times, and is cheaper than
+        ``share_subtrees``, which implies it.  As with that, nothing must modify the shared nodes
+        in place, and this can only be used with ``spans="none"``.  The names themselves are
+        always interned with :func:`sys.intern`, whether or not this is set.
     :return: A complete :obj:`~ast.Program` node.
     """
-    version = parse_version(input_)
+    _check_prediction_mode(prediction_mode)
+    _check_spans(spans)
+    if comments and spans == "none":
+        raise ValueError("comments cannot be kept without the spans of the statements")
+    if share_subtrees and spans != "none":
+        raise ValueError("subtrees can only be shared if their spans are not kept")
+    if share_identifiers and spans != "none":
+        raise ValueError("identifiers can only be shared if their spans are not kept")
+    # The shared identifier of each name, for the whole parse.
+    identifiers: Optional[Dict[str, ast.Identifier]] = (
+        {} if share_identifiers or share_subtrees else None
+    )
+    _check_version(parse_version(input_), ignore_version)
+    if fast_path and not permissive:
+        program = _fastpath.parse(
+            input_,
+            functools.partial(
+                _parse_chunk,
+                input_,
+                prediction_mode=prediction_mode,
+                spans=spans,
+                identifiers=identifiers,
+            ),
+            spans=spans != "none",
+            identifiers=identifiers,
+        )
+        if program is not None:
+            if comments:
+                # The fast path does not lex the whole program, but the scanner finds exactly the
+                # comments that the lexer would.
+                _attach_comments(
+                    program,
+                    input_,
+                    [
+                        (found["line"], found["column"], found["text"])
+                        for found in scan(input_).comments
+                    ],
+                )
+            if share_subtrees:
+                ast.SubtreeInterner().intern(program)
+            return program
+    lexer = qasm3Lexer(InputStream(input_))
+    stream = CommonTokenStream(lexer)
+    parser = qasm3Parser(stream)
+    if not permissive:
+        # Raise on lexer errors
+        lexer.addErrorListener(_RaiseOnErrorListener())
+    try:
+        tree = _parse_program(parser, permissive=permissive, prediction_mode=prediction_mode)
+    except (RecognitionException, ParseCancellationException) as exc:
+        raise _recognition_error(exc) from exc
+    program = QASMNodeVisitor(spans=spans, identifiers=identifiers).visitProgram(tree)
+    if comments:
+        _attach_comments(
+            program,
+            input_,
+            [
+                (token.line, token.column, token.text)
+                for token in stream.tokens
+                if token.channel == Token.HIDDEN_CHANNEL
+            ],
+        )
+    if share_subtrees:
+        ast.SubtreeInterner().intern(program)
+    return program
+
+
+def _recognition_error(
+    exc: Exception, line: Optional[int] = None, column: Optional[int] = None
+) -> QASM3ParsingError:
+    """Convert an error raised by the ANTLR parser into a :class:`QASM3ParsingError` at the position
+    of the token that caused it, or at the given position if that is not known."""
+    if isinstance(exc, ParseCancellationException):
+        # The bail-out strategy wraps the original error.
+        message = "parse failed"
+        exc = exc.args[0] if exc.args else exc
+    else:
+        message = exc.message  # type: ignore[attr-defined]
+    token = getattr(exc, "offendingToken", None)
+    if token is not None:
+        line, column = token.line, token.column
+    return QASM3ParsingError(message, line, column)
+
+
+def _parse_program(parser: qasm3Parser, *, permissive: bool, prediction_mode: str):
+    """Run the ``program`` rule of an ANTLR parser that has a fresh token stream, using the given
+    prediction mode."""
+    if prediction_mode == "two-stage":
+        # SLL prediction is only guaranteed to produce the correct tree if it produces a tree at
+        # all, so the first stage bails out at the first error without reporting it, and we retry
+        # in full LL mode.  The token stream is kept, so the input is only lexed once.
+        listeners = parser._listeners
+        parser.removeErrorListeners()
+        parser._errHandler = BailErrorStrategy()
+        parser._interp.predictionMode = PredictionMode.SLL
+        try:
+            return parser.program()
+        except ParseCancellationException:
+            pass
+        parser._listeners = listeners
+        parser._interp.predictionMode = PredictionMode.LL
+        parser.reset()
+    # For some reason, the Python 3 runtime for ANTLR 4 is missing the setter method
+    # `setErrorHandler`, so we have to set the attribute directly.
+    parser._errHandler = DefaultErrorStrategy() if permissive else BailErrorStrategy()
+    return parser.program()
+
+
+def _check_prediction_mode(prediction_mode: str):
+    if prediction_mode not in PREDICTION_MODES:
+        raise ValueError(
+            f"unknown prediction mode '{prediction_mode}', expected one of {PREDICTION_MODES}"
+        )
+
+
+def _check_spans(spans: str):
+    if spans not in SPAN_MODES:
+        raise ValueError(f"unknown span mode '{spans}', expected one of {SPAN_MODES}")
+
+
+def _check_version(version: Optional[Tuple[int, ...]], ignore_version: bool):
     if version is None:
         version = MIN_SUPPORTED_VERSION
     if not ignore_version:
@@ -207,23 +476,962 @@ def parse(input_: str, *, permissive=False, ignore_version=False) -> ast.Program
             )
         if not MIN_SUPPORTED_VERSION <= version <= MAX_SUPPORTED_VERSION:
             raise QASM3ParsingError(f"program reports being unsupported version '{version_str}'")
-    lexer = qasm3Lexer(InputStream(input_))
-    stream = CommonTokenStream(lexer)
-    parser = qasm3Parser(stream)
-    if not permissive:
-        # For some reason, the Python 3 runtime for ANTLR 4 is missing the
-        # setter method `setErrorHandler`, so we have to set the attribute
-        # directly.
-        parser._errHandler = BailErrorStrategy()
-        # Raise on lexer errors
-        lexer.addErrorListener(_RaiseOnErrorListener())
+
+
+def _parse_fragment(
+    text: str,
+    line: int,
+    column: int,
+    *,
+    prediction_mode: str,
+    spans: str = "eager",
+    identifiers: Optional[Dict[str, ast.Identifier]] = None,
+) -> ast.Program:
+    """Parse a sequence of complete top-level statements as if they were a complete program, but
+    with the positions offset so that the first character is at the given line and column.  All
+    errors are raised as :class:`QASM3ParsingError` without being printed."""
+    lexer = qasm3Lexer(InputStream(text))
+    lexer.line = line
+    lexer.column = column
+    lexer.removeErrorListeners()
+    lexer.addErrorListener(_RaiseOnErrorListener())
+    parser = qasm3Parser(CommonTokenStream(lexer))
+    parser.removeErrorListeners()
+    try:
+        tree = _parse_program(parser, permissive=False, prediction_mode=prediction_mode)
+    except (RecognitionException, ParseCancellationException) as exc:
+        raise _recognition_error(exc, line, column) from exc
+    return QASMNodeVisitor(spans=spans, identifiers=identifiers).visitProgram(tree)
+
+
+def _parse_chunk(
+    input_: str,
+    start: int,
+    end: int,
+    line: int,
+    column: int,
+    *,
+    prediction_mode: str,
+    spans: str = "eager",
+    identifiers: Optional[Dict[str, ast.Identifier]] = None,
+) -> Optional[ast.Program]:
+    """Parse the top-level statements in ``input_[start:end]`` for the fast path.
+
+    Returns ``None`` if there was any error, without reporting it; the whole program should then be
+    parsed again with :func:`parse` so that errors are reported in the normal manner."""
+    try:
+        return _parse_fragment(
+            input_[start:end],
+            line,
+            column,
+            prediction_mode=prediction_mode,
+            spans=spans,
+            identifiers=identifiers,
+        )
+    except QASM3ParsingError:
+        return None
+
+
+@dataclasses.dataclass
+class ParserStatistics:
+    """Counters of the work done by a :class:`Parser` since it was created, or since its
+    statistics were last reset."""
+
+    parses: int = 0
+    """The number of programs parsed, including those that failed."""
+    warm_parses: int = 0
+    """The number of those programs whose every prediction was answered from the shared prediction
+    tables, without simulating the grammar."""
+    dfa_misses: int = 0
+    """The number of transitions that were missing from the shared prediction tables, and had to be
+    computed by simulating the grammar and then added to the tables."""
+    ll_fallbacks: int = 0
+    """The number of two-stage parses that failed in the first stage, and were parsed again with
+    full LL prediction."""
+    tokens: int = 0
+    """The number of tokens produced by the lexer, including comments and whitespace."""
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of parses that were warm, or zero if nothing has been parsed."""
+        return self.warm_parses / self.parses if self.parses else 0.0
+
+
+class _CountingLexerATNSimulator(LexerATNSimulator):
+    """A lexer simulator that counts its misses in the DFA.  Misses are already expensive, so this
+    does not slow down lexing with a warm DFA.  The DFA never stores transitions on the end of the
+    input or on non-ASCII characters, so those are not counted."""
+
+    def __init__(self, owner: "Parser", recognizer: qasm3Lexer):
+        super().__init__(
+            recognizer, recognizer.atn, recognizer.decisionsToDFA, PredictionContextCache()
+        )
+        self._owner = owner
+
+    def computeTargetState(self, input, s, t):  # pylint: disable=redefined-builtin
+        if self.MIN_DFA_EDGE <= t <= self.MAX_DFA_EDGE:
+            self._owner.statistics.dfa_misses += 1
+        return super().computeTargetState(input, s, t)
+
+
+class _CountingParserATNSimulator(ParserATNSimulator):
+    """A parser simulator that counts its misses in the DFA.  Predictions that need full context
+    are always simulated, so they count as misses too."""
+
+    def __init__(self, owner: "Parser", recognizer: qasm3Parser):
+        super().__init__(
+            recognizer, recognizer.atn, recognizer.decisionsToDFA, recognizer.sharedContextCache
+        )
+        self._owner = owner
+
+    def computeTargetState(self, dfa, previousD, t):
+        self._owner.statistics.dfa_misses += 1
+        return super().computeTargetState(dfa, previousD, t)
+
+    def execATNWithFullContext(self, dfa, D, s0, input, startIndex, outerContext):
+        # pylint: disable=redefined-builtin
+        self._owner.statistics.dfa_misses += 1
+        return super().execATNWithFullContext(dfa, D, s0, input, startIndex, outerContext)
+
+
+class Parser:
+    """A reusable parser for complete OpenQASM 3 programs.
+
+    :meth:`parse` produces the same output as :func:`~openqasm3.parse` with the same arguments, but
+    the ANTLR lexer, token stream and parser are created once and reset for each program rather
+    than being rebuilt, which is faster when parsing many small programs.  ANTLR's prediction
+    tables are shared by every parser in the process regardless, so they stay warm between calls;
+    :attr:`statistics` records how often parsing needed to add to them.
+
+    A :class:`Parser` may be used for any number of programs, including after a parse has failed,
+    but it must not be used by more than one thread at once.
+
+    The keyword arguments have the same meaning as those of :func:`~openqasm3.parse`.
+    """
+
+    def __init__(
+        self,
+        *,
+        permissive=False,
+        ignore_version=False,
+        prediction_mode="two-stage",
+        fast_path=False,
+        spans="eager",
+    ):
+        _check_prediction_mode(prediction_mode)
+        _check_spans(spans)
+        self.permissive = permissive
+        self.ignore_version = ignore_version
+        self.prediction_mode = prediction_mode
+        self.fast_path = fast_path
+        self.spans = spans
+        self.statistics = ParserStatistics()
+        """The :class:`ParserStatistics` of this parser."""
+        self._lexer = qasm3Lexer(None)
+        self._lexer._interp = _CountingLexerATNSimulator(self, self._lexer)
+        self._stream = CommonTokenStream(self._lexer)
+        self._parser = qasm3Parser(self._stream)
+        self._parser._interp = _CountingParserATNSimulator(self, self._parser)
+        # The listeners that report errors in the normal manner, and those used for the fast path's
+        # fragments, whose errors are only reported if the whole program is then parsed normally.
+        self._lexer_listeners = list(self._lexer._listeners)
+        if not permissive:
+            # Raise on lexer errors
+            self._lexer_listeners.append(_RaiseOnErrorListener())
+        self._parser_listeners = list(self._parser._listeners)
+        self._quiet_lexer_listeners = [_RaiseOnErrorListener()]
+
+    def reset_statistics(self):
+        """Set all the counters in :attr:`statistics` back to zero."""
+        self.statistics = ParserStatistics()
+
+    def parse(self, input_: str) -> ast.Program:
+        """Parse a complete OpenQASM 3 program from a string.
+
+        :param input_: A string containing a complete OpenQASM 3 program.
+        :return: A complete :obj:`~ast.Program` node.
+        """
+        statistics = self.statistics
+        statistics.parses += 1
+        misses = statistics.dfa_misses
+        try:
+            return self._parse(input_)
+        finally:
+            if statistics.dfa_misses == misses:
+                statistics.warm_parses += 1
+
+    def _parse(self, input_: str) -> ast.Program:
+        _check_version(parse_version(input_), self.ignore_version)
+        if self.fast_path and not self.permissive:
+            program = _fastpath.parse(
+                input_,
+                functools.partial(self._parse_chunk, input_),
+                spans=self.spans != "none",
+            )
+            if program is not None:
+                return program
+        try:
+            tree = self._run(input_, 1, 0, quiet=False)
+        except (RecognitionException, ParseCancellationException) as exc:
+            raise _recognition_error(exc) from exc
+        return QASMNodeVisitor(spans=self.spans).visitProgram(tree)
+
+    def _parse_chunk(
+        self, input_: str, start: int, end: int, line: int, column: int
+    ) -> Optional[ast.Program]:
+        """The equivalent of :func:`_parse_chunk` for the fast path of this parser."""
+        try:
+            tree = self._run(input_[start:end], line, column, quiet=True)
+        except (RecognitionException, ParseCancellationException, QASM3ParsingError):
+            return None
+        try:
+            return QASMNodeVisitor(spans=self.spans).visitProgram(tree)
+        except QASM3ParsingError:
+            return None
+
+    def _run(self, text: str, line: int, column: int, *, quiet: bool):
+        """Run the ``program`` rule over ``text``, whose first character is at the given line and
+        column, using the existing ANTLR objects.  If ``quiet`` is true, errors are raised without
+        being printed."""
+        lexer, parser, stream = self._lexer, self._parser, self._stream
+        lexer.inputStream = InputStream(text)
+        lexer.line = line
+        lexer.column = column
+        lexer._listeners = self._quiet_lexer_listeners if quiet else self._lexer_listeners
+        stream.setTokenSource(lexer)
+        parser.setTokenStream(stream)
+        parser._listeners = [] if quiet else self._parser_listeners
+        try:
+            tree = _parse_program(
+                parser,
+                permissive=self.permissive and not quiet,
+                prediction_mode=self.prediction_mode,
+            )
+        finally:
+            self.statistics.tokens += len(stream.tokens)
+            if (
+                self.prediction_mode == "two-stage"
+                and parser._interp.predictionMode == PredictionMode.LL
+            ):
+                self.statistics.ll_fallbacks += 1
+            # Release the input and its tokens, which may be large.
+            lexer.inputStream = None
+            stream.setTokenSource(lexer)
+            parser.setTokenStream(stream)
+        return tree
+
+
+_WORKER_PARSERS: Dict[Tuple[Tuple[str, object], ...], Parser] = {}
+"""The parsers used by :func:`parse_many` in this process, keyed by their options."""
+
+
+def parse_many(
+    sources: Iterable[Union[str, os.PathLike]],
+    *,
+    workers: Optional[int] = None,
+    permissive=False,
+    ignore_version=False,
+    prediction_mode="two-stage",
+    fast_path=False,
+) -> List[Union[ast.Program, QASM3ParsingError, OSError]]:
+    """
+    Parse many complete OpenQASM 3 programs in a pool of worker processes.
+
+    The ANTLR runtime is pure Python, so a single process can only parse one program at a time.
+    This spreads the programs over several processes, and sends the parsed ASTs back in a compact
+    pickled form.
+
+    :param sources: The programs to parse.  Each may either be a string containing a complete
+        OpenQASM 3 program, or a path-like object (such as a :class:`pathlib.Path`) to a file that
+        contains one; files are read by the workers.  Unlike in :func:`iter_statements`, a string
+        is always treated as the program itself, so file names should be wrapped in
+        :class:`pathlib.Path`.
+    :param workers: The number of worker processes to use.  Defaults to the number of CPUs.  If
+        this is ``1``, the programs are parsed in the calling process instead.
+    :param permissive: As for :func:`parse`.
+    :param ignore_version: As for :func:`parse`.
+    :param prediction_mode: As for :func:`parse`.
+    :param fast_path: As for :func:`parse`.
+    :return: A list with an entry for each source, in the same order.  The entry is the parsed
+        :obj:`~ast.Program` if parsing succeeded.  Otherwise, it is the :class:`QASM3ParsingError`
+        that would have been raised by :func:`parse`, with its ``filename`` set if the source was
+        a file, or the :class:`OSError` raised if the file could not be read.  Any other exception
+        is raised.
+    """
+    _check_prediction_mode(prediction_mode)
+    sources = list(sources)
+    options = (
+        ("permissive", permissive),
+        ("ignore_version", ignore_version),
+        ("prediction_mode", prediction_mode),
+        ("fast_path", fast_path),
+    )
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"the number of workers must be at least 1, but got {workers}")
+    workers = min(workers, len(sources))
+    if workers <= 1:
+        return [_parse_source(source, options) for source in sources]
+    # Programs are sent to the workers in batches, to amortise the cost of the round trip.
+    chunksize = max(1, len(sources) // (4 * workers))
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        results = executor.map(
+            functools.partial(_parse_source_in_worker, options=options),
+            sources,
+            chunksize=chunksize,
+        )
+        return [
+            _transfer.loads(result) if isinstance(result, bytes) else result for result in results
+        ]
+
+
+def _parse_source(
+    source: Union[str, os.PathLike], options: Tuple[Tuple[str, object], ...]
+) -> Union[ast.Program, QASM3ParsingError, OSError]:
+    """Parse one of the sources given to :func:`parse_many`, returning the error if it fails."""
+    filename = None
+    try:
+        if isinstance(source, str):
+            text = source
+        else:
+            filename = os.fsdecode(source)
+            with open(source, "r") as file:
+                text = file.read()
+        parser = _WORKER_PARSERS.get(options)
+        if parser is None:
+            parser = _WORKER_PARSERS[options] = Parser(**dict(options))
+        return parser.parse(text)
+    except QASM3ParsingError as exc:
+        if filename is None:
+            return exc
+        return QASM3ParsingError(exc.message, exc.line, exc.column, filename)
+    except OSError as exc:
+        return exc
+
+
+def _parse_source_in_worker(
+    source: Union[str, os.PathLike], options: Tuple[Tuple[str, object], ...]
+) -> Union[bytes, QASM3ParsingError, OSError]:
+    result = _parse_source(source, options)
+    if isinstance(result, ast.Program):
+        return _transfer.dumps(result)
+    return result
+
+
+_PARSE_CACHE_VERSION = "\0".join(
+    [__version__, platform.python_version(), str(ast.SLOTTED), ""]
+).encode("utf-8")
+"""A prefix for the keys of :class:`ParseCache`.  Pickled ASTs can only be loaded by the same
+version of the package, built in the same way."""
+
+
+class ParseCache:
+    """A cache of parsed programs, keyed on a hash of their source.
+
+    :meth:`parse` returns the same output as :func:`~openqasm3.parse`, but only parses each distinct
+    source once.  Recently used programs are held in memory, up to ``maxsize`` of them, and if
+    ``directory`` is given, every program is also stored in a file there, which other caches using
+    the same directory (including those in other processes) will find.
+
+    Programs are stored in pickled form, and every call to :meth:`parse` returns a new, independent
+    copy of the AST, so the cache is not affected if a caller modifies one.  The key includes the
+    ``permissive`` and ``ignore_version`` options, since those affect the output; the other options
+    to :func:`~openqasm3.parse` do not, so they are ignored when looking up a program.  Errors are
+    not cached.  The cache files are stored with :mod:`pickle`, so the directory must not be
+    writeable by untrusted users.
+
+    Instances are safe to share between threads.
+    """
+
+    def __init__(
+        self, maxsize: int = 128, directory: Optional[Union[str, os.PathLike]] = None
+    ) -> None:
+        if maxsize < 0:
+            raise ValueError(f"the maximum size must be non-negative, but got {maxsize}")
+        self.maxsize = maxsize
+        self.directory = None if directory is None else pathlib.Path(directory)
+        self.hits = 0
+        """The number of programs that were found in memory."""
+        self.disk_hits = 0
+        """The number of programs that were not in memory, but were found in the directory."""
+        self.misses = 0
+        """The number of programs that had to be parsed."""
+        self._entries: "collections.OrderedDict[str, bytes]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """The number of programs held in memory."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all the programs from memory and reset the counters.  The files in the directory
+        are left alone."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def parse(
+        self,
+        input_: str,
+        *,
+        permissive=False,
+        ignore_version=False,
+        prediction_mode="two-stage",
+        fast_path=False,
+    ) -> ast.Program:
+        """Parse a complete OpenQASM 3 program from a string, or get a copy of it from the cache.
+        The arguments are the same as those of :func:`~openqasm3.parse`."""
+        key = self._key(input_, permissive, ignore_version)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            return _transfer.loads(data)
+        if self.directory is not None:
+            program = self._load(key)
+            if program is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                return program
+        program = parse(
+            input_,
+            permissive=permissive,
+            ignore_version=ignore_version,
+            prediction_mode=prediction_mode,
+            fast_path=fast_path,
+        )
+        data = _transfer.dumps(program)
+        with self._lock:
+            self.misses += 1
+            self._store(key, data)
+        if self.directory is not None:
+            self._save(key, data)
+        return program
+
+    @staticmethod
+    def _key(input_: str, permissive: bool, ignore_version: bool) -> str:
+        digest = hashlib.sha256(_PARSE_CACHE_VERSION)
+        digest.update(bytes([permissive, ignore_version]))
+        digest.update(input_.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _store(self, key: str, data: bytes) -> None:
+        if self.maxsize == 0:
+            return
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> pathlib.Path:
+        return cast(pathlib.Path, self.directory) / f"{key}.pickle"
+
+    def _load(self, key: str) -> Optional[ast.Program]:
+        try:
+            data = self._path(key).read_bytes()
+            program = _transfer.loads(data)
+        except Exception:  # pylint: disable=broad-except
+            # A missing or unreadable file is equivalent to an empty cache.
+            return None
+        if not isinstance(program, ast.Program):
+            return None
+        with self._lock:
+            self._store(key, data)
+        return program
+
+    def _save(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            os.unlink(temporary)
+
+
+class IncludeResolver:
+    """Find, parse and cache the files named by the ``include`` statements of programs.
+
+    An included file is looked for first in the directory of the file that includes it, and then in
+    each of ``search_paths`` in order.  Each file is parsed once, and kept in memory for as long as
+    its modification time and size are unchanged, so a file that is included by many programs, such
+    as ``stdgates.inc``, is only parsed the first time.  As in :class:`ParseCache`, every call returns
+    new, independent copies of the ASTs of the included files.
+
+    A file that cannot be found, a cycle of files that include one another, and errors in parsing an
+    included file are all raised as :class:`QASM3ParsingError`, with the ``filename`` set to that of
+    the file containing the error, if it is known.  Errors in reading a file that was found are
+    raised as :class:`OSError`.
+
+    Instances are safe to share between threads.
+
+    :param search_paths: The directories to search for included files.
+    :param ignore_version: As for :func:`parse`.
+    :param prediction_mode: As for :func:`parse`.
+    :param fast_path: As for :func:`parse`.
+    :param spans: As for :func:`parse`.  The spans of included statements refer to the positions
+        in the included file.
+    """
+
+    def __init__(
+        self,
+        search_paths: Iterable[Union[str, os.PathLike]] = (),
+        *,
+        ignore_version=False,
+        prediction_mode="two-stage",
+        fast_path=False,
+        spans="eager",
+    ) -> None:
+        _check_prediction_mode(prediction_mode)
+        _check_spans(spans)
+        self.search_paths = [pathlib.Path(path) for path in search_paths]
+        self.ignore_version = ignore_version
+        self.prediction_mode = prediction_mode
+        self.fast_path = fast_path
+        self.spans = spans
+        self.hits = 0
+        """The number of included files that were found in memory."""
+        self.misses = 0
+        """The number of included files that had to be parsed, because they had not been parsed
+        before or had changed since."""
+        # The parsed files, keyed by their resolved path, with the modification time and size that
+        # they had when they were read.
+        self._entries: Dict[pathlib.Path, Tuple[int, int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """The number of parsed files held in memory."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all the parsed files from memory and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def find(
+        self, filename: str, directory: Optional[Union[str, os.PathLike]] = None
+    ) -> Optional[pathlib.Path]:
+        """Get the resolved path of the file that ``include "filename";`` refers to, in a file in
+        ``directory`` (or in a program that is not in a file, if ``directory`` is ``None``).
+        Returns ``None`` if there is no such file."""
+        candidates = [] if directory is None else [pathlib.Path(directory)]
+        candidates.extend(self.search_paths)
+        for candidate in candidates:
+            path = candidate / filename
+            if path.is_file():
+                return path.resolve()
+        return None
+
+    def parse_file(self, path: Union[str, os.PathLike]) -> ast.Program:
+        """Parse the file at ``path``, or get a copy of it from memory if it has not changed since it
+        was last parsed.  The ``include`` statements in the file are not resolved."""
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return _transfer.loads(entry[2])
+        source = path.read_text(encoding="utf-8")
+        try:
+            program = parse(
+                source,
+                ignore_version=self.ignore_version,
+                prediction_mode=self.prediction_mode,
+                fast_path=self.fast_path,
+                spans=self.spans,
+            )
+        except QASM3ParsingError as exc:
+            raise QASM3ParsingError(exc.message, exc.line, exc.column, str(path)) from exc
+        data = _transfer.dumps(program)
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+        return program
+
+    def resolve(
+        self, program: ast.Program, directory: Optional[Union[str, os.PathLike]] = None
+    ) -> List[Tuple[ast.Include, ast.Program]]:
+        """Find and parse the files included by ``program``, whose own file is in ``directory``.
+
+        :return: A pair for each ``include`` statement at the top level of ``program``, in order,
+            of the statement and the parsed contents of the file it includes.  The ``include``
+            statements in the included files are already replaced by the contents of the files
+            that they include, as by :meth:`inline`.
+        """
+        return self._resolve(program, None if directory is None else pathlib.Path(directory), [])
+
+    def inline(
+        self, program: ast.Program, directory: Optional[Union[str, os.PathLike]] = None
+    ) -> ast.Program:
+        """Get a new program in which every ``include`` statement of ``program``, whose own file is
+        in ``directory``, is replaced by the statements of the file that it includes, which have
+        their own ``include`` statements replaced in the same way.  The other statements are the
+        same objects as in ``program``."""
+        return self._inline(program, None if directory is None else pathlib.Path(directory), [])
+
+    def _inline(
+        self, program: ast.Program, directory: Optional[pathlib.Path], chain: List[pathlib.Path]
+    ) -> ast.Program:
+        resolved = iter(self._resolve(program, directory, chain))
+        statements: List[Union[ast.Statement, ast.Pragma]] = []
+        for statement in program.statements:
+            if isinstance(statement, ast.Include):
+                statements.extend(next(resolved)[1].statements)
+            else:
+                statements.append(statement)
+        out = ast.Program(statements=statements, version=program.version)
+        out.span = program.span
+        out.comments = program.comments
+        out.version_comments = program.version_comments
+        return out
+
+    def _resolve(
+        self, program: ast.Program, directory: Optional[pathlib.Path], chain: List[pathlib.Path]
+    ) -> List[Tuple[ast.Include, ast.Program]]:
+        """Resolve the includes of a program, which is the last file in ``chain`` of files that
+        include one another, or is not in a file if ``chain`` is empty."""
+        including = str(chain[-1]) if chain else None
+        out = []
+        for statement in program.statements:
+            if not isinstance(statement, ast.Include):
+                continue
+            line, column = (
+                (None, None)
+                if statement.span is None
+                else (statement.span.start_line, statement.span.start_column)
+            )
+            path = self.find(statement.filename, directory)
+            if path is None:
+                raise QASM3ParsingError(
+                    f"cannot find the included file '{statement.filename}'",
+                    line,
+                    column,
+                    including,
+                )
+            if path in chain:
+                cycle = " -> ".join(str(part) for part in chain[chain.index(path) :] + [path])
+                raise QASM3ParsingError(f"include cycle: {cycle}", line, column, including)
+            included = self._inline(self.parse_file(path), path.parent, chain + [path])
+            out.append((statement, included))
+        return out
+
+
+@dataclasses.dataclass(frozen=True)
+class TextEdit:
+    """A replacement of a range of the source of a program with new text.  Positions follow the
+    same conventions as :class:`~ast.Span`, with lines numbered from one and columns from zero, but
+    the end of the range is exclusive, so an insertion has the same start and end."""
+
+    start_line: int
+    start_column: int
+    end_line: int
+    end_column: int
+    text: str
+    """The text that replaces the range."""
+
+    def apply(self, source: str) -> str:
+        """Get the source that results from making this edit to ``source``."""
+        start, end = self._range(_line_starts(source), len(source))
+        return source[:start] + self.text + source[end:]
+
+    def _range(self, line_starts: List[int], length: int) -> Tuple[int, int]:
+        """Get the indices of the start and end of the edit in a source with the given line starts
+        and length."""
+        if not 0 < self.start_line <= len(line_starts) or not 0 < self.end_line <= len(line_starts):
+            raise ValueError(f"edit {self} is outside the source")
+        start = line_starts[self.start_line - 1] + self.start_column
+        end = line_starts[self.end_line - 1] + self.end_column
+        if not 0 <= start <= end <= length:
+            raise ValueError(f"edit {self} is outside the source")
+        return start, end
+
+
+def _line_starts(source: str) -> List[int]:
+    """Get the index of the first character of each line of ``source``."""
+    out = [0]
+    for line in source.split("\n")[:-1]:
+        out.append(out[-1] + len(line) + 1)
+    return out
+
+
+def reparse(
+    program: ast.Program,
+    source: str,
+    edit: TextEdit,
+    *,
+    prediction_mode="two-stage",
+    spans="eager",
+) -> ast.Program:
+    """Update a program that was parsed from ``source`` for an edit to the source.
+
+    Only the top-level statements that the edit touches are parsed again, starting from the last
+    statement that starts before the edit, and continuing until the statements found in the edited
+    source are back in step with those of the old one.  The statements after that are moved into
+    the new program, and the spans of all their nodes are shifted in place to their new positions.
+    The result is the same as parsing the edited source with :func:`parse`, but ``program`` should
+    not be used afterwards, since it shares those statements.  Edits that touch the version
+    statement or anything before the first statement, and programs without spans, are parsed
+    again in full.  Comments are not kept.
+
+    :param program: The program parsed from ``source``.
+    :param source: The source before the edit.
+    :param edit: The edit to make to ``source``.
+    :param prediction_mode: As for :func:`parse`.
+    :param spans: As for :func:`parse`.  This should be the mode that ``program`` was parsed with.
+    :return: The program parsed from the edited source.
+    :raises QASM3ParsingError: If the edited source is not a valid program, exactly as
+        :func:`parse` would.
+    """
+    _check_prediction_mode(prediction_mode)
+    _check_spans(spans)
+    line_starts = _line_starts(source)
+    start, end = edit._range(line_starts, len(source))  # pylint: disable=protected-access
+    new_source = source[:start] + edit.text + source[end:]
+    delta = len(edit.text) - (end - start)
+    statements = program.statements
+    spans_ = [statement.span for statement in statements]
+    if any(span is None for span in spans_):
+        return parse(new_source, prediction_mode=prediction_mode, spans=spans)
+    offsets = [
+        line_starts[span.start_line - 1] + span.start_column
+        for span in cast(List[ast.Span], spans_)
+    ]
+    # The statement to start parsing from is the last one that starts before the edit.
+    first = bisect.bisect_left(offsets, start) - 1
+    if first < 0:
+        return parse(new_source, prediction_mode=prediction_mode, spans=spans)
+    # Walk the statements of the edited source from there, until one starts after the edit at the
+    # same place as a statement in the old source, or the end is reached.
+    following = first + 1
+    pos = offsets[first]
+    edit_end = start + len(edit.text)
+    while True:
+        pos = skip_trivia(new_source, pos)
+        if pos >= len(new_source):
+            following = len(offsets)
+            break
+        if pos >= edit_end:
+            while following < len(offsets) and offsets[following] + delta < pos:
+                following += 1
+            if following < len(offsets) and offsets[following] + delta == pos:
+                break
+        pos = statement_end(new_source, pos)
+    head = cast(ast.Span, spans_[first])
+    text = new_source[offsets[first] : pos]
     try:
-        tree = parser.program()
-    except RecognitionException as exc:
-        raise QASM3ParsingError(exc.message) from exc
-    except ParseCancellationException as exc:
-        raise QASM3ParsingError("parse failed") from exc
-    return QASMNodeVisitor().visitProgram(tree)
+        fragment = _parse_fragment(
+            text, head.start_line, head.start_column, prediction_mode=prediction_mode, spans=spans
+        )
+    except QASM3ParsingError:
+        fragment = None
+    if fragment is None or fragment.version is not None:
+        # Report errors exactly as a full parse would, with the same positions and messages.
+        return parse(new_source, prediction_mode=prediction_mode, spans=spans)
+    rest = statements[following:]
+    if not (first or fragment.statements or rest):
+        # An empty program has no span, which is left to the full parser.
+        return parse(new_source, prediction_mode=prediction_mode, spans=spans)
+    if rest:
+        old = cast(ast.Span, spans_[following])
+        line, column = _advance_position(
+            new_source, offsets[first], pos, head.start_line, head.start_column
+        )
+        _shift_spans(rest, old.start_line, line - old.start_line, column - old.start_column)
+    out = ast.Program(
+        statements=statements[:first] + fragment.statements + rest, version=program.version
+    )
+    if program.span is not None:
+        last = cast(ast.Span, out.statements[-1].span)
+        out.span = ast.Span(
+            program.span.start_line, program.span.start_column, last.end_line, last.end_column
+        )
+    return out
+
+
+def _shift_spans(
+    statements: List[Union[ast.Statement, ast.Pragma]], line: int, lines: int, columns: int
+) -> None:
+    """Move the spans of every node in ``statements`` down by ``lines``, and the positions that
+    were on ``line`` right by ``columns`` as well."""
+    if not lines and not columns:
+        return
+    if not lines:
+        # Only the positions on the line itself move, and they are all in the statements that start
+        # on that line.
+        statements = list(
+            itertools.takewhile(
+                lambda statement: cast(ast.Span, statement.span).start_line == line, statements
+            )
+        )
+    stack: list = list(statements)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.QASMNode):
+            span = node.span
+            if span is not None:
+                node.span = ast.Span(
+                    span.start_line + lines,
+                    span.start_column + (columns if span.start_line == line else 0),
+                    span.end_line + lines,
+                    span.end_column + (columns if span.end_line == line else 0),
+                )
+            stack.extend(getattr(node, name) for name in _child_fields(type(node)))
+        elif isinstance(node, (list, tuple)):
+            stack.extend(node)
+
+
+_STREAM_BLOCK_SIZE = 1 << 16
+"""The minimum number of characters that :func:`iter_statements` reads from its input at once."""
+
+
+def iter_statements(
+    source: Union[str, os.PathLike, TextIO],
+    *,
+    ignore_version=False,
+    prediction_mode="two-stage",
+    fast_path=False,
+) -> Iterator[Union[ast.Statement, ast.Pragma]]:
+    """
+    Parse an OpenQASM 3 program one top-level statement at a time, without reading the whole program
+    into memory at once.
+
+    The statements and their spans are the same as those in the :attr:`~ast.Program.statements` of
+    the output of :func:`parse`, but only a small part of the input text and only a single
+    statement's ANTLR parse tree are held in memory at any one time, so arbitrarily large programs
+    can be processed in bounded memory.  The version statement is checked, but is not yielded.
+
+    Errors are raised when the offending statement is reached, so some statements may have been
+    yielded before an error in a later one is raised.  The error messages are not always identical
+    to those from :func:`parse`, since each statement is parsed in isolation.
+
+    :param source: A file-like object opened in text mode, or the path to a file, containing a
+        complete OpenQASM 3 program.  Note that a string is interpreted as a path, not as the program
+        itself; use :class:`io.StringIO` to iterate over the statements of a string.
+    :param ignore_version: As in :func:`parse`.
+    :param prediction_mode: As in :func:`parse`.
+    :param fast_path: As in :func:`parse`.
+    :return: An iterator of the top-level :obj:`~ast.Statement` and :obj:`~ast.Pragma` nodes.
+    """
+    _check_prediction_mode(prediction_mode)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r") as file:
+            yield from _iter_statements(file, ignore_version, prediction_mode, fast_path)
+    else:
+        yield from _iter_statements(source, ignore_version, prediction_mode, fast_path)
+
+
+def _iter_statements(
+    source: TextIO, ignore_version: bool, prediction_mode: str, fast_path: bool
+) -> Iterator[Union[ast.Statement, ast.Pragma]]:
+    buffer = ""
+    # The index in `buffer` up to which we have parsed, and its line and column in the program.
+    start, line, column = 0, 1, 0
+    exhausted = False
+    first = True
+    while True:
+        pos = skip_trivia(buffer, start)
+        end = None
+        if pos < len(buffer):
+            end = (statement_end if exhausted else partial_statement_end)(buffer, pos)
+        if end is None:
+            if exhausted:
+                return
+            buffer = buffer[start:]
+            start = 0
+            # Read at least as much as we already have, so long statements are not rescanned
+            # quadratically often.
+            data = source.read(max(_STREAM_BLOCK_SIZE, len(buffer)))
+            if data:
+                buffer += data
+            else:
+                exhausted = True
+            continue
+        line, column = _advance_position(buffer, start, pos, line, column)
+        if first:
+            _check_version(parse_version(buffer[pos:end]), ignore_version)
+        node = _fastpath.parse_statement(buffer, pos, end, line, column) if fast_path else None
+        if node is not None:
+            yield node
+        else:
+            program = _parse_fragment(
+                buffer[pos:end], line, column, prediction_mode=prediction_mode
+            )
+            if program.version is not None and not first:
+                raise QASM3ParsingError(
+                    "the version statement must be the first statement", line, column
+                )
+            yield from program.statements
+            del program
+        first = False
+        line, column = _advance_position(buffer, pos, end, line, column)
+        start = end
+
+
+def load_antlr_cache(directory: Optional[Union[str, os.PathLike]] = None) -> bool:
+    """
+    Load ANTLR's prediction tables from a cache written by :func:`save_antlr_cache`, replacing any
+    that have already been built in this process.  This should be called before parsing anything.
+
+    :param directory: The cache directory.  Defaults to the per-user cache directory.
+    :return: Whether there was a usable cache.  A missing, corrupt or incompatible cache is ignored.
+    """
+    if directory is None:
+        directory = _antlr_cache.default_directory()
+    return _antlr_cache.load(directory)
+
+
+def save_antlr_cache(
+    directory: Optional[Union[str, os.PathLike]] = None,
+) -> Optional[pathlib.Path]:
+    """
+    Save the ANTLR prediction tables that have been built up by parsing in this process, so that
+    other processes can load them with :func:`load_antlr_cache`.  The tables are most useful if
+    the programs parsed in this process use the same language features as the programs that will
+    be parsed by the loading processes.
+
+    :param directory: The cache directory, which is created if it does not exist.  Defaults to the
+        per-user cache directory.
+    :return: The path to the cache file, or ``None`` if the tables were too deeply nested to save.
+    """
+    if directory is None:
+        directory = _antlr_cache.default_directory()
+    return _antlr_cache.save(directory)
+
+
+def _use_antlr_cache_from_environment():
+    setting = os.environ.get("OPENQASM3_ANTLR_CACHE", "")
+    if setting in ("", "0"):
+        return
+    directory = _antlr_cache.default_directory() if setting == "1" else pathlib.Path(setting)
+    load_antlr_cache(directory)
+    loaded_states = _antlr_cache.states()
+
+    def save_if_grown():
+        if _antlr_cache.states() > loaded_states:
+            try:
+                save_antlr_cache(directory)
+            except OSError:
+                pass
+
+    atexit.register(save_if_grown)
+
+
+def _advance_position(text: str, start: int, end: int, line: int, column: int) -> Tuple[int, int]:
+    """Get the line and column of ``text[end]``, given those of ``text[start]``."""
+    newlines = text.count("\n", start, end)
+    if not newlines:
+        return line, column + end - start
+    return line + newlines, end - text.rindex("\n", start, end) - 1
 
 
 def get_span(node: Union[ParserRuleContext, TerminalNode]) -> ast.Span:
@@ -253,43 +1461,160 @@ def get_comments(input_: str) -> List[dict]:
         - 'text': the comment text (including comment markers)
         - 'line': line number where the comment starts
         - 'column': column number where the comment starts
+
+    The comments are found by :func:`scan`, without running the ANTLR lexer.
     """
-    input_stream = InputStream(input_)
-    lexer = qasm3Lexer(input_stream)
-    token_stream = CommonTokenStream(lexer)
-    token_stream.fill()
-
-    comments = []
-    all_tokens = token_stream.getTokens(0, len(token_stream.tokens))
-
-    for token in all_tokens:
-        if token.channel == lexer.HIDDEN:
-            if token.type == lexer.LineComment:
-                comments.append(
-                    {
-                        "type": "line",
-                        "text": token.text,
-                        "line": token.line,
-                        "column": token.column,
-                    }
-                )
-            elif token.type == lexer.BlockComment:
-                comments.append(
-                    {
-                        "type": "block",
-                        "text": token.text,
-                        "line": token.line,
-                        "column": token.column,
-                    }
-                )
+    return scan(input_).comments
+
+
+# The fields of the statements that hold blocks of further statements.  The blocks of switch
+# statements are handled separately, because they are nested inside the cases.
+_STATEMENT_BLOCKS = {
+    ast.CompoundStatement: ("statements",),
+    ast.BranchingStatement: ("if_block", "else_block"),
+    ast.WhileLoop: ("block",),
+    ast.ForInLoop: ("block",),
+    ast.Box: ("body",),
+    ast.QuantumGateDefinition: ("body",),
+    ast.SubroutineDefinition: ("body",),
+}
+
+
+def _statements_in_order(
+    statements: Iterable[Union[ast.Statement, ast.Pragma]],
+    out: List[Union[ast.Statement, ast.Pragma]],
+) -> None:
+    """Append ``statements`` and all the statements in their blocks to ``out``, in source order."""
+    for statement in statements:
+        out.append(statement)
+        if isinstance(statement, ast.SwitchStatement):
+            for _, block in statement.cases:
+                _statements_in_order(block.statements, out)
+            if statement.default is not None:
+                _statements_in_order(statement.default.statements, out)
+        else:
+            for name in _STATEMENT_BLOCKS.get(type(statement), ()):
+                _statements_in_order(getattr(statement, name), out)
+
+
+def _attach_comments(program: ast.Program, source: str, comments: List[Tuple[int, int, str]]):
+    """Attach comments, given as their line, column and text in source order, to the statements of
+    a program that has spans, as described for :func:`parse`.
+
+    This is a single merge of the comments with the statements, which are ordered by where they
+    start.  The statements that have started but not yet ended before the current position are
+    always nested inside one another, so they are kept on a stack.  Comments inside a statement are
+    placed by the characters around them: the last one before the comment, skipping earlier
+    comments, tells whether it directly follows a statement or the ``}`` of a block, and the first
+    one after it whether it is at the end of a block."""
+    statements: List[Union[ast.Statement, ast.Pragma]] = []
+    _statements_in_order(program.statements, statements)
+    spans = [cast(ast.Span, statement.span) for statement in statements]
+    starts = [(span.start_line, span.start_column) for span in spans]
+    ends = [(span.end_line, span.end_column) for span in spans]
+    line_starts = _line_starts(source)
+    # Comments before the version statement, which has no node, stay in front of it, and those up
+    # to the end of its line are attached to it.
+    header = version_end = (0, 0)
+    if program.version is not None:
+        start = skip_trivia(source, 0)
+        header = _advance_position(source, 0, start, 1, 0)
+        match = _LEADING_VERSION.match(source, start)
+        if match is not None:
+            end = skip_trivia(source, match.end())
+            version_end = _advance_position(source, start, end, *header)
+    # The offsets of the comments that have been attached, to skip them when looking back.
+    comment_starts: List[int] = []
+    comment_ends: List[int] = []
+
+    def previous(offset: int) -> int:
+        """Get the offset of the last character before ``offset`` that is not trivia, or -1."""
+        earlier = len(comment_ends) - 1
+        while True:
+            while offset and source[offset - 1].isspace():
+                offset -= 1
+            if earlier < 0 or comment_ends[earlier] != offset:
+                return offset - 1
+            offset = comment_starts[earlier]
+            earlier -= 1
+
+    # The index of the next statement to start, the open statements, and the statement that most
+    # recently ended.
+    following = 0
+    open_: List[int] = []
+    ended: Optional[int] = None
+    for line, column, text in comments:
+        position = (line, column)
+        while following < len(statements) and starts[following] < position:
+            while open_ and ends[open_[-1]] < starts[following]:
+                ended = open_.pop()
+            open_.append(following)
+            following += 1
+        while open_ and ends[open_[-1]] < position:
+            ended = open_.pop()
+        offset = line_starts[line - 1] + column
+        before = previous(offset)
+        # Whether the comment directly follows the statement that most recently ended.
+        after_ended = (
+            ended is not None and before == line_starts[ends[ended][0] - 1] + ends[ended][1]
+        )
+        comment_starts.append(offset)
+        comment_ends.append(offset + len(text))
+        target: Union[ast.Program, ast.Statement, ast.Pragma]
+        if position < header:
+            target, trailing = program, False
+        elif after_ended and ends[cast(int, ended)][0] == line:
+            target, trailing = statements[cast(int, ended)], True
+        elif ended is None and not open_ and (position < version_end or line == version_end[0]):
+            if program.version_comments is None:
+                program.version_comments = []
+            program.version_comments.append(_make_comment(line, column, text, True))
+            continue
+        elif open_:
+            inner = open_[-1]
+            if before >= 0 and source[before] == "}" and not after_ended:
+                # After the end of one of the blocks of the statement, such as before an ``else``.
+                target, trailing = statements[inner], True
+            elif source.startswith("}", skip_trivia(source, offset)):
+                # At the end of a block, so after the last statement in it, if there is one.
+                if after_ended and starts[cast(int, ended)] > starts[inner]:
+                    target, trailing = statements[cast(int, ended)], True
+                else:
+                    target, trailing = statements[inner], True
+            elif following < len(statements) and starts[following] < ends[inner]:
+                target, trailing = statements[following], False
+            else:
+                target, trailing = statements[inner], True
+        elif following < len(statements):
+            target, trailing = statements[following], False
+        else:
+            target, trailing = program, True
+        comment = _make_comment(line, column, text, trailing)
+        if target.comments is None:
+            target.comments = [comment]
+        else:
+            target.comments.append(comment)
+
+
+def _make_comment(line: int, column: int, text: str, trailing: bool) -> ast.Comment:
+    """Make the node of a comment at the given line and column, with its span."""
+    comment = ast.Comment(text, trailing)
+    comment.span = _comment_span(line, column, text)
+    return comment
 
-    return comments
+
+def _comment_span(line: int, column: int, text: str) -> ast.Span:
+    """Get the span of a comment, which ends at its last character like the spans of tokens."""
+    newlines = text.count("\n")
+    if not newlines:
+        return ast.Span(line, column, line, column + len(text) - 1)
+    return ast.Span(line, column, line + newlines, len(text) - text.rindex("\n") - 2)
 
 
 _NodeT = TypeVar("_NodeT", bound=ast.QASMNode)
 
 
-def add_span(node: _NodeT, span: ast.Span) -> _NodeT:
+def add_span(node: _NodeT, span: Optional[ast.Span]) -> _NodeT:
     """Set the span of a node and return the node"""
     node.span = span
     return node
@@ -301,20 +1626,109 @@ def combine_span(first: ast.Span, second: ast.Span):
 
 
 def span(func):
-    """Function decorator to automatic attach span to nodes for visit* methods."""
+    """Function decorator to automatic attach span to nodes for visit* methods.  The span is made
+    in the way set by the ``spans`` mode of the visitor."""
 
     def wrapped(*args, **kwargs):
-        span = get_span(args[1])  # args[1] is ctx
         node = func(*args, **kwargs)
         if node is None:
-            raise ValueError(f"None encountered at {span}")
-        return add_span(node, span)
+            raise ValueError(f"None encountered at {get_span(args[1])}")
+        node.span = args[0]._get_span(args[1])  # args[1] is ctx
+        return node
 
     return wrapped
 
 
-def _visit_identifier(identifier: TerminalNode):
-    return add_span(ast.Identifier(identifier.getText()), get_span(identifier))  # type: ignore[attr-defined]
+class _LazySpan(ast.Span):
+    """A span that refers to the tokens that its node starts and ends with, and only looks up their
+    positions when one of its fields is first read.  If the end is a terminal node rather than a
+    rule, the span ends at the last character of the end token rather than its first.
+
+    This compares equal to a plain :class:`~ast.Span` with the same fields, and is pickled and
+    copied as one.  Setting a field resolves the span first, so the other fields keep their
+    values."""
+
+    __slots__ = ("_first", "_last", "_terminal")
+
+    def __init__(self, first: _TokenWithSpan, last: _TokenWithSpan, terminal: bool):
+        # pylint: disable=super-init-not-called
+        self._first: Optional[_TokenWithSpan] = first
+        self._last: Optional[_TokenWithSpan] = last
+        self._terminal = terminal
+
+    def _resolve(self) -> None:
+        first, last = self._first, self._last
+        assert first is not None and last is not None
+        end_column = last.column + (last.stop - last.start) if self._terminal else last.column
+        _SPAN_FIELDS[0].__set__(self, first.line)
+        _SPAN_FIELDS[1].__set__(self, first.column)
+        _SPAN_FIELDS[2].__set__(self, last.line)
+        _SPAN_FIELDS[3].__set__(self, end_column)
+        # Drop the references to the tokens, so they can be freed once all spans are read.
+        self._first = self._last = None
+
+    def __eq__(self, other):
+        if not isinstance(other, ast.Span):
+            return NotImplemented
+        return (self.start_line, self.start_column, self.end_line, self.end_column) == (
+            other.start_line,
+            other.start_column,
+            other.end_line,
+            other.end_column,
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self):
+        return repr(ast.Span(self.start_line, self.start_column, self.end_line, self.end_column))
+
+    def __reduce__(self):
+        return ast.Span, (self.start_line, self.start_column, self.end_line, self.end_column)
+
+
+# The slot descriptors of `Span`, which `_LazySpan` overrides with properties that resolve it before
+# the field is read or set.
+_SPAN_FIELDS = tuple(
+    getattr(ast.Span, name) for name in ("start_line", "start_column", "end_line", "end_column")
+)
+
+
+def _lazy_field(descriptor):
+    def get(self: _LazySpan):
+        if self._first is not None:
+            self._resolve()  # pylint: disable=protected-access
+        return descriptor.__get__(self)
+
+    def set_(self: _LazySpan, value: int):
+        if self._first is not None:
+            self._resolve()  # pylint: disable=protected-access
+        descriptor.__set__(self, value)
+
+    return property(get, set_, doc=f"The ``{descriptor.__name__}`` of the span.")
+
+
+for _descriptor in _SPAN_FIELDS:
+    setattr(_LazySpan, _descriptor.__name__, _lazy_field(_descriptor))
+del _descriptor
+
+
+def _lazy_span(node: Union[ParserRuleContext, TerminalNode]) -> ast.Span:
+    """The lazy equivalent of :func:`get_span`."""
+    if isinstance(node, ParserRuleContext):
+        return _LazySpan(node.start, node.stop, False)
+    token = cast(_TerminalNodeWithSymbol, node).symbol
+    return _LazySpan(token, token, True)
+
+
+def _no_span(node: Union[ParserRuleContext, TerminalNode]) -> None:
+    return None
+
+
+_SPAN_GETTERS: Dict[str, Callable[[Union[ParserRuleContext, TerminalNode]], Optional[ast.Span]]] = {
+    "eager": get_span,
+    "lazy": _lazy_span,
+    "none": _no_span,
+}
 
 
 def _raise_from_context(ctx: ParserRuleContext, message: str):
@@ -322,7 +1736,16 @@ def _raise_from_context(ctx: ParserRuleContext, message: str):
 
 
 class QASMNodeVisitor(qasm3ParserVisitor):
-    def __init__(self):
+    def __init__(self, *, spans="eager", identifiers: Optional[Dict[str, ast.Identifier]] = None):
+        _check_spans(spans)
+        if identifiers is not None and spans != "none":
+            raise ValueError("identifiers can only be shared if their spans are not kept")
+        # The function that makes the span of a parse-tree node, as set by ``spans``; see
+        # :func:`parse`.
+        self._get_span = _SPAN_GETTERS[spans]
+        # The identifier node of each name, which is shared between all occurrences of the name, or
+        # ``None`` if each occurrence gets its own node; see ``share_identifiers`` of :func:`parse`.
+        self._identifiers = identifiers
         # A stack of "contexts", each of which is a stack of "scopes".  Contexts
         # are for the main program, gates and subroutines, while scopes are
         # loops, if/else and manual scoping constructs.  Each "context" always
@@ -345,6 +1768,35 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     def _current_context(self):
         return self._contexts[-1]
 
+    def _identifier(self, name: str) -> ast.Identifier:
+        """An identifier without a span, or the shared one of its name."""
+        name = sys.intern(name)
+        if self._identifiers is None:
+            return ast.Identifier(name)
+        if (out := self._identifiers.get(name)) is None:
+            out = self._identifiers[name] = ast.Identifier(name)
+        return out
+
+    def _visit_identifier(self, identifier: TerminalNode):
+        return add_span(self._identifier(identifier.getText()), self._get_span(identifier))  # type: ignore[attr-defined]
+
+    def _combine_span(
+        self, first: Optional[ast.Span], second: Optional[ast.Span]
+    ) -> Optional[ast.Span]:
+        """The equivalent of :func:`combine_span` for the ``spans`` mode of this visitor, for spans
+        that it has made.  Unread lazy spans are combined without being resolved."""
+        if first is None or second is None:
+            return None
+        if (
+            first.__class__ is _LazySpan
+            and second.__class__ is _LazySpan
+            and first._first is not None  # type: ignore[attr-defined]
+            and second._last is not None  # type: ignore[attr-defined]
+        ):
+            # pylint: disable=protected-access
+            return _LazySpan(first._first, second._last, second._terminal)  # type: ignore[attr-defined]
+        return combine_span(first, second)
+
     def _current_scope(self):
         return self._contexts[-1][-1]
 
@@ -415,7 +1867,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     @span
     def visitAliasDeclarationStatement(self, ctx: qasm3Parser.AliasDeclarationStatementContext):
         return ast.AliasStatement(
-            target=_visit_identifier(ctx.Identifier()),
+            target=self._visit_identifier(ctx.Identifier()),
             value=self.visit(ctx.aliasExpression()),
         )
 
@@ -480,7 +1932,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
         init = self.visit(ctx.declarationExpression()) if ctx.declarationExpression() else None
         return ast.ClassicalDeclaration(
             type=self.visit(ctx.scalarType() or ctx.arrayType()),
-            identifier=_visit_identifier(ctx.Identifier()),
+            identifier=self._visit_identifier(ctx.Identifier()),
             init_expression=init,
         )
 
@@ -488,7 +1940,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     def visitConstDeclarationStatement(self, ctx: qasm3Parser.ConstDeclarationStatementContext):
         return ast.ConstantDeclaration(
             type=self.visit(ctx.scalarType()),
-            identifier=_visit_identifier(ctx.Identifier()),
+            identifier=self._visit_identifier(ctx.Identifier()),
             init_expression=self.visit(ctx.declarationExpression()),
         )
 
@@ -502,7 +1954,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     def visitDefStatement(self, ctx: qasm3Parser.DefStatementContext):
         if not self._in_global_scope():
             _raise_from_context(ctx, "subroutine definitions must be global")
-        name = _visit_identifier(ctx.Identifier())
+        name = self._visit_identifier(ctx.Identifier())
         arguments = (
             [self.visit(argument) for argument in ctx.argumentDefinitionList().argumentDefinition()]
             if ctx.argumentDefinitionList()
@@ -570,7 +2022,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             self.visit(ctx.returnSignature().scalarType()) if ctx.returnSignature() else None
         )
         return ast.ExternDeclaration(
-            name=_visit_identifier(ctx.Identifier()),
+            name=self._visit_identifier(ctx.Identifier()),
             arguments=arguments,
             return_type=return_type,
         )
@@ -586,7 +2038,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
         block = self._parse_scoped_statements(ctx.body)
         return ast.ForInLoop(
             type=self.visit(ctx.scalarType()),
-            identifier=_visit_identifier(ctx.Identifier()),
+            identifier=self._visit_identifier(ctx.Identifier()),
             set_declaration=set_declaration,
             block=block,
         )
@@ -613,7 +2065,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             return ast.QuantumPhase(modifiers=modifiers, argument=arguments[0], qubits=qubits)
         return ast.QuantumGate(
             modifiers=modifiers,
-            name=_visit_identifier(ctx.Identifier()),
+            name=self._visit_identifier(ctx.Identifier()),
             arguments=arguments,
             qubits=qubits,
             duration=self.visit(ctx.designator()) if ctx.designator() else None,
@@ -623,13 +2075,13 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     def visitGateStatement(self, ctx: qasm3Parser.GateStatementContext):
         if not self._in_global_scope():
             _raise_from_context(ctx, "gate definitions must be global")
-        name = _visit_identifier(ctx.Identifier())
+        name = self._visit_identifier(ctx.Identifier())
         arguments = (
-            [_visit_identifier(id_) for id_ in ctx.params.Identifier()]
+            [self._visit_identifier(id_) for id_ in ctx.params.Identifier()]
             if ctx.params is not None
             else []
         )
-        qubits = [_visit_identifier(id_) for id_ in ctx.qubits.Identifier()]
+        qubits = [self._visit_identifier(id_) for id_ in ctx.qubits.Identifier()]
         with self._push_context(ctx):
             body = cast(List[ast.QuantumStatement], self._parse_scoped_statements(ctx.scope()))
         return ast.QuantumGateDefinition(name, arguments, qubits, body)
@@ -658,7 +2110,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
         return ast.IODeclaration(
             io_identifier=ast.IOKeyword.input if ctx.INPUT() else ast.IOKeyword.output,
             type=self.visit(ctx.scalarType() or ctx.arrayType()),
-            identifier=_visit_identifier(ctx.Identifier()),
+            identifier=self._visit_identifier(ctx.Identifier()),
         )
 
     @span
@@ -683,7 +2135,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     def visitOldStyleDeclarationStatement(
         self, ctx: qasm3Parser.OldStyleDeclarationStatementContext
     ):
-        identifier = _visit_identifier(ctx.Identifier())
+        identifier = self._visit_identifier(ctx.Identifier())
         size = self.visit(ctx.designator()) if ctx.designator() else None
         if isinstance(size, ast.UnaryExpression) or (
             isinstance(size, ast.IntegerLiteral) and size.value == 0
@@ -697,9 +2149,9 @@ class QASMNodeVisitor(qasm3ParserVisitor):
                 _raise_from_context(ctx, "qubit declarations must be global")
             return ast.QubitDeclaration(qubit=identifier, size=size)
         span = (
-            combine_span(get_span(ctx.CREG()), get_span(ctx.designator()))
+            self._combine_span(self._get_span(ctx.CREG()), self._get_span(ctx.designator()))
             if ctx.designator()
-            else get_span(ctx.CREG())
+            else self._get_span(ctx.CREG())
         )
         return ast.ClassicalDeclaration(
             type=add_span(ast.BitType(size=size), span),
@@ -713,7 +2165,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             _raise_from_context(ctx, "qubit declarations must be global")
         size_designator = ctx.qubitType().designator()
         return ast.QubitDeclaration(
-            qubit=_visit_identifier(ctx.Identifier()),
+            qubit=self._visit_identifier(ctx.Identifier()),
             size=self.visit(size_designator) if size_designator is not None else None,
         )
 
@@ -818,7 +2270,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
                 ctx,
                 "cannot have a non-unitary measure-like quantum call expression instruction in a gate",
             )
-        name = _visit_identifier(ctx.Identifier())
+        name = self._visit_identifier(ctx.Identifier())
         arguments = (
             [self.visit(argument) for argument in ctx.expressionList().expression()]
             if ctx.expressionList()
@@ -837,7 +2289,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
 
     @span
     def visitCallExpression(self, ctx: qasm3Parser.CallExpressionContext):
-        name = _visit_identifier(ctx.Identifier())
+        name = self._visit_identifier(ctx.Identifier())
         arguments = (
             [self.visit(argument) for argument in ctx.expressionList().expression()]
             if ctx.expressionList()
@@ -855,7 +2307,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     @span
     def visitLiteralExpression(self, ctx: qasm3Parser.LiteralExpressionContext):
         if ctx.Identifier():
-            return _visit_identifier(ctx.Identifier())
+            return self._visit_identifier(ctx.Identifier())
         if ctx.BinaryIntegerLiteral():
             return ast.IntegerLiteral(value=int(ctx.BinaryIntegerLiteral().getText(), 2))
         if ctx.OctalIntegerLiteral():
@@ -888,7 +2340,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
                 unit = ast.TimeUnit["dt"]
             return ast.DurationLiteral(value=float(value), unit=unit)
         if ctx.HardwareQubit():
-            return ast.Identifier(ctx.HardwareQubit().getText())
+            return self._identifier(ctx.HardwareQubit().getText())
         raise _raise_from_context(ctx, "unknown literal type")
 
     @span
@@ -903,7 +2355,9 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             except StopIteration:
                 return self.visit(previous)
             lhs = recurse(current, iterator)
-            return add_span(ast.Concatenation(lhs=lhs, rhs=rhs), combine_span(lhs.span, rhs.span))
+            return add_span(
+                ast.Concatenation(lhs=lhs, rhs=rhs), self._combine_span(lhs.span, rhs.span)
+            )
 
         # This iterator should always be non-empty if ANTLR did its job right.
         iterator = reversed(ctx.expression())
@@ -972,9 +2426,9 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     @span
     def visitIndexedIdentifier(self, ctx: qasm3Parser.IndexedIdentifierContext):
         if not ctx.indexOperator():
-            return _visit_identifier(ctx.Identifier())
+            return self._visit_identifier(ctx.Identifier())
         return ast.IndexedIdentifier(
-            name=_visit_identifier(ctx.Identifier()),
+            name=self._visit_identifier(ctx.Identifier()),
             indices=[self.visit(index) for index in ctx.indexOperator()],
         )
 
@@ -1069,16 +2523,16 @@ class QASMNodeVisitor(qasm3ParserVisitor):
     @span
     def visitGateOperand(self, ctx: qasm3Parser.GateOperandContext):
         if ctx.HardwareQubit():
-            return ast.Identifier(name=ctx.getText())
+            return self._identifier(ctx.getText())
         return self.visit(ctx.indexedIdentifier())
 
     @span
     def visitDefcalTarget(self, ctx: qasm3Parser.DefcalTargetContext):
-        return ast.Identifier(name=ctx.getText())
+        return self._identifier(ctx.getText())
 
     @span
     def visitArgumentDefinition(self, ctx: qasm3Parser.ArgumentDefinitionContext):
-        name = _visit_identifier(ctx.Identifier())
+        name = self._visit_identifier(ctx.Identifier())
         if ctx.qubitType() or ctx.QREG():
             designator = ctx.qubitType().designator() if ctx.qubitType() else ctx.designator()
             return ast.QuantumArgument(
@@ -1088,10 +2542,14 @@ class QASMNodeVisitor(qasm3ParserVisitor):
         type_: ast.ClassicalType
         if ctx.CREG():
             size = self.visit(ctx.designator()) if ctx.designator() else None
-            creg_span = get_span(ctx.CREG())
+            creg_span = self._get_span(ctx.CREG())
             type_ = add_span(
                 ast.BitType(size=size),
-                combine_span(creg_span, get_span(size)) if size else creg_span,
+                (
+                    self._combine_span(creg_span, self._get_span(ctx.designator()))
+                    if size
+                    else creg_span
+                ),
             )
         elif ctx.arrayReferenceType():
             array_ctx = ctx.arrayReferenceType()
@@ -1106,7 +2564,7 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             )
             type_ = add_span(
                 ast.ArrayReferenceType(base_type=base_type, dimensions=dimensions),
-                get_span(array_ctx),
+                self._get_span(array_ctx),
             )
         else:
             type_ = self.visit(ctx.scalarType())
@@ -1137,15 +2595,18 @@ class QASMNodeVisitor(qasm3ParserVisitor):
             )
             type_ = add_span(
                 ast.ArrayReferenceType(base_type=base_type, dimensions=dimensions),
-                get_span(array_ctx),
+                self._get_span(array_ctx),
             )
         return ast.ExternArgument(type=type_, access=access)
 
     @span
     def visitDefcalOperand(self, ctx: qasm3Parser.DefcalOperandContext):
         if ctx.HardwareQubit():
-            return ast.Identifier(ctx.HardwareQubit().getText())
-        return _visit_identifier(ctx.Identifier())
+            return self._identifier(ctx.HardwareQubit().getText())
+        return self._visit_identifier(ctx.Identifier())
 
     def visitStatementOrScope(self, ctx: qasm3Parser.StatementOrScopeContext) -> ast.Statement:
         return self.visit(ctx.scope()) if ctx.scope() else self.visit(ctx.statement())
+
+
+_use_antlr_cache_from_environment()
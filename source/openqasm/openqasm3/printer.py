@@ -15,6 +15,11 @@ example) or :func:`dumps` to produce a string.  Both of these accept :ref:`sever
 .. autofunction:: openqasm3.dump
 .. autofunction:: openqasm3.dumps
 
+Programs that are generated lazily can be written out one statement at a time, without first
+building the whole :class:`.ast.Program` in memory:
+
+.. autofunction:: openqasm3.dump_statements
+
 
 .. _printer-kwargs:
 
@@ -52,43 +57,163 @@ state object is mutated by the visit, and will reflect the output state at the e
     :members:
 """
 
+import concurrent.futures
 import contextlib
 import dataclasses
 import io
 import functools
+import multiprocessing
+import sys
+import threading
 
-from typing import Optional, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from . import ast, properties
-from .visitor import QASMVisitor
+from . import _transfer, ast, properties
+from .visitor import QASMVisitor, _run_iteratively
 
-__all__ = ("dump", "dumps", "Printer", "PrinterState")
+__all__ = ("dump", "dumps", "dump_statements", "Printer", "PrinterState")
 
 
-def dump(node: ast.QASMNode, file: io.TextIOBase, **kwargs) -> None:
+def dump(node: ast.QASMNode, file: io.TextIOBase, *, workers: int = 1, **kwargs) -> None:
     """Write textual OpenQASM 3 code representing ``node`` to the open stream ``file``.
 
     It is generally expected that ``node`` will be an instance of :class:`.ast.Program`, but this
     does not need to be the case.
 
+    If ``workers`` is greater than one and ``node`` is a :class:`.ast.Program`, its top-level
+    statements are split into chunks that are printed in that many worker processes, and written to
+    ``file`` in order as they are completed.  The output is the same as that of printing in a single
+    process.  On platforms that support forking processes safely (such as Linux), the workers
+    inherit the program from the calling process, so it is not copied to them; otherwise, each chunk
+    of statements is pickled and sent to a worker, which is only worthwhile for programs that are
+    very expensive to print relative to their size.
+
     For more details on the available keyword arguments, see :ref:`printer-kwargs`.
     """
-    Printer(file, **kwargs).visit(node)
-
-
-def dumps(node: ast.QASMNode, **kwargs) -> str:
+    if workers < 1:
+        raise ValueError(f"the number of workers must be at least 1, but got {workers}")
+    if workers == 1 or not isinstance(node, ast.Program) or len(node.statements) < 2:
+        Printer(file, **kwargs).visit(node)
+        return
+    # Constructing a printer checks the keyword arguments before any processes are started.
+    printer = Printer(file, **kwargs)
+    head, tail = _program_ends(node)
+    printer.visit(head)
+    for chunk in _print_in_parallel(node.statements, workers, kwargs):
+        file.write(chunk)
+    if tail.comments:
+        printer.visit(tail)
+
+
+def _program_ends(program: ast.Program) -> Tuple[ast.Program, ast.Program]:
+    """Get empty programs that print as the parts of ``program`` before and after its statements:
+    the comments before the version statement and the version statement itself, and the comments
+    after the last statement."""
+    head = ast.Program(statements=[], version=program.version)
+    tail = ast.Program(statements=[])
+    if program.comments:
+        head.comments = [comment for comment in program.comments if not comment.trailing]
+        tail.comments = [comment for comment in program.comments if comment.trailing]
+    head.version_comments = program.version_comments
+    return head, tail
+
+
+def dumps(node: ast.QASMNode, *, workers: int = 1, **kwargs) -> str:
     """Get a string representation of the OpenQASM 3 code representing ``node``.
 
     It is generally expected that ``node`` will be an instance of :class:`.ast.Program`, but this
     does not need to be the case.
 
+    If ``workers`` is greater than one, a :class:`.ast.Program` is printed in that many worker
+    processes, as described in :func:`dump`.
+
     For more details on the available keyword arguments, see :ref:`printer-kwargs`.
     """
     out = io.StringIO()
-    dump(node, out, **kwargs)
+    dump(node, out, workers=workers, **kwargs)
+    return out.getvalue()
+
+
+# Forked worker processes can read the statements being printed directly from the memory they
+# inherit, so only the bounds of each chunk need to be sent to them.  Forking is not safe on macOS,
+# where it is not the default.
+_FORK_CONTEXT = (
+    multiprocessing.get_context("fork")
+    if "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin"
+    else None
+)
+_PRINT_JOB: Optional[Tuple[Sequence[Union[ast.Statement, ast.Pragma]], dict]] = None
+_PRINT_JOB_LOCK = threading.Lock()
+
+
+def _print_chunk(statements: Sequence[Union[ast.Statement, ast.Pragma]], kwargs: dict) -> str:
+    out = io.StringIO()
+    dump_statements(statements, out, **kwargs)
     return out.getvalue()
 
 
+def _print_inherited_chunk(bounds: Tuple[int, int]) -> str:
+    assert _PRINT_JOB is not None
+    statements, kwargs = _PRINT_JOB
+    return _print_chunk(statements[bounds[0] : bounds[1]], kwargs)
+
+
+def _print_sent_chunk(data: bytes, kwargs: dict) -> str:
+    return _print_chunk(_transfer.loads(data), kwargs)
+
+
+def _print_in_parallel(
+    statements: Sequence[Union[ast.Statement, ast.Pragma]], workers: int, kwargs: dict
+) -> Iterator[str]:
+    """Print top-level statements in a pool of worker processes, and get the output in order.
+    Top-level statements never start with any indentation or other printer state, so each chunk can
+    be printed independently."""
+    # Several chunks per worker keep the workers busy if some chunks are slower than others.
+    n_chunks = min(len(statements), 4 * workers)
+    edges = [len(statements) * i // n_chunks for i in range(n_chunks + 1)]
+    bounds = list(zip(edges[:-1], edges[1:]))
+    if _FORK_CONTEXT is None:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            yield from executor.map(
+                functools.partial(_print_sent_chunk, kwargs=kwargs),
+                (_transfer.dumps(statements[start:stop]) for start, stop in bounds),
+            )
+        return
+    global _PRINT_JOB  # pylint: disable=global-statement
+    with _PRINT_JOB_LOCK:
+        _PRINT_JOB = (statements, kwargs)
+        try:
+            # All the workers are forked when the first chunk is submitted.
+            with concurrent.futures.ProcessPoolExecutor(workers, _FORK_CONTEXT) as executor:
+                yield from executor.map(_print_inherited_chunk, bounds)
+        finally:
+            _PRINT_JOB = None
+
+
+def dump_statements(
+    statements: Iterable[Union[ast.Statement, ast.Pragma]],
+    file: io.TextIOBase,
+    *,
+    version: Optional[str] = None,
+    **kwargs,
+) -> None:
+    """Write textual OpenQASM 3 code for a program made of ``statements`` to the open stream
+    ``file``, consuming the statements one at a time.
+
+    The output is the same as that of :func:`dump` for the :class:`.ast.Program` with these
+    statements and version, but ``statements`` can be any iterable, such as a generator, and only a
+    bounded amount of the output is held in memory at any one time, so programs of any length can
+    be written.  If ``version`` is given, the ``OPENQASM`` version statement is written first.
+
+    For more details on the available keyword arguments, see :ref:`printer-kwargs`.
+    """
+    printer = Printer(file, **kwargs)
+    context = PrinterState()
+    with printer._buffered():  # pylint: disable=protected-access
+        printer.visit(ast.Program(statements=[], version=version), context)
+        printer._visit_statements(statements, context)  # pylint: disable=protected-access
+
+
 @dataclasses.dataclass
 class PrinterState:
     """State object for the print visitor.  This is mutated during the visit."""
@@ -112,6 +237,39 @@ class PrinterState:
             self.current_indent -= 1
 
 
+class _BufferedStream:
+    """A write buffer in front of a text stream.  While :attr:`write` is the ``append`` method of
+    :attr:`fragments`, as it is when the buffer is made, writing only appends the string to the
+    list, and the buffered strings are joined and written to the underlying stream in a single call
+    by :meth:`flush`.  The printer sets :attr:`write` to that of the underlying stream when it is not
+    buffering.  Any other attribute access flushes the buffer and is then forwarded to the
+    underlying stream, so, for example, ``getvalue`` still works on a buffered
+    :class:`io.StringIO`."""
+
+    __slots__ = ("raw", "fragments", "write")
+
+    def __init__(self, raw: io.TextIOBase):
+        self.raw = raw
+        self.fragments: List[str] = []
+        self.write: Callable[[str], Any] = self.fragments.append
+
+    def flush(self) -> None:
+        """Write the buffered strings to the underlying stream.  This does not flush the underlying
+        stream itself."""
+        if self.fragments:
+            self.raw.write("".join(self.fragments))
+            self.fragments.clear()
+
+    def __getattr__(self, name):
+        self.flush()
+        return getattr(self.raw, name)
+
+
+# The number of strings that the printer buffers before it writes them out at the end of the next
+# line.  The strings are mostly single tokens, so this is a few tens of kilobytes of output.
+_BUFFER_FRAGMENTS = 8192
+
+
 def _maybe_annotated(method):
     @functools.wraps(method)
     def annotated(self: "Printer", node: ast.Statement, context: PrinterState) -> None:
@@ -144,7 +302,9 @@ class Printer(QASMVisitor[PrinterState]):
         Aside from ``stream``, the arguments here are keyword arguments that are common to this
         class, :func:`~openqasm3.dump` and :func:`~openqasm3.dumps`.
 
-        :param stream: the stream that the output will be written to.
+        :param stream: the stream that the output will be written to.  The output is buffered, and
+            written to the stream in large pieces at the ends of lines, and at the end of each call
+            to :meth:`visit`.
         :type stream: io.TextIOBase
 
         :param indent: the string to use as a single indentation level.
@@ -180,7 +340,13 @@ class Printer(QASMVisitor[PrinterState]):
             ``measure b -> a;`` instead.
         :type old_measurement: bool, optional (``False``).
         """
-        self.stream = stream
+        self.stream = _BufferedStream(stream)
+        # Output is only buffered inside `visit`, so that calling a `visit_*` method directly writes
+        # its output straight to the stream.
+        self._write: Callable[[str], Any] = stream.write
+        self.stream.write = self._write
+        self._fragments = self.stream.fragments
+        self._visiting = False
         self.indent = indent
         self.chain_else_if = chain_else_if
         self.old_measurement = old_measurement
@@ -198,36 +364,130 @@ class Printer(QASMVisitor[PrinterState]):
         """
         if context is None:
             context = PrinterState()
-        return super().visit(node, context)
+        if self._visiting:
+            return super().visit(node, context)
+        with self._buffered():
+            return super().visit(node, context)
+
+    @contextlib.contextmanager
+    def _buffered(self):
+        """Use as a context manager to hold the output in the buffer until the end of the block,
+        except when the buffer fills up, rather than flushing it at the end of each visit."""
+        self._visiting = True
+        previous = self._write
+        # Output that is being collected separately, as for trailing comments, stays there.
+        if self._fragments is self.stream.fragments:
+            self._write = self.stream.write = self._fragments.append
+        try:
+            yield
+        finally:
+            self._visiting = False
+            self.flush()
+            self._write = self.stream.write = previous
+
+    def flush(self) -> None:
+        """Write any output that is still buffered to the stream.  This happens automatically at the
+        end of each call to :meth:`visit`, so it is only needed to make output appear part-way
+        through a visit, for example from an overridden visitor method."""
+        self.stream.flush()
 
     def _start_line(self, context: PrinterState) -> None:
         if context.skip_next_indent:
             context.skip_next_indent = False
             return
-        self.stream.write(context.current_indent * self.indent)
+        self._write(context.current_indent * self.indent)
 
     def _end_statement(self, context: PrinterState) -> None:
-        self.stream.write(";\n")
+        self._write(";\n")
+        if len(self._fragments) >= _BUFFER_FRAGMENTS:
+            self.stream.flush()
 
     def _end_line(self, context: PrinterState) -> None:
-        self.stream.write("\n")
+        self._write("\n")
+        if len(self._fragments) >= _BUFFER_FRAGMENTS:
+            self.stream.flush()
 
     def _write_statement(self, line: str, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write(line)
+        self._write(line)
         self._end_statement(context)
 
     def _visit_statement_list(
         self, nodes: Sequence[ast.Statement], context: PrinterState, prefix: str = ""
     ) -> None:
-        self.stream.write(prefix)
-        self.stream.write("{")
+        self._write(prefix)
+        self._write("{")
         self._end_line(context)
         with context.increase_scope():
-            for statement in nodes:
-                self.visit(statement, context)
+            self._visit_statements(nodes, context)
         self._start_line(context)
-        self.stream.write("}")
+        self._write("}")
+
+    def _visit_statements(
+        self, nodes: Iterable[Union[ast.Statement, ast.Pragma]], context: PrinterState
+    ) -> None:
+        """Visit a sequence of statements.  Statements of the common flat shapes, such as gate
+        calls on indexed qubits, are formatted directly by the fast path below, without dispatching
+        on each of their child nodes."""
+        formatters = _fast_statement_formatters(type(self))
+        for statement in nodes:
+            if statement.comments:
+                self._visit_commented(statement, context)
+                continue
+            formatter = formatters.get(statement.__class__)
+            line = None if formatter is None else formatter(self, statement)
+            if line is None:
+                self.visit(statement, context)
+            else:
+                self._start_line(context)
+                self._write(line)
+                self._end_statement(context)
+
+    def _visit_commented(
+        self, statement: Union[ast.Statement, ast.Pragma], context: PrinterState
+    ) -> None:
+        """Visit a statement that has comments attached.  The leading comments are each written on
+        a line of their own, and the trailing comments are added to the end of the last line of the
+        statement, so the statement is written to a separate list of fragments first."""
+        comments = statement.comments or ()
+        for comment in comments:
+            if not comment.trailing:
+                self._start_line(context)
+                self.visit(comment, context)
+                self._end_line(context)
+        trailing = [comment for comment in comments if comment.trailing]
+        if not trailing:
+            self.visit(statement, context)
+            return
+        stream, outer, outer_write = self.stream, self._fragments, self._write
+        inner: List[str] = []
+        self._write = stream.write = inner.append
+        self._fragments = inner
+        try:
+            self.visit(statement, context)
+        finally:
+            self._write = stream.write = outer_write
+            self._fragments = outer
+        if inner and inner[-1].endswith("\n"):
+            inner[-1] = inner[-1][:-1]
+            inner.append(self._trailing_comments(trailing, context))
+            inner.append("\n")
+        outer_write("".join(inner))
+        if len(outer) >= _BUFFER_FRAGMENTS:
+            stream.flush()
+
+    def _trailing_comments(self, comments: Iterable[ast.Comment], context: PrinterState) -> str:
+        """Get the text of the trailing comments of a statement, to add to the end of its last line.
+        Nothing can follow a line comment on the same line, so any comment after one goes on a new
+        line instead."""
+        out = []
+        separator = " "
+        for comment in comments:
+            out.append(separator)
+            out.append(comment.text)
+            if comment.text.startswith("//"):
+                separator = "\n" + context.current_indent * self.indent
+        return "".join(out)
 
     def _visit_sequence(
         self,
@@ -239,20 +499,35 @@ class Printer(QASMVisitor[PrinterState]):
         separator: str,
     ) -> None:
         if start:
-            self.stream.write(start)
+            self._write(start)
         for node in nodes[:-1]:
             self.visit(node, context)
-            self.stream.write(separator)
+            self._write(separator)
         if nodes:
             self.visit(nodes[-1], context)
         if end:
-            self.stream.write(end)
+            self._write(end)
 
     def visit_Program(self, node: ast.Program, context: PrinterState) -> None:
-        if node.version:
+        comments = node.comments or ()
+        for comment in comments:
+            if not comment.trailing:
+                self._start_line(context)
+                self.visit(comment, context)
+                self._end_line(context)
+        if node.version and node.version_comments:
+            self._start_line(context)
+            self._write(f"OPENQASM {node.version};")
+            self._write(self._trailing_comments(node.version_comments, context))
+            self._end_line(context)
+        elif node.version:
             self._write_statement(f"OPENQASM {node.version}", context)
-        for statement in node.statements:
-            self.visit(statement, context)
+        self._visit_statements(node.statements, context)
+        for comment in comments:
+            if comment.trailing:
+                self._start_line(context)
+                self.visit(comment, context)
+                self._end_line(context)
 
     @_maybe_annotated
     def visit_CompoundStatement(self, node: ast.CompoundStatement, context: PrinterState) -> None:
@@ -275,12 +550,12 @@ class Printer(QASMVisitor[PrinterState]):
     @_maybe_annotated
     def visit_QubitDeclaration(self, node: ast.QubitDeclaration, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("qubit")
+        self._write("qubit")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size)
-            self.stream.write("]")
-        self.stream.write(" ")
+            self._write("]")
+        self._write(" ")
         self.visit(node.qubit, context)
         self._end_statement(context)
 
@@ -289,11 +564,11 @@ class Printer(QASMVisitor[PrinterState]):
         self, node: ast.QuantumGateDefinition, context: PrinterState
     ) -> None:
         self._start_line(context)
-        self.stream.write("gate ")
+        self._write("gate ")
         self.visit(node.name, context)
         if node.arguments:
             self._visit_sequence(node.arguments, context, start="(", end=")", separator=", ")
-        self.stream.write(" ")
+        self._write(" ")
         self._visit_sequence(node.qubits, context, separator=", ")
         self._visit_statement_list(node.body, context, prefix=" ")
         self._end_line(context)
@@ -301,63 +576,83 @@ class Printer(QASMVisitor[PrinterState]):
     @_maybe_annotated
     def visit_ExternDeclaration(self, node: ast.ExternDeclaration, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("extern ")
+        self._write("extern ")
         self.visit(node.name, context)
         self._visit_sequence(node.arguments, context, start="(", end=")", separator=", ")
         if node.return_type is not None:
-            self.stream.write(" -> ")
+            self._write(" -> ")
             self.visit(node.return_type, context)
         self._end_statement(context)
 
     def visit_Identifier(self, node: ast.Identifier, context: PrinterState) -> None:
-        self.stream.write(node.name)
+        self._write(node.name)
+
+    def _visit_expression(self, node: ast.Expression, context: PrinterState) -> None:
+        """Visit an expression whose class has an ``_iterate_*`` method.  Nested expressions of
+        these classes are visited using an explicit stack rather than by recursion, unless their
+        visitor methods have been overridden, so arbitrarily deeply nested chains of operators can
+        be printed."""
+        iterative = _iterative_expression_methods(type(self))
+
+        def visit(child: ast.QASMNode):
+            method = iterative.get(child.__class__)
+            return self.visit(child, context) if method is None else method(self, child, context)
+
+        start = getattr(self, "_iterate_" + node.__class__.__name__)(node, context)
+        _run_iteratively(start, visit)
 
     def visit_UnaryExpression(self, node: ast.UnaryExpression, context: PrinterState) -> None:
-        self.stream.write(node.op.name)
+        self._visit_expression(node, context)
+
+    def _iterate_UnaryExpression(self, node: ast.UnaryExpression, context: PrinterState):
+        self._write(node.op.name)
         if properties.precedence(node) >= properties.precedence(node.expression):
-            self.stream.write("(")
-            self.visit(node.expression, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.expression
+            self._write(")")
         else:
-            self.visit(node.expression, context)
+            yield node.expression
 
     def visit_BinaryExpression(self, node: ast.BinaryExpression, context: PrinterState) -> None:
+        self._visit_expression(node, context)
+
+    def _iterate_BinaryExpression(self, node: ast.BinaryExpression, context: PrinterState):
         our_precedence = properties.precedence(node)
         # All AST nodes that are built into BinaryExpression are currently left associative.
         if properties.precedence(node.lhs) < our_precedence:
-            self.stream.write("(")
-            self.visit(node.lhs, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.lhs
+            self._write(")")
         else:
-            self.visit(node.lhs, context)
-        self.stream.write(f" {node.op.name} ")
+            yield node.lhs
+        self._write(f" {node.op.name} ")
         if properties.precedence(node.rhs) <= our_precedence:
-            self.stream.write("(")
-            self.visit(node.rhs, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.rhs
+            self._write(")")
         else:
-            self.visit(node.rhs, context)
+            yield node.rhs
 
     def visit_BitstringLiteral(self, node: ast.BitstringLiteral, context: PrinterState) -> None:
         value = bin(node.value)[2:]
         if len(value) < node.width:
             value = "0" * (node.width - len(value)) + value
-        self.stream.write(f'"{value}"')
+        self._write(f'"{value}"')
 
     def visit_IntegerLiteral(self, node: ast.IntegerLiteral, context: PrinterState) -> None:
-        self.stream.write(str(node.value))
+        self._write(str(node.value))
 
     def visit_FloatLiteral(self, node: ast.FloatLiteral, context: PrinterState) -> None:
-        self.stream.write(str(node.value))
+        self._write(str(node.value))
 
     def visit_ImaginaryLiteral(self, node: ast.ImaginaryLiteral, context: PrinterState) -> None:
-        self.stream.write(str(node.value) + "im")
+        self._write(str(node.value) + "im")
 
     def visit_BooleanLiteral(self, node: ast.BooleanLiteral, context: PrinterState) -> None:
-        self.stream.write("true" if node.value else "false")
+        self._write("true" if node.value else "false")
 
     def visit_DurationLiteral(self, node: ast.DurationLiteral, context: PrinterState) -> None:
-        self.stream.write(f"{node.value}{node.unit.name}")
+        self._write(f"{node.value}{node.unit.name}")
 
     def visit_ArrayLiteral(self, node: ast.ArrayLiteral, context: PrinterState) -> None:
         self._visit_sequence(node.values, context, start="{", end="}", separator=", ")
@@ -368,9 +663,9 @@ class Printer(QASMVisitor[PrinterState]):
 
     def visit_Cast(self, node: ast.Cast, context: PrinterState) -> None:
         self.visit(node.type)
-        self.stream.write("(")
+        self._write("(")
         self.visit(node.argument)
-        self.stream.write(")")
+        self._write(")")
 
     def visit_DiscreteSet(self, node: ast.DiscreteSet, context: PrinterState) -> None:
         self._visit_sequence(node.values, context, start="{", end="}", separator=", ")
@@ -378,38 +673,44 @@ class Printer(QASMVisitor[PrinterState]):
     def visit_RangeDefinition(self, node: ast.RangeDefinition, context: PrinterState) -> None:
         if node.start is not None:
             self.visit(node.start, context)
-        self.stream.write(":")
+        self._write(":")
         if node.step is not None:
             self.visit(node.step, context)
-            self.stream.write(":")
+            self._write(":")
         if node.end is not None:
             self.visit(node.end, context)
 
     def visit_IndexExpression(self, node: ast.IndexExpression, context: PrinterState) -> None:
+        self._visit_expression(node, context)
+
+    def _iterate_IndexExpression(self, node: ast.IndexExpression, context: PrinterState):
         if properties.precedence(node.collection) < properties.precedence(node):
-            self.stream.write("(")
-            self.visit(node.collection, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.collection
+            self._write(")")
         else:
-            self.visit(node.collection, context)
-        self.stream.write("[")
+            yield node.collection
+        self._write("[")
         if isinstance(node.index, ast.DiscreteSet):
             self.visit(node.index, context)
         else:
             self._visit_sequence(node.index, context, separator=", ")
-        self.stream.write("]")
+        self._write("]")
 
     def visit_IndexedIdentifier(self, node: ast.IndexedIdentifier, context: PrinterState) -> None:
         self.visit(node.name, context)
         for index in node.indices:
-            self.stream.write("[")
+            self._write("[")
             if isinstance(index, ast.DiscreteSet):
                 self.visit(index, context)
             else:
                 self._visit_sequence(index, context, separator=", ")
-            self.stream.write("]")
+            self._write("]")
 
     def visit_Concatenation(self, node: ast.Concatenation, context: PrinterState) -> None:
+        self._visit_expression(node, context)
+
+    def _iterate_Concatenation(self, node: ast.Concatenation, context: PrinterState):
         lhs_precedence = properties.precedence(node.lhs)
         our_precedence = properties.precedence(node)
         rhs_precedence = properties.precedence(node.rhs)
@@ -418,18 +719,18 @@ class Printer(QASMVisitor[PrinterState]):
         # forces us to make a choice).  We emit brackets to ensure that the
         # round-trip through our printer and parser do not change the AST.
         if lhs_precedence < our_precedence:
-            self.stream.write("(")
-            self.visit(node.lhs, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.lhs
+            self._write(")")
         else:
-            self.visit(node.lhs, context)
-        self.stream.write(" ++ ")
+            yield node.lhs
+        self._write(" ++ ")
         if rhs_precedence <= our_precedence:
-            self.stream.write("(")
-            self.visit(node.rhs, context)
-            self.stream.write(")")
+            self._write("(")
+            yield node.rhs
+            self._write(")")
         else:
-            self.visit(node.rhs, context)
+            yield node.rhs
 
     @_maybe_annotated
     def visit_QuantumGate(self, node: ast.QuantumGate, context: PrinterState) -> None:
@@ -439,56 +740,56 @@ class Printer(QASMVisitor[PrinterState]):
         self.visit(node.name, context)
         if node.arguments:
             self._visit_sequence(node.arguments, context, start="(", end=")", separator=", ")
-        self.stream.write(" ")
+        self._write(" ")
         self._visit_sequence(node.qubits, context, separator=", ")
         self._end_statement(context)
 
     def visit_QuantumGateModifier(
         self, node: ast.QuantumGateModifier, context: PrinterState
     ) -> None:
-        self.stream.write(node.modifier.name)
+        self._write(node.modifier.name)
         if node.argument is not None:
-            self.stream.write("(")
+            self._write("(")
             self.visit(node.argument, context)
-            self.stream.write(")")
+            self._write(")")
 
     @_maybe_annotated
     def visit_QuantumPhase(self, node: ast.QuantumPhase, context: PrinterState) -> None:
         self._start_line(context)
         if node.modifiers:
             self._visit_sequence(node.modifiers, context, end=" @ ", separator=" @ ")
-        self.stream.write("gphase(")
+        self._write("gphase(")
         self.visit(node.argument, context)
-        self.stream.write(")")
+        self._write(")")
         if node.qubits:
             self._visit_sequence(node.qubits, context, start=" ", separator=", ")
         self._end_statement(context)
 
     def visit_QuantumNop(self, node: ast.QuantumNop, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("nop")
+        self._write("nop")
         if node.operands:
-            self.stream.write(" ")
+            self._write(" ")
             self._visit_sequence(node.operands, context, separator=", ")
         self._end_statement(context)
 
     def visit_QuantumMeasurement(self, node: ast.QuantumMeasurement, context: PrinterState) -> None:
-        self.stream.write("measure ")
+        self._write("measure ")
         self.visit(node.qubit, context)
 
     @_maybe_annotated
     def visit_QuantumReset(self, node: ast.QuantumReset, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("reset ")
+        self._write("reset ")
         self.visit(node.qubits, context)
         self._end_statement(context)
 
     @_maybe_annotated
     def visit_QuantumBarrier(self, node: ast.QuantumBarrier, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("barrier")
+        self._write("barrier")
         if node.qubits:
-            self.stream.write(" ")
+            self._write(" ")
             self._visit_sequence(node.qubits, context, separator=", ")
         self._end_statement(context)
 
@@ -501,28 +802,24 @@ class Printer(QASMVisitor[PrinterState]):
             self.visit(node.measure, context)
         elif self.old_measurement:
             self.visit(node.measure, context)
-            self.stream.write(" -> ")
+            self._write(" -> ")
             self.visit(node.target, context)
         else:
             self.visit(node.target, context)
-            self.stream.write(" = ")
+            self._write(" = ")
             self.visit(node.measure, context)
         self._end_statement(context)
 
     def visit_ClassicalArgument(self, node: ast.ClassicalArgument, context: PrinterState) -> None:
         if node.access is not None:
-            self.stream.write(
-                "readonly " if node.access == ast.AccessControl.readonly else "mutable "
-            )
+            self._write("readonly " if node.access == ast.AccessControl.readonly else "mutable ")
         self.visit(node.type, context)
-        self.stream.write(" ")
+        self._write(" ")
         self.visit(node.name, context)
 
     def visit_ExternArgument(self, node: ast.ExternArgument, context: PrinterState) -> None:
         if node.access is not None:
-            self.stream.write(
-                "readonly " if node.access == ast.AccessControl.readonly else "mutable "
-            )
+            self._write("readonly " if node.access == ast.AccessControl.readonly else "mutable ")
         self.visit(node.type, context)
 
     @_maybe_annotated
@@ -531,19 +828,19 @@ class Printer(QASMVisitor[PrinterState]):
     ) -> None:
         self._start_line(context)
         self.visit(node.type)
-        self.stream.write(" ")
+        self._write(" ")
         self.visit(node.identifier, context)
         if node.init_expression is not None:
-            self.stream.write(" = ")
+            self._write(" = ")
             self.visit(node.init_expression)
         self._end_statement(context)
 
     @_maybe_annotated
     def visit_IODeclaration(self, node: ast.IODeclaration, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write(f"{node.io_identifier.name} ")
+        self._write(f"{node.io_identifier.name} ")
         self.visit(node.type)
-        self.stream.write(" ")
+        self._write(" ")
         self.visit(node.identifier, context)
         self._end_statement(context)
 
@@ -552,80 +849,80 @@ class Printer(QASMVisitor[PrinterState]):
         self, node: ast.ConstantDeclaration, context: PrinterState
     ) -> None:
         self._start_line(context)
-        self.stream.write("const ")
+        self._write("const ")
         self.visit(node.type, context)
-        self.stream.write(" ")
+        self._write(" ")
         self.visit(node.identifier, context)
-        self.stream.write(" = ")
+        self._write(" = ")
         self.visit(node.init_expression, context)
         self._end_statement(context)
 
     def visit_IntType(self, node: ast.IntType, context: PrinterState) -> None:
-        self.stream.write("int")
+        self._write("int")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_UintType(self, node: ast.UintType, context: PrinterState) -> None:
-        self.stream.write("uint")
+        self._write("uint")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_FloatType(self, node: ast.FloatType, context: PrinterState) -> None:
-        self.stream.write("float")
+        self._write("float")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_ComplexType(self, node: ast.ComplexType, context: PrinterState) -> None:
-        self.stream.write("complex")
+        self._write("complex")
         if node.base_type is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.base_type, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_AngleType(self, node: ast.AngleType, context: PrinterState) -> None:
-        self.stream.write("angle")
+        self._write("angle")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_BitType(self, node: ast.BitType, context: PrinterState) -> None:
-        self.stream.write("bit")
+        self._write("bit")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
+            self._write("]")
 
     def visit_BoolType(self, node: ast.BoolType, context: PrinterState) -> None:
-        self.stream.write("bool")
+        self._write("bool")
 
     def visit_ArrayType(self, node: ast.ArrayType, context: PrinterState) -> None:
-        self.stream.write("array[")
+        self._write("array[")
         self.visit(node.base_type, context)
         self._visit_sequence(node.dimensions, context, start=", ", end="]", separator=", ")
 
     def visit_ArrayReferenceType(self, node: ast.ArrayReferenceType, context: PrinterState) -> None:
-        self.stream.write("array[")
+        self._write("array[")
         self.visit(node.base_type, context)
-        self.stream.write(", ")
+        self._write(", ")
         if isinstance(node.dimensions, ast.Expression):
-            self.stream.write("#dim=")
+            self._write("#dim=")
             self.visit(node.dimensions, context)
         else:
             self._visit_sequence(node.dimensions, context, separator=", ")
-        self.stream.write("]")
+        self._write("]")
 
     def visit_DurationType(self, node: ast.DurationType, context: PrinterState) -> None:
-        self.stream.write("duration")
+        self._write("duration")
 
     def visit_StretchType(self, node: ast.StretchType, context: PrinterState) -> None:
-        self.stream.write("stretch")
+        self._write("stretch")
 
     @_maybe_annotated
     def visit_CalibrationGrammarDeclaration(
@@ -638,19 +935,19 @@ class Printer(QASMVisitor[PrinterState]):
         self, node: ast.CalibrationDefinition, context: PrinterState
     ) -> None:
         self._start_line(context)
-        self.stream.write("defcal ")
+        self._write("defcal ")
         self.visit(node.name, context)
         self._visit_sequence(node.arguments, context, start="(", end=")", separator=", ")
-        self.stream.write(" ")
+        self._write(" ")
         self._visit_sequence(node.qubits, context, separator=", ")
         if node.return_type is not None:
-            self.stream.write(" -> ")
+            self._write(" -> ")
             self.visit(node.return_type, context)
-        self.stream.write(" {")
+        self._write(" {")
         # At this point we _should_ be deferring to something else to handle formatting the
         # calibration grammar statements, but we're neither we nor the AST are set up to do that.
-        self.stream.write(node.body)
-        self.stream.write("}")
+        self._write(node.body)
+        self._write("}")
         self._end_line(context)
 
     @_maybe_annotated
@@ -658,11 +955,11 @@ class Printer(QASMVisitor[PrinterState]):
         self, node: ast.CalibrationStatement, context: PrinterState
     ) -> None:
         self._start_line(context)
-        self.stream.write("cal {")
+        self._write("cal {")
         # At this point we _should_ be deferring to something else to handle formatting the
         # calibration grammar statements, but we're neither we nor the AST are set up to do that.
-        self.stream.write(node.body)
-        self.stream.write("}")
+        self._write(node.body)
+        self._write("}")
         self._end_line(context)
 
     @_maybe_annotated
@@ -670,30 +967,30 @@ class Printer(QASMVisitor[PrinterState]):
         self, node: ast.SubroutineDefinition, context: PrinterState
     ) -> None:
         self._start_line(context)
-        self.stream.write("def ")
+        self._write("def ")
         self.visit(node.name, context)
         self._visit_sequence(node.arguments, context, start="(", end=")", separator=", ")
         if node.return_type is not None:
-            self.stream.write(" -> ")
+            self._write(" -> ")
             self.visit(node.return_type, context)
         self._visit_statement_list(node.body, context, prefix=" ")
         self._end_line(context)
 
     def visit_QuantumArgument(self, node: ast.QuantumArgument, context: PrinterState) -> None:
-        self.stream.write("qubit")
+        self._write("qubit")
         if node.size is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.size, context)
-            self.stream.write("]")
-        self.stream.write(" ")
+            self._write("]")
+        self._write(" ")
         self.visit(node.name, context)
 
     @_maybe_annotated
     def visit_ReturnStatement(self, node: ast.ReturnStatement, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("return")
+        self._write("return")
         if node.expression is not None:
-            self.stream.write(" ")
+            self._write(" ")
             self.visit(node.expression)
         self._end_statement(context)
 
@@ -712,12 +1009,12 @@ class Printer(QASMVisitor[PrinterState]):
     @_maybe_annotated
     def visit_BranchingStatement(self, node: ast.BranchingStatement, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("if (")
+        self._write("if (")
         self.visit(node.condition, context)
-        self.stream.write(")")
+        self._write(")")
         self._visit_statement_list(node.if_block, context, prefix=" ")
         if node.else_block:
-            self.stream.write(" else ")
+            self._write(" else ")
             # Special handling to flatten a perfectly nested structure of
             #   if {...} else { if {...} else {...} }
             # into the simpler
@@ -728,6 +1025,7 @@ class Printer(QASMVisitor[PrinterState]):
                 and len(node.else_block) == 1
                 and isinstance(node.else_block[0], ast.BranchingStatement)
                 and not node.annotations
+                and not node.else_block[0].comments
             ):
                 context.skip_next_indent = True
                 self.visit(node.else_block[0], context)
@@ -741,24 +1039,24 @@ class Printer(QASMVisitor[PrinterState]):
     @_maybe_annotated
     def visit_WhileLoop(self, node: ast.WhileLoop, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("while (")
+        self._write("while (")
         self.visit(node.while_condition, context)
-        self.stream.write(")")
+        self._write(")")
         self._visit_statement_list(node.block, context, prefix=" ")
         self._end_line(context)
 
     @_maybe_annotated
     def visit_ForInLoop(self, node: ast.ForInLoop, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("for ")
+        self._write("for ")
         self.visit(node.type)
-        self.stream.write(" ")
+        self._write(" ")
         self.visit(node.identifier, context)
-        self.stream.write(" in ")
+        self._write(" in ")
         if isinstance(node.set_declaration, ast.RangeDefinition):
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.set_declaration, context)
-            self.stream.write("]")
+            self._write("]")
         else:
             self.visit(node.set_declaration, context)
         self._visit_statement_list(node.block, context, prefix=" ")
@@ -767,81 +1065,79 @@ class Printer(QASMVisitor[PrinterState]):
     @_maybe_annotated
     def visit_SwitchStatement(self, node: ast.SwitchStatement, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("switch (")
+        self._write("switch (")
         self.visit(node.target, context)
-        self.stream.write(") {")
+        self._write(") {")
         self._end_line(context)
         with context.increase_scope():
             for values, block in node.cases:
                 self._start_line(context)
-                self.stream.write("case ")
+                self._write("case ")
                 self._visit_sequence(values, context, separator=", ")
-                self.stream.write(" {")
+                self._write(" {")
                 self._end_line(context)
                 with context.increase_scope():
-                    for statement in block.statements:
-                        self.visit(statement, context)
+                    self._visit_statements(block.statements, context)
                 self._start_line(context)
-                self.stream.write("}")
+                self._write("}")
                 self._end_line(context)
             if node.default is not None:
                 self._start_line(context)
-                self.stream.write("default {")
+                self._write("default {")
                 self._end_line(context)
                 with context.increase_scope():
-                    for statement in node.default.statements:
-                        self.visit(statement, context)
+                    self._visit_statements(node.default.statements, context)
                 self._start_line(context)
-                self.stream.write("}")
+                self._write("}")
                 self._end_line(context)
         self._start_line(context)
-        self.stream.write("}")
+        self._write("}")
         self._end_line(context)
 
     @_maybe_annotated
     def visit_DelayInstruction(self, node: ast.DelayInstruction, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("delay[")
+        self._write("delay[")
         self.visit(node.duration, context)
-        self.stream.write("]")
+        self._write("]")
         if node.qubits:
-            self.stream.write(" ")
+            self._write(" ")
             self._visit_sequence(node.qubits, context, separator=", ")
         self._end_statement(context)
 
     @_maybe_annotated
     def visit_Box(self, node: ast.Box, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("box")
+        self._write("box")
         if node.duration is not None:
-            self.stream.write("[")
+            self._write("[")
             self.visit(node.duration, context)
-            self.stream.write("]")
+            self._write("]")
         self._visit_statement_list(node.body, context, prefix=" ")
         self._end_line(context)
 
     def visit_DurationOf(self, node: ast.DurationOf, context: PrinterState) -> None:
-        self.stream.write("durationof(")
+        self._write("durationof(")
         if isinstance(node.target, ast.QASMNode):
             self.visit(node.target, context)
         else:
             self._visit_statement_list(node.target, context, prefix="")
-        self.stream.write(")")
+        self._write(")")
 
     def visit_SizeOf(self, node: ast.SizeOf, context: PrinterState) -> None:
-        self.stream.write("sizeof(")
+        self._write("sizeof(")
         self.visit(node.target, context)
         if node.index is not None:
-            self.stream.write(", ")
+            self._write(", ")
             self.visit(node.index)
-        self.stream.write(")")
+        self._write(")")
 
     @_maybe_annotated
     def visit_AliasStatement(self, node: ast.AliasStatement, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("let ")
+        self._write("let ")
         self.visit(node.target, context)
-        self.stream.write(" = ")
+        self._write(" = ")
         self.visit(node.value, context)
         self._end_statement(context)
 
@@ -851,21 +1147,242 @@ class Printer(QASMVisitor[PrinterState]):
     ) -> None:
         self._start_line(context)
         self.visit(node.lvalue, context)
-        self.stream.write(f" {node.op.name} ")
+        self._write(f" {node.op.name} ")
         self.visit(node.rvalue, context)
         self._end_statement(context)
 
     def visit_Annotation(self, node: ast.Annotation, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("@")
-        self.stream.write(node.keyword)
+        self._write("@")
+        self._write(node.keyword)
         if node.command is not None:
-            self.stream.write(" ")
-            self.stream.write(node.command)
+            self._write(" ")
+            self._write(node.command)
         self._end_line(context)
 
+    def visit_Comment(self, node: ast.Comment, context: PrinterState) -> None:
+        self._write(node.text)
+
     def visit_Pragma(self, node: ast.Pragma, context: PrinterState) -> None:
         self._start_line(context)
-        self.stream.write("pragma ")
-        self.stream.write(node.command)
+        self._write("pragma ")
+        self._write(node.command)
         self._end_line(context)
+
+
+_ITERATIVE_EXPRESSION_METHODS: Dict[type, Dict[type, Callable]] = {}
+
+
+def _iterative_expression_methods(printer_class: type) -> Dict[type, Callable]:
+    """Get the ``_iterate_*`` methods of a printer class, keyed by the node class they handle, for
+    all the node classes whose ``visit_*`` method has not been overridden from :class:`Printer`."""
+    try:
+        return _ITERATIVE_EXPRESSION_METHODS[printer_class]
+    except KeyError:
+        pass
+    out: Dict[type, Callable] = {}
+    for node_class in (
+        ast.UnaryExpression,
+        ast.BinaryExpression,
+        ast.IndexExpression,
+        ast.Concatenation,
+    ):
+        name = node_class.__name__
+        if getattr(printer_class, "visit_" + name) is getattr(Printer, "visit_" + name):
+            out[node_class] = getattr(printer_class, "_iterate_" + name)
+    _ITERATIVE_EXPRESSION_METHODS[printer_class] = out
+    return out
+
+
+# The fast path formats a whole statement to a string in a single pass, for the flat statement shapes
+# that make up most of the output of code generators.  Each function here returns ``None`` if its
+# node has any part that is not one of these simple shapes, and the statement is then visited
+# normally instead.  The output must be identical to that of the corresponding visitor methods.
+
+_SIZED_TYPES = {
+    ast.IntType: "int",
+    ast.UintType: "uint",
+    ast.FloatType: "float",
+    ast.AngleType: "angle",
+    ast.BitType: "bit",
+}
+
+
+def _fast_atom(node: ast.QASMNode) -> Optional[str]:
+    node_class = node.__class__
+    if node_class is ast.Identifier:
+        return node.name  # type: ignore[attr-defined]
+    if node_class is ast.IntegerLiteral or node_class is ast.FloatLiteral:
+        return str(node.value)  # type: ignore[attr-defined]
+    return None
+
+
+def _fast_expression(node: ast.QASMNode) -> Optional[str]:
+    # The checks are inlined and ordered by how common the node classes are in gate operands.
+    node_class = node.__class__
+    if node_class is ast.IndexedIdentifier:
+        out = node.name.name  # type: ignore[attr-defined]
+        for index in node.indices:  # type: ignore[attr-defined]
+            if index.__class__ is not list:
+                return None
+            if len(index) == 1 and index[0].__class__ is ast.IntegerLiteral:
+                out += f"[{index[0].value}]"
+                continue
+            items = [_fast_atom(item) for item in index]
+            if None in items:
+                return None
+            out += "[" + ", ".join(items) + "]"  # type: ignore[arg-type]
+        return out
+    if node_class is ast.Identifier:
+        return node.name  # type: ignore[attr-defined]
+    if node_class is ast.IntegerLiteral or node_class is ast.FloatLiteral:
+        return str(node.value)  # type: ignore[attr-defined]
+    # Atoms bind more tightly than any operator, so no brackets are needed around them.
+    if node_class is ast.UnaryExpression:
+        operand = _fast_atom(node.expression)  # type: ignore[attr-defined]
+        return None if operand is None else node.op.name + operand  # type: ignore[attr-defined]
+    if node_class is ast.BinaryExpression:
+        lhs = _fast_atom(node.lhs)  # type: ignore[attr-defined]
+        rhs = _fast_atom(node.rhs)  # type: ignore[attr-defined]
+        if lhs is None or rhs is None:
+            return None
+        return f"{lhs} {node.op.name} {rhs}"  # type: ignore[attr-defined]
+    return None
+
+
+def _fast_expressions(nodes: Sequence[ast.QASMNode]) -> Optional[str]:
+    if len(nodes) == 1:
+        return _fast_expression(nodes[0])
+    items = [_fast_expression(node) for node in nodes]
+    return None if None in items else ", ".join(items)  # type: ignore[arg-type]
+
+
+def _fast_QuantumGate(printer: Printer, node: ast.QuantumGate) -> Optional[str]:
+    if node.annotations:
+        return None
+    parts = []
+    for modifier in node.modifiers:
+        parts.append(modifier.modifier.name)
+        if modifier.argument is not None:
+            argument = _fast_expression(modifier.argument)
+            if argument is None:
+                return None
+            parts.append(f"({argument})")
+        parts.append(" @ ")
+    parts.append(node.name.name)
+    if node.arguments:
+        arguments = _fast_expressions(node.arguments)
+        if arguments is None:
+            return None
+        parts.append(f"({arguments})")
+    qubits = _fast_expressions(node.qubits)
+    if qubits is None:
+        return None
+    parts.append(" ")
+    parts.append(qubits)
+    return "".join(parts)
+
+
+def _fast_QuantumBarrier(printer: Printer, node: ast.QuantumBarrier) -> Optional[str]:
+    if node.annotations:
+        return None
+    if not node.qubits:
+        return "barrier"
+    qubits = _fast_expressions(node.qubits)
+    return None if qubits is None else "barrier " + qubits
+
+
+def _fast_QuantumReset(printer: Printer, node: ast.QuantumReset) -> Optional[str]:
+    if node.annotations:
+        return None
+    qubits = _fast_expression(node.qubits)
+    return None if qubits is None else "reset " + qubits
+
+
+def _fast_QuantumMeasurementStatement(
+    printer: Printer, node: ast.QuantumMeasurementStatement
+) -> Optional[str]:
+    if node.annotations or node.measure.__class__ is not ast.QuantumMeasurement:
+        return None
+    qubit = _fast_expression(node.measure.qubit)  # type: ignore[union-attr]
+    if qubit is None:
+        return None
+    if node.target is None:
+        return "measure " + qubit
+    target = _fast_expression(node.target)
+    if target is None:
+        return None
+    if printer.old_measurement:
+        return f"measure {qubit} -> {target}"
+    return f"{target} = measure {qubit}"
+
+
+def _fast_ClassicalDeclaration(printer: Printer, node: ast.ClassicalDeclaration) -> Optional[str]:
+    if node.annotations:
+        return None
+    type_class = node.type.__class__
+    if type_class is ast.BoolType:
+        type_ = "bool"
+    elif type_class in _SIZED_TYPES:
+        type_ = _SIZED_TYPES[type_class]
+        size = node.type.size  # type: ignore[attr-defined]
+        if size is not None:
+            size_string = _fast_expression(size)
+            if size_string is None:
+                return None
+            type_ += f"[{size_string}]"
+    else:
+        return None
+    line = f"{type_} {node.identifier.name}"
+    init = node.init_expression
+    if init is None:
+        return line
+    if init.__class__ is ast.QuantumMeasurement:
+        qubit = _fast_expression(init.qubit)  # type: ignore[union-attr]
+        return None if qubit is None else f"{line} = measure {qubit}"
+    value = _fast_expression(init)
+    return None if value is None else f"{line} = {value}"
+
+
+_FAST_STATEMENT_FORMATTERS: Dict[type, Dict[type, Callable]] = {}
+
+# The printer methods that produce the same output as the fast path.  If a subclass overrides any of
+# these, the fast path is not used at all.
+_FAST_PATH_METHODS = (
+    "visit",
+    "visit_Identifier",
+    "visit_IntegerLiteral",
+    "visit_FloatLiteral",
+    "visit_IndexedIdentifier",
+    "visit_UnaryExpression",
+    "visit_BinaryExpression",
+    "visit_QuantumGateModifier",
+    "visit_QuantumMeasurement",
+    "visit_BoolType",
+    *(f"visit_{node_class.__name__}" for node_class in _SIZED_TYPES),
+)
+
+
+def _fast_statement_formatters(printer_class: type) -> Dict[type, Callable]:
+    """Get the fast-path formatting functions that apply to a printer class, keyed by the statement
+    class they handle.  A statement class is only included if its visitor method, and the visitor
+    methods of all the nodes that it may contain in the fast path, have not been overridden from
+    :class:`Printer`."""
+    try:
+        return _FAST_STATEMENT_FORMATTERS[printer_class]
+    except KeyError:
+        pass
+    out: Dict[type, Callable] = {}
+    if all(getattr(printer_class, name) is getattr(Printer, name) for name in _FAST_PATH_METHODS):
+        for node_class, formatter in (
+            (ast.QuantumGate, _fast_QuantumGate),
+            (ast.QuantumBarrier, _fast_QuantumBarrier),
+            (ast.QuantumReset, _fast_QuantumReset),
+            (ast.QuantumMeasurementStatement, _fast_QuantumMeasurementStatement),
+            (ast.ClassicalDeclaration, _fast_ClassicalDeclaration),
+        ):
+            name = "visit_" + node_class.__name__
+            if getattr(printer_class, name) is getattr(Printer, name):
+                out[node_class] = formatter
+    _FAST_STATEMENT_FORMATTERS[printer_class] = out
+    return out
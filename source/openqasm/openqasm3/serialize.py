@@ -0,0 +1,698 @@
+"""
+=======================================
+Serialization (``openqasm3.serialize``)
+=======================================
+
+.. currentmodule:: openqasm3.serialize
+
+Tools for storing ASTs and loading them again without re-parsing the source.
+
+The binary format is a compact encoding of a tree of :obj:`~openqasm3.ast` nodes, which round-trips
+exactly, including the :class:`~openqasm3.ast.Span` of every node:
+
+.. autofunction:: dump_binary
+.. autofunction:: load_binary
+
+The format starts with a header containing the distinct strings of the tree (identifiers, for
+example), and the names and fields of the node classes and enumerations that it uses, so each is
+only stored once.  The nodes follow in post-order, each as a one-byte tag followed by any immediate
+data, such as the index of a string or the members of a span, in variable-length integers.  Loading
+is a single pass over the data with a stack, so it does not recurse, and identical strings in the
+tree are loaded as the same object.  The format is versioned, and is only guaranteed to be readable
+by the version of this package that wrote it.
+
+For interchange with other tools, ASTs can also be converted to and from plain dictionaries, and
+written as JSON:
+
+.. autofunction:: to_dict
+.. autofunction:: from_dict
+.. autofunction:: dump_json
+.. autofunction:: load_json
+
+The conversion is driven by the type annotations of the node classes, which are inspected once per
+class to choose how to convert each field.
+"""
+
+import copy
+import dataclasses
+import enum
+import functools
+import json
+import struct
+import typing
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Type, Union
+
+from . import ast
+
+__all__ = ["dump_binary", "load_binary", "to_dict", "from_dict", "dump_json", "load_json"]
+
+_MAGIC = b"OQ3B"
+_FORMAT_VERSION = 1
+
+# The tags of the values in the body.  Nodes of the first types in the type table are written with
+# a tag of ``_FIRST_NODE`` plus the type's index, and those after with ``_NODE`` and the index.
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _TUPLE, _SPAN, _ENUM, _NODE = range(11)
+_FIRST_NODE = 16
+# The kinds of the entries in the type table.
+_NODE_TYPE, _ENUM_TYPE = range(2)
+
+_FLOAT_FORMAT = struct.Struct("<d")
+_BYTES = [bytes((value,)) for value in range(0x100)]
+_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _varint(value: int) -> bytes:
+    if 0 <= value < 0x80:
+        return _BYTES[value]
+    if value < 0:
+        raise ValueError(f"cannot write {value} as an unsigned integer")
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    """Map a signed integer to an unsigned one, so that small negative numbers stay small."""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    """The inverse of :func:`_zigzag`."""
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+def _fields(node_class: type) -> Tuple[str, ...]:
+    out = _FIELDS.get(node_class)
+    if out is None:
+        out = _FIELDS[node_class] = tuple(field.name for field in dataclasses.fields(node_class))
+    return out
+
+
+def _check_type(cls: type) -> None:
+    if getattr(ast, cls.__name__, None) is not cls:
+        raise TypeError(f"cannot serialize '{cls.__qualname__}', which is not in openqasm3.ast")
+
+
+class _Writer:
+    """The string and type tables of a tree being written."""
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.types: Dict[type, int] = {}
+
+    def string(self, value: str) -> bytes:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return _varint(index)
+
+    def type(self, cls: type) -> int:
+        index = self.types.get(cls)
+        if index is None:
+            _check_type(cls)
+            index = self.types[cls] = len(self.types)
+        return index
+
+    def header(self) -> bytes:
+        out = [_MAGIC, _varint(_FORMAT_VERSION)]
+        # The names in the type table go in the string table, so it must be built first.
+        types = [_varint(len(self.types))]
+        for cls in self.types:
+            if issubclass(cls, enum.Enum):
+                types.extend([_BYTES[_ENUM_TYPE], self.string(cls.__name__)])
+            else:
+                fields = _fields(cls)
+                types.extend([_BYTES[_NODE_TYPE], self.string(cls.__name__)])
+                types.append(_varint(len(fields)))
+                types.extend(self.string(name) for name in fields)
+        out.append(_varint(len(self.strings)))
+        for value in self.strings:
+            encoded = value.encode("utf-8", "surrogatepass")
+            out.extend([_varint(len(encoded)), encoded])
+        out.extend(types)
+        return b"".join(out)
+
+
+def dump_binary(node: Union[ast.QASMNode, list]) -> bytes:
+    """Serialize an AST to the binary format.
+
+    :param node: The root of the tree to serialize, usually a :class:`~openqasm3.ast.Program`.
+        This can be any node, or a list of nodes.
+    :return: The serialized tree, which can be loaded with :func:`load_binary`.
+    :raises TypeError: If the tree contains a value that cannot be serialized, such as a node class
+        that is not defined in :mod:`openqasm3.ast`.
+    """
+    writer = _Writer()
+    string, type_index = writer.string, writer.type
+    # The tree is walked in pre-order, visiting the children of each node from last to first, and the
+    # output is reversed at the end, which puts every node after all its children.
+    chunks: List[bytes] = []
+    append = chunks.append
+    stack: list = [node]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        value = pop()
+        cls = type(value)
+        if value is None:
+            append(_BYTES[_NONE])
+        elif cls is str:
+            append(_BYTES[_STR] + string(value))
+        elif cls is ast.Span:
+            append(
+                b"".join(
+                    [
+                        _BYTES[_SPAN],
+                        _varint(_zigzag(value.start_line)),
+                        _varint(_zigzag(value.start_column)),
+                        _varint(_zigzag(value.end_line - value.start_line)),
+                        _varint(_zigzag(value.end_column)),
+                    ]
+                )
+            )
+        elif cls is list or cls is tuple:
+            append(_BYTES[_LIST if cls is list else _TUPLE] + _varint(len(value)))
+            extend(value)
+        elif cls is bool:
+            append(_BYTES[_TRUE if value else _FALSE])
+        elif cls is int:
+            append(_BYTES[_INT] + _varint(_zigzag(value)))
+        elif cls is float:
+            append(_BYTES[_FLOAT] + _FLOAT_FORMAT.pack(value))
+        elif isinstance(value, ast.QASMNode):
+            index = type_index(cls)
+            if index < 0x100 - _FIRST_NODE:
+                append(_BYTES[_FIRST_NODE + index])
+            else:
+                append(_BYTES[_NODE] + _varint(index))
+            extend([getattr(value, name) for name in _fields(cls)])
+        elif isinstance(value, enum.Enum):
+            append(_BYTES[_ENUM] + _varint(type_index(cls)) + string(value.name))
+        elif isinstance(value, ast.Span):
+            # A subclass, such as the parser's lazy spans, is written as a plain span.
+            extend(
+                [ast.Span(value.start_line, value.start_column, value.end_line, value.end_column)]
+            )
+        else:
+            raise TypeError(f"cannot serialize a value of type '{cls.__qualname__}'")
+    chunks.append(writer.header())
+    chunks.reverse()
+    return b"".join(chunks)
+
+
+def _read_varint(data: memoryview, pos: int) -> Tuple[int, int]:
+    """Read the variable-length integer starting at ``data[pos]``, returning it and the position
+    after it.  The loader reads single-byte integers inline, and only calls this for longer ones."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _resolve(name: str, kind: int) -> type:
+    cls = getattr(ast, name, None)
+    base: Type = enum.Enum if kind == _ENUM_TYPE else ast.QASMNode
+    if not (isinstance(cls, type) and issubclass(cls, base)):
+        raise ValueError(f"unknown type '{name}' in serialized AST")
+    return cls
+
+
+def load_binary(data) -> Union[ast.QASMNode, list]:
+    """Load an AST that was serialized with :func:`dump_binary`.
+
+    :param data: The serialized tree, as any object that supports the buffer protocol, such as
+        :class:`bytes`, :class:`memoryview` or :class:`mmap.mmap`.  The data is read in place, so
+        a file mapped with :mod:`mmap` is not copied into memory first.
+    :return: The root of the tree.  All the nodes are new objects.
+    :raises ValueError: If the data is not a valid tree in the binary format.
+    """
+    with memoryview(data) as view:
+        with view.cast("B") as view:
+            try:
+                return _load(view)
+            except (IndexError, struct.error) as exc:
+                raise ValueError("truncated serialized AST") from exc
+
+
+def _load_header(view: memoryview) -> Tuple[list, list, int]:
+    """Read the string and type tables, returning them and the position of the body."""
+    if view[: len(_MAGIC)] != _MAGIC:
+        raise ValueError("data is not a serialized AST")
+    version, pos = _read_varint(view, len(_MAGIC))
+    if version != _FORMAT_VERSION:
+        raise ValueError(f"unsupported serialized AST format version {version}")
+    strings = []
+    count, pos = _read_varint(view, pos)
+    for _ in range(count):
+        length, pos = _read_varint(view, pos)
+        strings.append(str(view[pos : pos + length], "utf-8", "surrogatepass"))
+        pos += length
+    types: List[Tuple[type, Optional[Tuple[str, ...]]]] = []
+    count, pos = _read_varint(view, pos)
+    for _ in range(count):
+        kind, pos = _read_varint(view, pos)
+        name, pos = _read_varint(view, pos)
+        cls = _resolve(strings[name], kind)
+        if kind == _ENUM_TYPE:
+            types.append((cls, None))
+            continue
+        names = []
+        n_fields, pos = _read_varint(view, pos)
+        for _ in range(n_fields):
+            name, pos = _read_varint(view, pos)
+            names.append(strings[name])
+        types.append((cls, tuple(names)))
+    return strings, types, pos
+
+
+def _load(view: memoryview):
+    # This is the hot loop of loading, so it reads single-byte integers inline, and checks for the
+    # most common tags first.
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    strings, types, pos = _load_header(view)
+    enum_members: Dict[Tuple[int, int], enum.Enum] = {}
+    span_class = ast.Span
+    slotted = ast.SLOTTED
+    unpack_float = _FLOAT_FORMAT.unpack_from
+    stack: list = []
+    append = stack.append
+    end = len(view)
+    while pos < end:
+        tag = view[pos]
+        pos += 1
+        if tag >= _FIRST_NODE or tag == _NODE:
+            if tag == _NODE:
+                index, pos = _read_varint(view, pos)
+            else:
+                index = tag - _FIRST_NODE
+            cls, names = types[index]
+            if names is None:
+                raise ValueError("node tag refers to an enumeration")
+            count = len(names)
+            if len(stack) < count:
+                raise ValueError("too few values for node")
+            values = stack[-count:]
+            del stack[-count:]
+            node = cls.__new__(cls)
+            if slotted:
+                for name, value in zip(names, values):
+                    setattr(node, name, value)
+            else:
+                node.__dict__.update(zip(names, values))
+            append(node)
+        elif tag == _SPAN:
+            start_line = view[pos]
+            pos += 1
+            if start_line >= 0x80:
+                start_line, pos = _read_varint(view, pos - 1)
+            start_column = view[pos]
+            pos += 1
+            if start_column >= 0x80:
+                start_column, pos = _read_varint(view, pos - 1)
+            lines = view[pos]
+            pos += 1
+            if lines >= 0x80:
+                lines, pos = _read_varint(view, pos - 1)
+            end_column = view[pos]
+            pos += 1
+            if end_column >= 0x80:
+                end_column, pos = _read_varint(view, pos - 1)
+            # The fields are zigzag-encoded, as by `_zigzag`.
+            start_line = (start_line >> 1) ^ -(start_line & 1)
+            append(
+                span_class(
+                    start_line,
+                    (start_column >> 1) ^ -(start_column & 1),
+                    start_line + ((lines >> 1) ^ -(lines & 1)),
+                    (end_column >> 1) ^ -(end_column & 1),
+                )
+            )
+        elif tag == _STR:
+            index = view[pos]
+            pos += 1
+            if index >= 0x80:
+                index, pos = _read_varint(view, pos - 1)
+            append(strings[index])
+        elif tag == _NONE:
+            append(None)
+        elif tag == _LIST or tag == _TUPLE:
+            count = view[pos]
+            pos += 1
+            if count >= 0x80:
+                count, pos = _read_varint(view, pos - 1)
+            if len(stack) < count:
+                raise ValueError("too few values for sequence")
+            if count:
+                values = stack[-count:]
+                del stack[-count:]
+            else:
+                values = []
+            append(values if tag == _LIST else tuple(values))
+        elif tag == _INT:
+            value, pos = _read_varint(view, pos)
+            append(_unzigzag(value))
+        elif tag == _ENUM:
+            index, pos = _read_varint(view, pos)
+            name, pos = _read_varint(view, pos)
+            member = enum_members.get((index, name))
+            if member is None:
+                cls, names = types[index]
+                if names is not None:
+                    raise ValueError("enumeration tag refers to a node")
+                member = enum_members[index, name] = cls[strings[name]]
+            append(member)
+        elif tag == _FALSE or tag == _TRUE:
+            append(tag == _TRUE)
+        elif tag == _FLOAT:
+            append(unpack_float(view, pos)[0])
+            pos += _FLOAT_FORMAT.size
+        else:
+            raise ValueError(f"unknown tag {tag} in serialized AST")
+    if len(stack) != 1:
+        raise ValueError("serialized AST does not contain exactly one tree")
+    return stack[0]
+
+
+_TYPE_KEY = "_type"
+
+# A converter takes a value and the stack of nodes that are still to be converted.  It converts a
+# node by returning an empty dictionary or node for it, and pushing the pair of the two onto the
+# stack to be filled in later, so that conversions do not recurse.
+_Converter = Optional[Callable[[Any, list], Any]]
+
+
+@dataclasses.dataclass(frozen=True)
+class _FieldSchema:
+    """How to convert one field of a node class to and from its dictionary form.  A converter of
+    ``None`` means that the value is stored unchanged."""
+
+    name: str
+    to_dict: _Converter
+    from_dict: _Converter
+    default: Optional[Callable[[], Any]]
+
+
+_SCHEMAS: Dict[type, Tuple[_FieldSchema, ...]] = {}
+
+
+def _optional(converter: Callable[[Any, list], Any]) -> Callable[[Any, list], Any]:
+    return lambda value, stack: None if value is None else converter(value, stack)
+
+
+def _enum_converters(enum_class: Type[enum.Enum]) -> Tuple[_Converter, _Converter]:
+    return (lambda member, stack: member.name), (lambda name, stack: enum_class[name])
+
+
+def _value_to_dict(value, stack: list):
+    if not isinstance(value, ast.QASMNode):
+        return value
+    out: Dict[str, Any] = {}
+    stack.append((value, out))
+    return out
+
+
+def _value_from_dict(value, stack: list):
+    return _new_node(value, stack) if isinstance(value, dict) else value
+
+
+def _sequence_converters(
+    item: Tuple[_Converter, _Converter], out_type: type
+) -> Tuple[_Converter, _Converter]:
+    to_item, from_item = item
+    if to_item is None or from_item is None:
+        return None, (None if out_type is list else out_type)
+    return (
+        lambda values, stack: [to_item(value, stack) for value in values],
+        lambda values, stack: out_type(from_item(value, stack) for value in values),
+    )
+
+
+def _tuple_converters(items: List[Tuple[_Converter, _Converter]]) -> Tuple[_Converter, _Converter]:
+    to_items = [to_item or (lambda value, stack: value) for to_item, _ in items]
+    from_items = [from_item or (lambda value, stack: value) for _, from_item in items]
+    return (
+        lambda values, stack: [convert(value, stack) for convert, value in zip(to_items, values)],
+        lambda values, stack: tuple(
+            convert(value, stack) for convert, value in zip(from_items, values)
+        ),
+    )
+
+
+def _union_converters(options: list) -> Tuple[_Converter, _Converter]:
+    """Build converters for a union of several types, which must be distinguishable by the type of
+    the value: nodes (dictionaries), at most one type of list, and scalars."""
+    to_list: _Converter = None
+    from_list: _Converter = None
+    for option in options:
+        pair = _converters(option)
+        if getattr(option, "__origin__", None) is list:
+            if to_list is not None:
+                raise TypeError(f"cannot convert a union of several types of list: {options}")
+            to_list, from_list = pair
+        elif pair not in ((None, None), (_value_to_dict, _value_from_dict)):
+            raise TypeError(f"cannot convert a union of {options}")
+    if to_list is None or from_list is None:
+        return _value_to_dict, _value_from_dict
+    to_items, from_items = to_list, from_list
+
+    def to_value(value, stack: list):
+        if isinstance(value, list):
+            return to_items(value, stack)
+        return _value_to_dict(value, stack)
+
+    def from_value(value, stack: list):
+        if isinstance(value, list):
+            return from_items(value, stack)
+        return _value_from_dict(value, stack)
+
+    return to_value, from_value
+
+
+def _converters(hint) -> Tuple[_Converter, _Converter]:
+    """Build the pair of converters for a field with the given type annotation."""
+    if isinstance(hint, type):
+        if issubclass(hint, enum.Enum):
+            return _enum_converters(hint)
+        if issubclass(hint, ast.QASMNode):
+            return _value_to_dict, _value_from_dict
+        return None, None
+    origin = getattr(hint, "__origin__", None)
+    args: Tuple[Any, ...] = getattr(hint, "__args__", ())
+    if origin is Union:
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            to_value, from_value = _converters(options[0])
+            if to_value is None or from_value is None:
+                return None, None
+            return _optional(to_value), _optional(from_value)
+        return _union_converters(options)
+    if origin is list:
+        return _sequence_converters(_converters(args[0]), list)
+    if origin is tuple:
+        return _tuple_converters([_converters(arg) for arg in args])
+    return None, None
+
+
+def _schema(node_class: type) -> Tuple[_FieldSchema, ...]:
+    out = _SCHEMAS.get(node_class)
+    if out is not None:
+        return out
+    _check_type(node_class)
+    hints = typing.get_type_hints(node_class)
+    fields = []
+    for field in dataclasses.fields(node_class):
+        if field.name == "span":
+            continue
+        if field.default is not dataclasses.MISSING:
+            default: Optional[Callable[[], Any]] = functools.partial(copy.copy, field.default)
+        elif field.default_factory is not dataclasses.MISSING:
+            default = field.default_factory
+        else:
+            default = None
+        fields.append(_FieldSchema(field.name, *_converters(hints[field.name]), default))
+    out = _SCHEMAS[node_class] = tuple(fields)
+    return out
+
+
+def to_dict(node: ast.QASMNode) -> Dict[str, Any]:
+    """Convert an AST to nested dictionaries, lists and scalars, which can be written as JSON.
+
+    Each node becomes a dictionary with a ``"_type"`` key holding the name of its class, a
+    ``"span"`` key holding its span as a list ``[start_line, start_column, end_line, end_column]``
+    (or ``None``), and a key for each of its other fields.  Enumeration members are stored by name,
+    and tuples as lists.
+
+    :param node: The root of the tree to convert.
+    :return: The dictionary form of the node, which can be converted back with :func:`from_dict`.
+    :raises TypeError: If the tree contains a node class that is not defined in
+        :mod:`openqasm3.ast`.
+    """
+    root: Dict[str, Any] = {}
+    stack: list = [(node, root)]
+    while stack:
+        node, out = stack.pop()
+        cls = type(node)
+        span = node.span
+        out[_TYPE_KEY] = cls.__name__
+        out["span"] = (
+            None
+            if span is None
+            else [span.start_line, span.start_column, span.end_line, span.end_column]
+        )
+        for field in _SCHEMAS.get(cls) or _schema(cls):
+            value = getattr(node, field.name)
+            out[field.name] = value if field.to_dict is None else field.to_dict(value, stack)
+    return root
+
+
+def from_dict(data: Dict[str, Any]) -> ast.QASMNode:
+    """Convert the dictionary form of an AST, as produced by :func:`to_dict`, back to nodes.
+
+    Fields that are missing from a dictionary take their default value, if the node class has one.
+
+    :param data: The dictionary form of the root of the tree.
+    :return: The root of the tree.
+    :raises ValueError: If the data does not describe a valid tree.
+    """
+    stack: list = []
+    root = _new_node(data, stack)
+    while stack:
+        data, node = stack.pop()
+        cls = type(node)
+        name = cls.__name__
+        values = {}
+        for field in _SCHEMAS.get(cls) or _schema(cls):
+            if field.name in data:
+                value = data[field.name]
+                try:
+                    values[field.name] = (
+                        value if field.from_dict is None else field.from_dict(value, stack)
+                    )
+                except KeyError as exc:
+                    raise ValueError(f"invalid value for '{name}.{field.name}': {exc}") from None
+            elif field.default is not None:
+                values[field.name] = field.default()
+            else:
+                raise ValueError(f"missing field '{field.name}' of '{name}'")
+        span = data.get("span")
+        values["span"] = None if span is None else ast.Span(*span)
+        if ast.SLOTTED:
+            for key, value in values.items():
+                setattr(node, key, value)
+        else:
+            node.__dict__.update(values)
+    return root
+
+
+def _new_node(data: Dict[str, Any], stack: list) -> ast.QASMNode:
+    """Make the empty node of the class named in the dictionary form of a node, and push the pair
+    of the two onto ``stack`` for :func:`from_dict` to fill in the fields of the node."""
+    try:
+        name = data[_TYPE_KEY]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f"expected a dictionary with a '{_TYPE_KEY}' key, but got {data!r}"
+        ) from None
+    cls = getattr(ast, name, None) if isinstance(name, str) else None
+    if not (isinstance(cls, type) and issubclass(cls, ast.QASMNode)):
+        raise ValueError(f"unknown node type {name!r}")
+    node = cls.__new__(cls)
+    stack.append((data, node))
+    return node
+
+
+def dump_json(node: ast.QASMNode, file: TextIO, **kwargs) -> None:
+    """Write an AST to a file as JSON, in the form produced by :func:`to_dict`.
+
+    A :class:`~openqasm3.ast.Program` is written one statement at a time, so only the dictionary
+    form of a single statement is held in memory at once.
+
+    :param node: The root of the tree to write.
+    :param file: A file-like object opened in text mode.
+    :param kwargs: Passed on to :func:`json.dumps` for each part of the output.  Options that
+        change the layout, such as ``indent``, only apply within each statement.  Parts that are
+        nested too deeply for :func:`json.dumps` are written in the same layout without recursion.
+    """
+    if not isinstance(node, ast.Program):
+        file.write(_json_dumps(to_dict(node), **kwargs))
+        return
+    shell = ast.Program(statements=[], version=node.version)
+    shell.span = node.span
+    shell.comments = node.comments
+    shell.version_comments = node.version_comments
+    head = to_dict(shell)
+    del head["statements"]
+    # The statements go last, so that the rest of the object can be written in one go.
+    file.write(json.dumps(head, **kwargs)[:-1])
+    file.write(', "statements": [')
+    for i, statement in enumerate(node.statements):
+        if i:
+            file.write(", ")
+        file.write(_json_dumps(to_dict(statement), **kwargs))
+    file.write("]}")
+
+
+def _json_dumps(value: Any, **kwargs) -> str:
+    """Encode a value with :func:`json.dumps`, unless it is nested too deeply for that."""
+    try:
+        return json.dumps(value, **kwargs)
+    except RecursionError:
+        return _json_dumps_iteratively(value, **kwargs)
+
+
+def _json_dumps_iteratively(
+    value: Any, *, indent=None, separators=None, sort_keys=False, **kwargs
+) -> str:
+    """Encode nested dictionaries and lists with an explicit stack, in the same layout as
+    :func:`json.dumps`, which is used for the scalars and keys with the remaining options."""
+    if isinstance(indent, int):
+        indent = " " * indent
+    if separators is None:
+        separators = (",", ": ") if indent is not None else (", ", ": ")
+    item_separator, key_separator = separators
+    out: List[str] = []
+    # Each entry is whether it is text to write as it is, the text or value, and its depth.
+    stack: List[Tuple[bool, Any, int]] = [(False, value, 0)]
+    while stack:
+        raw, item, depth = stack.pop()
+        if raw:
+            out.append(item)
+            continue
+        if isinstance(item, dict):
+            pairs = sorted(item.items()) if sort_keys else list(item.items())
+            start, end = "{", "}"
+        elif isinstance(item, list):
+            pairs = [(None, child) for child in item]
+            start, end = "[", "]"
+        else:
+            out.append(json.dumps(item, **kwargs))
+            continue
+        if not pairs:
+            out.append(start + end)
+            continue
+        inner = "" if indent is None else "\n" + indent * (depth + 1)
+        parts: List[Tuple[bool, Any, int]] = []
+        for key, child in pairs:
+            prefix = (item_separator if parts else start) + inner
+            if key is not None:
+                prefix += json.dumps(key, **kwargs) + key_separator
+            parts.append((True, prefix, depth))
+            parts.append((False, child, depth + 1))
+        parts.append((True, ("" if indent is None else "\n" + indent * depth) + end, depth))
+        parts.reverse()
+        stack.extend(parts)
+    return "".join(out)
+
+
+def load_json(file: TextIO) -> ast.QASMNode:
+    """Read an AST from a file of JSON written by :func:`dump_json`, or by any other means in the
+    form produced by :func:`to_dict`.  The JSON is parsed by :func:`json.load`, which recurses
+    once per level of nesting, so trees that are too deep for that must be loaded with
+    :func:`from_dict` from data that was parsed some other way."""
+    return from_dict(json.load(file))
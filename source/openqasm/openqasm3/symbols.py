@@ -0,0 +1,339 @@
+"""
+=======================================
+Symbol tables (``openqasm3.symbols``)
+=======================================
+
+.. currentmodule:: openqasm3.symbols
+
+A :class:`SymbolTable` records the names declared by a program and the scopes that they are declared
+in, and resolves every use of an identifier in the program to the declaration that it refers to.
+It is built in a single pass over the tree, after which each lookup is a dictionary access, so
+passes over the AST that need to know what an identifier refers to do not each have to walk the
+tree again to find out.
+
+.. autoclass:: SymbolTable
+    :members:
+.. autoclass:: Symbol
+    :members:
+.. autoclass:: Scope
+    :members:
+.. autoclass:: SymbolKind
+    :members:
+
+Names are resolved following the scoping rules of OpenQASM 3.  A name is visible from its
+declaration to the end of the block that declares it, including in nested blocks, which may shadow
+it.  Inside a gate, subroutine or calibration definition, only the names of constants, gates,
+subroutines and externs from outside the definition are visible.  Names that are not declared
+anywhere in the program, such as the built-in constant ``pi``, built-in functions and physical
+qubits such as ``$0``, are not resolved.  Neither are the names declared by included files, unless
+the files have been inlined into the program first, for example by
+:meth:`.IncludeResolver.inline`.
+"""
+
+import dataclasses
+import enum
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import ast
+from .visitor import _children
+
+__all__ = ["Scope", "Symbol", "SymbolKind", "SymbolTable"]
+
+
+class SymbolKind(enum.Enum):
+    """The kind of declaration that introduces a :class:`Symbol`."""
+
+    QUBIT = "qubit"
+    CLASSICAL = "classical"
+    CONST = "const"
+    IO = "io"
+    GATE = "gate"
+    SUBROUTINE = "def"
+    EXTERN = "extern"
+    ALIAS = "alias"
+    ARGUMENT = "argument"
+    """An argument of a gate, subroutine or calibration definition."""
+    LOOP_VARIABLE = "loop variable"
+
+
+_ALL_KINDS = frozenset(SymbolKind)
+# The kinds of names that are visible inside definitions from the scopes outside them.
+_VISIBLE_IN_DEFINITIONS = frozenset(
+    (SymbolKind.CONST, SymbolKind.GATE, SymbolKind.SUBROUTINE, SymbolKind.EXTERN)
+)
+
+
+@dataclasses.dataclass(eq=False)
+class Scope:
+    """A block of a program in which names can be declared."""
+
+    node: ast.QASMNode
+    """The node that opens the scope.  This is the :class:`~openqasm3.ast.Program` for the global
+    scope.  A :class:`~openqasm3.ast.BranchingStatement` opens separate scopes for its two
+    blocks."""
+    parent: Optional["Scope"]
+    """The scope that encloses this one, or ``None`` for the global scope."""
+    definition: bool = False
+    """Whether this is the scope of a gate, subroutine or calibration definition, which can only see
+    some kinds of names from the scopes outside it."""
+    symbols: Dict[str, "Symbol"] = dataclasses.field(default_factory=dict)
+    """The names declared directly in this scope.  If a name is declared more than once in the
+    scope, this holds the last declaration of it."""
+
+    def lookup(self, name: str) -> Optional["Symbol"]:
+        """Find the symbol that ``name`` refers to in this scope, after all the declarations in the
+        scope, or ``None`` if it is not declared."""
+        scope: Optional[Scope] = self
+        visible = _ALL_KINDS
+        while scope is not None:
+            symbol = scope.symbols.get(name)
+            if symbol is not None and symbol.kind in visible:
+                return symbol
+            if scope.definition:
+                visible = _VISIBLE_IN_DEFINITIONS
+            scope = scope.parent
+        return None
+
+
+@dataclasses.dataclass(eq=False)
+class Symbol:
+    """A name declared in a program."""
+
+    name: str
+    kind: SymbolKind
+    node: ast.QASMNode
+    """The node that declares the name.  For a gate argument or qubit, this is the
+    :class:`~openqasm3.ast.QuantumGateDefinition`; for a loop variable, it is the
+    :class:`~openqasm3.ast.ForInLoop`; and for an argument of a subroutine or calibration, it is the
+    :class:`~openqasm3.ast.ClassicalArgument` or :class:`~openqasm3.ast.QuantumArgument`."""
+    identifier: ast.Identifier
+    """The identifier in :attr:`node` that names the symbol."""
+    scope: Scope
+    """The scope that the symbol is declared in."""
+    uses: List[ast.Identifier] = dataclasses.field(default_factory=list)
+    """The identifiers that refer to this symbol, in the order that they appear in the program."""
+
+
+class SymbolTable:
+    """The symbols declared by a program, and the uses of each of them.
+
+    The table is built from the program when it is created, and identifies the identifiers in the
+    tree by object, so it only describes the tree as it was then.  It keeps a reference to the
+    program, which should not be modified for as long as the table is in use.
+
+    :param program: The program to build the table for.
+    """
+
+    def __init__(self, program: ast.Program):
+        self.program = program
+        self.global_scope = Scope(program, None)
+        """The scope of the top level of the program."""
+        self.scopes: List[Scope] = [self.global_scope]
+        """Every scope of the program, in the order that they open."""
+        self.symbols: List[Symbol] = []
+        """Every symbol declared in the program, in the order of their declarations."""
+        self.unresolved: List[ast.Identifier] = []
+        """The identifiers that do not refer to a name declared in the program, such as the
+        built-in constants and functions, and physical qubits."""
+        self._resolved: Dict[int, Symbol] = {}
+        self._build()
+
+    def lookup(self, identifier: ast.Identifier) -> Optional[Symbol]:
+        """Get the symbol that an identifier in the program refers to, or that it declares.
+
+        :param identifier: An identifier node from the program.
+        :return: The symbol, or ``None`` if the identifier is not resolved, or is not part of the
+            program.
+        """
+        return self._resolved.get(id(identifier))
+
+    def __iter__(self) -> Iterator[Symbol]:
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def _declare(
+        self, kind: SymbolKind, node: ast.QASMNode, identifier: ast.Identifier, scope: Scope
+    ) -> None:
+        symbol = Symbol(identifier.name, kind, node, identifier, scope)
+        scope.symbols[identifier.name] = symbol
+        self.symbols.append(symbol)
+        self._resolved[id(identifier)] = symbol
+
+    def _build(self) -> None:
+        # The tree is walked with an explicit stack, so that deep expressions cannot exceed the
+        # recursion limit.  An item is either a node to visit in a scope, or the arguments of a
+        # declaration to make when it is reached.  Items are pushed in reverse order.
+        stack: list = [(node, self.global_scope) for node in reversed(self.program.statements)]
+        resolved = self._resolved
+        while stack:
+            item = stack.pop()
+            if len(item) == 4:
+                self._declare(*item)
+                continue
+            node, scope = item
+            cls = type(node)
+            if cls is ast.Identifier:
+                symbol = scope.lookup(node.name)
+                if symbol is None:
+                    self.unresolved.append(node)
+                else:
+                    symbol.uses.append(node)
+                    resolved[id(node)] = symbol
+                continue
+            handler = _HANDLERS.get(cls)
+            if handler is None:
+                stack.extend((child, scope) for child in reversed(_children(node)))
+            else:
+                stack.extend(reversed(handler(self, node, scope)))
+
+
+def _new_scope(
+    table: SymbolTable, node: ast.QASMNode, parent: Scope, definition: bool = False
+) -> Scope:
+    scope = Scope(node, parent, definition)
+    table.scopes.append(scope)
+    return scope
+
+
+def _visit(scope: Scope, *nodes) -> list:
+    """Get the stack items that visit each of ``nodes`` that is present, in ``scope``."""
+    out: list = []
+    for node in nodes:
+        if isinstance(node, list):
+            out.extend((item, scope) for item in node)
+        elif node is not None:
+            out.append((node, scope))
+    return out
+
+
+def _qubit_declaration(table: SymbolTable, node: ast.QubitDeclaration, scope: Scope) -> list:
+    return _visit(scope, node.size) + [(SymbolKind.QUBIT, node, node.qubit, scope)]
+
+
+def _classical_declaration(
+    table: SymbolTable, node: ast.ClassicalDeclaration, scope: Scope
+) -> list:
+    return _visit(scope, node.type, node.init_expression) + [
+        (SymbolKind.CLASSICAL, node, node.identifier, scope)
+    ]
+
+
+def _constant_declaration(table: SymbolTable, node: ast.ConstantDeclaration, scope: Scope) -> list:
+    return _visit(scope, node.type, node.init_expression) + [
+        (SymbolKind.CONST, node, node.identifier, scope)
+    ]
+
+
+def _io_declaration(table: SymbolTable, node: ast.IODeclaration, scope: Scope) -> list:
+    return _visit(scope, node.type) + [(SymbolKind.IO, node, node.identifier, scope)]
+
+
+def _alias_statement(table: SymbolTable, node: ast.AliasStatement, scope: Scope) -> list:
+    return _visit(scope, node.value) + [(SymbolKind.ALIAS, node, node.target, scope)]
+
+
+def _extern_declaration(table: SymbolTable, node: ast.ExternDeclaration, scope: Scope) -> list:
+    return _visit(scope, node.arguments, node.return_type) + [
+        (SymbolKind.EXTERN, node, node.name, scope)
+    ]
+
+
+def _gate_definition(table: SymbolTable, node: ast.QuantumGateDefinition, scope: Scope) -> list:
+    # The gate is declared before its body, so the body sees it like any later statement would.
+    inner = _new_scope(table, node, scope, definition=True)
+    out: list = [(SymbolKind.GATE, node, node.name, scope)]
+    out.extend((SymbolKind.ARGUMENT, node, name, inner) for name in node.arguments)
+    out.extend((SymbolKind.ARGUMENT, node, name, inner) for name in node.qubits)
+    return out + _visit(inner, node.body)
+
+
+def _arguments(arguments: list, scope: Scope) -> list:
+    out: list = []
+    for argument in arguments:
+        if isinstance(argument, ast.ClassicalArgument):
+            out.extend(_visit(scope, argument.type))
+            out.append((SymbolKind.ARGUMENT, argument, argument.name, scope))
+        elif isinstance(argument, ast.QuantumArgument):
+            out.extend(_visit(scope, argument.size))
+            out.append((SymbolKind.ARGUMENT, argument, argument.name, scope))
+        else:
+            out.extend(_visit(scope, argument))
+    return out
+
+
+def _subroutine_definition(
+    table: SymbolTable, node: ast.SubroutineDefinition, scope: Scope
+) -> list:
+    inner = _new_scope(table, node, scope, definition=True)
+    out: list = [(SymbolKind.SUBROUTINE, node, node.name, scope)]
+    out.extend(_arguments(node.arguments, inner))
+    return out + _visit(inner, node.return_type, node.body)
+
+
+def _calibration_definition(
+    table: SymbolTable, node: ast.CalibrationDefinition, scope: Scope
+) -> list:
+    # The name refers to the gate or measurement being calibrated, and the body is not parsed.
+    inner = _new_scope(table, node, scope, definition=True)
+    out = _visit(scope, node.name) + _arguments(node.arguments, inner)
+    for qubit in node.qubits:
+        if qubit.name.startswith("$"):
+            out.append((qubit, inner))
+        else:
+            out.append((SymbolKind.ARGUMENT, node, qubit, inner))
+    return out + _visit(inner, node.return_type)
+
+
+def _for_in_loop(table: SymbolTable, node: ast.ForInLoop, scope: Scope) -> list:
+    inner = _new_scope(table, node, scope)
+    return (
+        _visit(scope, node.type, node.set_declaration)
+        + [(SymbolKind.LOOP_VARIABLE, node, node.identifier, inner)]
+        + _visit(inner, node.block)
+    )
+
+
+def _while_loop(table: SymbolTable, node: ast.WhileLoop, scope: Scope) -> list:
+    return _visit(scope, node.while_condition) + _visit(_new_scope(table, node, scope), node.block)
+
+
+def _branching_statement(table: SymbolTable, node: ast.BranchingStatement, scope: Scope) -> list:
+    return (
+        _visit(scope, node.condition)
+        + _visit(_new_scope(table, node, scope), node.if_block)
+        + _visit(_new_scope(table, node, scope), node.else_block)
+    )
+
+
+def _box(table: SymbolTable, node: ast.Box, scope: Scope) -> list:
+    return _visit(scope, node.duration) + _visit(_new_scope(table, node, scope), node.body)
+
+
+def _compound_statement(table: SymbolTable, node: ast.CompoundStatement, scope: Scope) -> list:
+    return _visit(_new_scope(table, node, scope), node.statements)
+
+
+def _duration_of(table: SymbolTable, node: ast.DurationOf, scope: Scope) -> list:
+    return _visit(_new_scope(table, node, scope), node.target)
+
+
+# Scopes are opened when the handler of their node runs, so they are in the order that they open.
+_HANDLERS: Dict[type, Callable[[SymbolTable, Any, Scope], list]] = {
+    ast.QubitDeclaration: _qubit_declaration,
+    ast.ClassicalDeclaration: _classical_declaration,
+    ast.ConstantDeclaration: _constant_declaration,
+    ast.IODeclaration: _io_declaration,
+    ast.AliasStatement: _alias_statement,
+    ast.ExternDeclaration: _extern_declaration,
+    ast.QuantumGateDefinition: _gate_definition,
+    ast.SubroutineDefinition: _subroutine_definition,
+    ast.CalibrationDefinition: _calibration_definition,
+    ast.ForInLoop: _for_in_loop,
+    ast.WhileLoop: _while_loop,
+    ast.BranchingStatement: _branching_statement,
+    ast.Box: _box,
+    ast.CompoundStatement: _compound_statement,
+    ast.DurationOf: _duration_of,
+}
@@ -7,18 +7,133 @@ Implementation of an example AST visitor :obj:`~QASMVisitor`, which can be
 inherited from to make generic visitors of the reference AST.  Deriving from
 this is :obj:`~QASMTransformer`, which is an example of how the AST can be
 manipulated.
+
+These visitors recurse through the tree, so they are limited by Python's recursion limit, which
+very deeply nested trees (such as a chain of thousands of additions output by a code generator) can
+exceed.  :func:`walk` and :obj:`~IterativeVisitor` instead traverse the tree using an explicit
+stack, so they can handle trees of any depth.
+
+Passes that repeatedly search a tree for nodes of a given type can use a :obj:`~NodeIndex`, which
+finds every node of the tree and its parent in a single traversal, and then answers each query
+without traversing the tree again.  :meth:`.Program.find_all` keeps one with the program.
 """
 
-from typing import Optional, TypeVar, Generic
+import dataclasses
+import functools
+import heapq
+import inspect
+import types
+import weakref
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Generic,
+)
 
 from .ast import QASMNode
 
 __all__ = [
     "QASMVisitor",
     "QASMTransformer",
+    "IterativeVisitor",
+    "NodeIndex",
+    "walk",
 ]
 
 T = TypeVar("T")
+NodeT = TypeVar("NodeT", bound=QASMNode)
+
+# Weak references to the indexes that are not yet stale, by the identities of the indexes.  A
+# transformer marks those that contain a node that it visits as stale, so transforming one tree does
+# not affect the indexes of any other.
+_FRESH_INDEXES: Dict[int, "weakref.ref[NodeIndex]"] = {}
+
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _child_fields(node_class: type) -> Tuple[str, ...]:
+    """Get the names of the fields of a node class that may contain child nodes, in field order.
+    This is every dataclass field except for ``span``."""
+    try:
+        return _CHILD_FIELDS[node_class]
+    except KeyError:
+        pass
+    fields = tuple(field.name for field in dataclasses.fields(node_class) if field.name != "span")
+    _CHILD_FIELDS[node_class] = fields
+    return fields
+
+
+def _children(node: QASMNode) -> List[QASMNode]:
+    """Get the direct child nodes of a node, in field order.  This descends into lists and tuples,
+    including nested ones such as :attr:`.IndexedIdentifier.indices`."""
+    out = []
+    for field in _child_fields(node.__class__):
+        value = getattr(node, field, None)
+        if isinstance(value, QASMNode):
+            out.append(value)
+        elif isinstance(value, (list, tuple)):
+            pending = [iter(value)]
+            while pending:
+                for item in pending[-1]:
+                    if isinstance(item, QASMNode):
+                        out.append(item)
+                    elif isinstance(item, (list, tuple)):
+                        pending.append(iter(item))
+                        break
+                else:
+                    pending.pop()
+    return out
+
+
+def walk(node: QASMNode) -> Iterator[QASMNode]:
+    """Iterate over ``node`` and all of its descendants in depth-first pre-order, that is, each node
+    comes before its children, and the children come in field order.
+
+    Unlike the recursive :obj:`QASMVisitor`, this uses an explicit stack, so it can handle trees of
+    any depth.  It also descends into nested lists and tuples, such as the indices of an
+    :class:`.IndexedIdentifier` and the cases of a :class:`.SwitchStatement`.  The tree should not be
+    modified during the iteration."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        children = _children(node)
+        children.reverse()
+        stack.extend(children)
+
+
+def _run_iteratively(start: Any, visit: Callable[[QASMNode], Any]) -> Any:
+    """Drive a tree traversal with an explicit stack.
+
+    ``start`` is the result of visiting the root node.  If the result of visiting a node is a
+    generator, each node it yields is visited with ``visit``, and the result of that is sent back
+    into the generator.  The value that the generator returns is then the result of visiting its
+    node.  Any other result is the final result of visiting the node.  Returns the result of
+    visiting the root node."""
+    stack = []
+    result = start
+    while True:
+        if isinstance(result, types.GeneratorType):
+            stack.append(result)
+            result = None
+        while stack:
+            try:
+                child = stack[-1].send(result)
+                break
+            except StopIteration as exc:
+                stack.pop()
+                result = exc.value
+        else:
+            return result
+        result = visit(child)
 
 
 class QASMVisitor(Generic[T]):
@@ -33,29 +148,77 @@ class QASMVisitor(Generic[T]):
 
     The optional context argument in visit/generic_visit methods can be used to hold temporary
     information that we do not want to hold in either the AST or the visitor themselves.
+
+    The visitor method to use for each type of node is looked up on the visitor class the first
+    time a node of that type is visited, and then cached for that visitor class.  Adding or
+    replacing ``visit_*`` methods on a visitor class after it has been used will not take effect.
+    Visitor methods (including ``generic_visit``) assigned to a visitor instance always take
+    precedence over the cached ones.
     """
 
+    _visit_functions: ClassVar[Dict[type, Tuple[str, Optional[Callable[..., Any]], bool]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_functions = {}
+
     def visit(self, node: QASMNode, context: Optional[T] = None):
         """Visit a node."""
-        method = "visit_" + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
+        try:
+            method, function, generic = self._visit_functions[node.__class__]
+        except KeyError:
+            method, function, generic = self._visit_functions[node.__class__] = _visit_function(
+                type(self), node.__class__
+            )
+        # A visitor method assigned to the instance replaces the cached one.
+        attributes = self.__dict__
+        if (
+            function is None
+            or attributes
+            and (method in attributes or generic and "generic_visit" in attributes)
+        ):
+            visitor = getattr(self, method, self.generic_visit)
+            # The visitor method may not have the context argument.
+            if context:
+                return visitor(node, context)
+            return visitor(node)
         # The visitor method may not have the context argument.
         if context:
-            return visitor(node, context)
-        else:
-            return visitor(node)
+            return function(self, node, context)
+        return function(self, node)
 
     def generic_visit(self, node: QASMNode, context: Optional[T] = None):
         """Called if no explicit visitor function exists for a node."""
-        for value in node.__dict__.values():
-            if not isinstance(value, list):
-                value = [value]
-            for item in value:
-                if isinstance(item, QASMNode):
-                    if context:
-                        self.visit(item, context)
-                    else:
-                        self.visit(item)
+        for field in _child_fields(node.__class__):
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, QASMNode):
+                        if context:
+                            self.visit(item, context)
+                        else:
+                            self.visit(item)
+            elif isinstance(value, QASMNode):
+                if context:
+                    self.visit(value, context)
+                else:
+                    self.visit(value)
+
+
+def _visit_function(
+    visitor_class: type, node_class: type
+) -> Tuple[str, Optional[Callable[..., Any]], bool]:
+    """Find how ``visitor_class`` visits nodes of type ``node_class``.  Returns the name of the
+    visitor method for those nodes, the plain function that implements it (which can be called with
+    the visitor as its first argument), and whether that function is the class's ``generic_visit``.
+    The function is ``None`` if the visitor method is some other kind of descriptor (such as a
+    :class:`staticmethod`), in which case it must be looked up on the visitor instance instead."""
+    method = "visit_" + node_class.__name__
+    function = inspect.getattr_static(visitor_class, method, None)
+    generic = function is None
+    if generic:
+        function = inspect.getattr_static(visitor_class, "generic_visit")
+    return method, function if isinstance(function, types.FunctionType) else None, generic
 
 
 class QASMTransformer(QASMVisitor[T]):
@@ -66,8 +229,25 @@ class QASMTransformer(QASMVisitor[T]):
     Modified from the implementation in ast.py in the Python standard library
     """
 
+    # The number of calls of `visit` in progress on this transformer.  Only the outermost call marks
+    # indexes as stale, since the nodes that the inner calls visit are in the same tree.
+    _depth = 0
+
+    def visit(self, node: QASMNode, context: Optional[T] = None):
+        """Visit a node, which may modify it, so mark any index of its tree as stale."""
+        if self._depth:
+            return QASMVisitor.visit(self, node, context)
+        if _FRESH_INDEXES:
+            _mark_stale(node)
+        self._depth += 1
+        try:
+            return QASMVisitor.visit(self, node, context)
+        finally:
+            self._depth -= 1
+
     def generic_visit(self, node: QASMNode, context: Optional[T] = None) -> QASMNode:
-        for field, old_value in node.__dict__.items():
+        for field in _child_fields(node.__class__):
+            old_value = getattr(node, field, None)
             if isinstance(old_value, list):
                 new_values = []
                 for value in old_value:
@@ -87,3 +267,161 @@ class QASMTransformer(QASMVisitor[T]):
                 else:
                     setattr(node, field, new_node)
         return node
+
+
+class NodeIndex:
+    """An index of the nodes of a tree by their type, with the parent of each node.
+
+    The index is built in a single traversal of the tree when it is created, using an explicit
+    stack, so the tree may be of any depth.  After that, :meth:`find_all` takes time proportional to
+    the number of nodes that it returns, and :meth:`parent` takes constant time.
+
+    The index identifies nodes by object, so it only describes the tree as it was when the index
+    was built.  A :class:`QASMTransformer` may modify the tree, so the index is :attr:`stale` once
+    any transformer has visited one of its nodes since the index was built, even if the
+    transformer overrides the method that visits that node; changes made to the tree in any other
+    way are not detected.  Copies and pickles of a program do not include
+    the index that :meth:`.Program.find_all` keeps with it.
+
+    :param root: The root of the tree to index, usually a :class:`~openqasm3.ast.Program`.
+    """
+
+    def __init__(self, root: QASMNode):
+        self.root = root
+        self._stale = False
+        self._parents: Dict[int, Optional[QASMNode]] = {id(root): None}
+        self._nodes: Dict[type, List[QASMNode]] = {}
+        self._positions: Dict[type, List[int]] = {}
+        self._found: Dict[type, List[QASMNode]] = {}
+        parents = self._parents
+        nodes = self._nodes
+        positions = self._positions
+        stack = [root]
+        position = 0
+        while stack:
+            node = stack.pop()
+            cls = node.__class__
+            try:
+                nodes[cls].append(node)
+                positions[cls].append(position)
+            except KeyError:
+                nodes[cls] = [node]
+                positions[cls] = [position]
+            position += 1
+            children = _children(node)
+            for child in children:
+                parents[id(child)] = node
+            children.reverse()
+            stack.extend(children)
+        key = id(self)
+        _FRESH_INDEXES[key] = weakref.ref(self, functools.partial(_forget_index, key))
+
+    @property
+    def stale(self) -> bool:
+        """Whether a :class:`QASMTransformer` may have modified the tree since the index was
+        built."""
+        return self._stale
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def __reduce__(self):
+        return _discard, ()
+
+    def find_all(self, node_type: Type[NodeT]) -> List[NodeT]:
+        """Get every node in the tree that is an instance of ``node_type``, including instances of
+        its subclasses, in the order of :func:`walk`."""
+        found = self._found.get(node_type)
+        if found is None:
+            types_ = [cls for cls in self._nodes if issubclass(cls, node_type)]
+            if len(types_) == 1:
+                found = self._nodes[types_[0]]
+            else:
+                # The positions are unique, so the nodes themselves are never compared.
+                merged = heapq.merge(
+                    *(zip(self._positions[cls], self._nodes[cls]) for cls in types_)
+                )
+                found = [node for _, node in merged]
+            self._found[node_type] = found
+        return list(found)  # type: ignore[arg-type]
+
+    def parent(self, node: QASMNode) -> Optional[QASMNode]:
+        """Get the node whose fields contain ``node``, or ``None`` if ``node`` is the root.
+
+        :raises KeyError: If ``node`` is not in the tree.
+        """
+        try:
+            return self._parents[id(node)]
+        except KeyError:
+            raise KeyError(f"{node.__class__.__name__} node is not in the index") from None
+
+    def ancestors(self, node: QASMNode) -> Iterator[QASMNode]:
+        """Iterate over the parent of ``node``, its parent, and so on up to the root.
+
+        :raises KeyError: If ``node`` is not in the tree.
+        """
+        parent = self.parent(node)
+        while parent is not None:
+            yield parent
+            parent = self._parents[id(parent)]
+
+
+def _mark_stale(node: QASMNode):
+    """Mark every fresh index that contains ``node`` as stale."""
+    key = id(node)
+    for index_key, ref in list(_FRESH_INDEXES.items()):
+        index = ref()
+        if index is not None and key in index._parents:
+            index._stale = True
+            del _FRESH_INDEXES[index_key]
+
+
+def _forget_index(key: int, ref: "weakref.ref[NodeIndex]"):
+    """Remove an index that has been garbage collected from the fresh indexes."""
+    if _FRESH_INDEXES.get(key) is ref:
+        del _FRESH_INDEXES[key]
+
+
+def _discard():
+    """Stand in for an index when it is pickled or copied, since it refers to the nodes of the
+    original tree by their identities."""
+    return None
+
+
+class IterativeVisitor(QASMVisitor[T]):
+    """
+    A :class:`QASMVisitor` subclass that walks the abstract syntax tree using an explicit stack
+    rather than recursion, so it can visit trees of any depth.
+
+    The visitor methods are dispatched in the same way as :class:`QASMVisitor`, but they may be
+    generator functions.  Each node that such a method yields is visited next, and then the
+    generator is resumed with the result of that visit.  The code before the first ``yield`` is
+    therefore a pre-order hook, and the code after the last ``yield`` is a post-order hook.  The
+    return value of the generator is the result of visiting the node.  For example::
+
+        class Depth(IterativeVisitor):
+            def generic_visit(self, node, context=None):
+                depth = 0
+                for child in super().generic_visit(node):
+                    depth = max(depth, (yield child))
+                return depth + 1
+
+    A visitor method that is not a generator function is a leaf: its return value is the result
+    of the visit, and the children of its node are not visited unless it visits them itself.
+
+    The default :meth:`generic_visit` yields each child node in turn, like :func:`walk`.
+    """
+
+    def visit(self, node: QASMNode, context: Optional[T] = None):
+        """Visit a node and all its descendants, and return the result of visiting the node."""
+
+        def visit_child(child: QASMNode):
+            return super(IterativeVisitor, self).visit(child, context)
+
+        return _run_iteratively(visit_child(node), visit_child)
+
+    def generic_visit(self, node: QASMNode, context: Optional[T] = None):
+        """Called if no explicit visitor function exists for a node.  This yields each of the
+        node's children to be visited in turn, and returns ``None``."""
+        for child in _children(node):
+            yield child
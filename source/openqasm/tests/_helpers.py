@@ -0,0 +1,16 @@
+import dataclasses
+
+from openqasm3 import ast
+
+
+def all_spans(node):
+    """Get the spans of every node in the tree, in a fixed traversal order."""
+    if isinstance(node, (list, tuple)):
+        return [span for item in node for span in all_spans(item)]
+    if not isinstance(node, ast.QASMNode):
+        return []
+    out = [node.span]
+    for field in dataclasses.fields(node):
+        if field.name != "span":
+            out.extend(all_spans(getattr(node, field.name)))
+    return out
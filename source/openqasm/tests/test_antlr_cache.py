@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import openqasm3
+from openqasm3 import _antlr_cache, parser
+
+PROGRAM = """
+OPENQASM 3.0;
+include "stdgates.inc";
+qubit[2] q;
+bit[2] c;
+gate g(theta) a, b { ctrl @ rz(theta / 2) a, b; }
+for int i in [0:3] { g(i * pi) q[0], q[1]; }
+c = measure q;
+if (c[0] == 1) { x q[1]; } else { delay[10ns] q; }
+"""
+
+
+def _run(script, cache_directory):
+    env = {**os.environ, "OPENQASM3_ANTLR_CACHE": str(cache_directory)}
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        env=env,
+        check=True,
+    )
+
+
+def test_cache_is_shared_between_processes(tmp_path):
+    populate = f"""
+        import openqasm3
+        from openqasm3 import _antlr_cache
+
+        assert _antlr_cache.states() == 0
+        openqasm3.parse({PROGRAM!r})
+        assert _antlr_cache.states() > 0
+    """
+    _run(populate, tmp_path)
+    assert _antlr_cache.cache_file(tmp_path).is_file()
+    reuse = f"""
+        import openqasm3
+        from openqasm3 import _antlr_cache
+
+        loaded = _antlr_cache.states()
+        assert loaded > 0
+        program = openqasm3.parse({PROGRAM!r})
+        # All the predictions needed were already cached.
+        assert _antlr_cache.states() == loaded, (loaded, _antlr_cache.states())
+        with open({str(tmp_path / "out.qasm")!r}, "w") as file:
+            openqasm3.dump(program, file)
+    """
+    _run(reuse, tmp_path)
+    assert (tmp_path / "out.qasm").read_text() == openqasm3.dumps(openqasm3.parse(PROGRAM))
+
+
+def test_save_and_load_in_process(tmp_path):
+    expected = openqasm3.parse(PROGRAM)
+    path = parser.save_antlr_cache(tmp_path)
+    assert path == _antlr_cache.cache_file(tmp_path)
+    assert path.is_file()
+    states = _antlr_cache.states()
+    assert parser.load_antlr_cache(tmp_path)
+    assert _antlr_cache.states() == states
+    assert openqasm3.parse(PROGRAM) == expected
+    assert _antlr_cache.states() == states
+
+
+def test_unusable_cache_is_ignored(tmp_path):
+    assert not parser.load_antlr_cache(tmp_path / "missing")
+    _antlr_cache.cache_file(tmp_path).write_bytes(b"not a pickle")
+    states = _antlr_cache.states()
+    assert not parser.load_antlr_cache(tmp_path)
+    assert _antlr_cache.states() == states
+    assert openqasm3.parse("qubit q; h q;").statements
+
+
+def test_default_directory_follows_platform(monkeypatch, tmp_path):
+    if sys.platform == "win32":
+        monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    elif sys.platform != "darwin":
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    else:
+        monkeypatch.setenv("HOME", str(tmp_path))
+        tmp_path = tmp_path / "Library" / "Caches"
+    assert _antlr_cache.default_directory() == tmp_path / "openqasm3"
@@ -0,0 +1,192 @@
+import copy
+import os
+import pickle
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from openqasm3 import ast
+
+
+def test_span_is_packed():
+    span = ast.Span(1, 2, 3, 4)
+    assert not hasattr(span, "__dict__")
+    assert span == ast.Span(1, 2, 3, 4)
+    assert span != ast.Span(1, 2, 3, 5)
+    assert copy.copy(span) == span
+    assert pickle.loads(pickle.dumps(span)) == span
+
+
+def test_node_equality_ignores_span():
+    left = ast.Identifier("a")
+    right = ast.Identifier("a")
+    left.span = ast.Span(1, 0, 1, 0)
+    assert left == right
+    assert right.span is None
+
+
+# The build of the AST module is fixed when it is first imported, so the slotted build has to be
+# tested in a separate interpreter.
+_SLOTTED_CHECKS = textwrap.dedent(
+    """
+    import copy
+    import pickle
+
+    import openqasm3
+    from openqasm3 import ast, dumps
+    from openqasm3.visitor import QASMTransformer, QASMVisitor
+
+    assert ast.SLOTTED
+    for name in ast.__all__:
+        cls = getattr(ast, name)
+        if isinstance(cls, type) and issubclass(cls, ast.QASMNode):
+            assert "__dict__" not in dir(cls), name
+
+    program = openqasm3.parse("OPENQASM 3.0;\\nqubit[2] q;\\n@ann\\nif (true) { cx q[0], q[1]; }")
+    statement = program.statements[1]
+    assert not hasattr(statement, "__dict__")
+    assert statement.span == ast.Span(3, 0, 4, 27)
+    assert statement.annotations == [ast.Annotation("ann")]
+    assert ast.Identifier("a").span is None
+    assert ast.Identifier("q") == program.statements[0].qubit
+    assert copy.deepcopy(program) == program
+    assert pickle.loads(pickle.dumps(program)) == program
+    assert dumps(program) == dumps(openqasm3.parse(dumps(program)))
+
+    class Rename(QASMTransformer):
+        def visit_Identifier(self, node):
+            return ast.Identifier(node.name.upper())
+
+    class Collect(QASMVisitor):
+        def __init__(self):
+            self.names = []
+
+        def visit_Identifier(self, node):
+            self.names.append(node.name)
+
+    collect = Collect()
+    collect.visit(Rename().visit(program))
+    assert collect.names == ["Q", "CX", "Q", "Q"], collect.names
+
+    try:
+        statement.not_a_field = None
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("slotted nodes accepted an unknown attribute")
+    """
+)
+
+
+@pytest.mark.parametrize("flag", ["0", "1"])
+def test_slotted_build(flag):
+    env = {**os.environ, "OPENQASM3_SLOTTED_AST": flag}
+    script = _SLOTTED_CHECKS if flag == "1" else "from openqasm3 import ast; assert not ast.SLOTTED"
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+
+def _half_pi():
+    return ast.BinaryExpression(
+        ast.BinaryOperator["/"], ast.Identifier("pi"), ast.IntegerLiteral(2)
+    )
+
+
+def _deep_chain(depth):
+    chain = ast.Identifier("x0")
+    for i in range(1, depth):
+        chain = ast.BinaryExpression(ast.BinaryOperator["+"], chain, ast.Identifier(f"x{i}"))
+    return chain
+
+
+def test_structural_hash_follows_equality():
+    left, right = _half_pi(), _half_pi()
+    left.span = ast.Span(1, 0, 1, 3)
+    assert ast.structural_hash(left) == ast.structural_hash(right)
+    statement = ast.ExpressionStatement(left)
+    statement.comments = [ast.Comment("// half")]
+    assert ast.structural_hash(statement) == ast.structural_hash(ast.ExpressionStatement(right))
+    different = [
+        ast.BinaryExpression(ast.BinaryOperator["*"], ast.Identifier("pi"), ast.IntegerLiteral(2)),
+        ast.BinaryExpression(ast.BinaryOperator["/"], ast.Identifier("tau"), ast.IntegerLiteral(2)),
+        ast.BinaryExpression(ast.BinaryOperator["/"], ast.Identifier("pi"), ast.FloatLiteral(2.5)),
+        ast.ExpressionStatement(_half_pi()),
+    ]
+    assert len({ast.structural_hash(node) for node in different + [left]}) == 5
+    assert ast.structural_hash(ast.ArrayLiteral([])) != ast.structural_hash(
+        ast.ArrayLiteral([ast.ArrayLiteral([])])
+    )
+
+
+def test_structural_hash_cache():
+    shared = _half_pi()
+    program = ast.Program([ast.ExpressionStatement(shared), ast.ExpressionStatement(shared)])
+    cache = {}
+    first = ast.structural_hash(program.statements[0], cache)
+    assert len(cache) == 4
+    assert ast.structural_hash(program, cache) == ast.structural_hash(program)
+    assert len(cache) == 6
+    assert cache[id(shared)] == ast.structural_hash(_half_pi())
+    assert ast.structural_hash(program.statements[1], cache) == first
+
+
+def test_structural_hash_handles_deep_trees():
+    depth = 3 * sys.getrecursionlimit()
+    assert ast.structural_hash(_deep_chain(depth)) == ast.structural_hash(_deep_chain(depth))
+
+
+def test_structural_key():
+    memo = {ast.StructuralKey(_half_pi()): "half"}
+    assert memo[ast.StructuralKey(_half_pi())] == "half"
+    assert ast.StructuralKey(ast.Identifier("pi")) not in memo
+    assert ast.StructuralKey(ast.Identifier("pi")) != ast.Identifier("pi")
+    node = ast.Identifier("pi")
+    assert repr(ast.StructuralKey(node)) == f"StructuralKey({node!r})"
+
+
+def test_subtree_interner_shares_expressions():
+    def gate(angle):
+        out = ast.QuantumGate([], ast.Identifier("rz"), [angle], [ast.Identifier("q")])
+        return out
+
+    program = ast.Program(
+        [
+            gate(_half_pi()),
+            gate(_half_pi()),
+            gate(ast.FloatLiteral(0.0)),
+            gate(ast.FloatLiteral(-0.0)),
+            ast.ClassicalDeclaration(
+                ast.IntType(ast.IntegerLiteral(32)), ast.Identifier("a"), None
+            ),
+            ast.ClassicalDeclaration(
+                ast.IntType(ast.IntegerLiteral(32)), ast.Identifier("b"), None
+            ),
+        ]
+    )
+    expected = copy.deepcopy(program)
+    interner = ast.SubtreeInterner()
+    assert interner.intern(program) is program
+    assert program == expected
+    first, second, zero, negative_zero, a, b = program.statements
+    assert first is not second
+    assert first.arguments[0] is second.arguments[0]
+    assert first.name is second.name is zero.name
+    assert first.qubits[0] is negative_zero.qubits[0]
+    assert zero.arguments[0] is not negative_zero.arguments[0]
+    assert a.type is b.type
+    assert a.identifier is not b.identifier
+    # Statements are never shared, but other trees share the same table.
+    size = len(interner)
+    other = interner.intern(ast.Program([gate(_half_pi())]))
+    assert other.statements[0] is not first
+    assert other.statements[0].arguments[0] is first.arguments[0]
+    assert len(interner) == size
+    assert interner.intern(_half_pi()) is first.arguments[0]
+
+
+def test_subtree_interner_handles_deep_trees():
+    depth = 3 * sys.getrecursionlimit()
+    interner = ast.SubtreeInterner()
+    left = interner.intern(_deep_chain(depth))
+    assert interner.intern(_deep_chain(depth)) is left
@@ -0,0 +1,265 @@
+import dataclasses
+import pathlib
+import re
+
+import pytest
+import yaml  # type: ignore[import-untyped]
+from antlr4 import CommonTokenStream, InputStream
+
+import openqasm3
+from openqasm3 import parser
+from openqasm3._scanner import KEYWORDS, scan, skip_trivia, statement_end
+
+from ._helpers import all_spans
+
+GRAMMAR_TESTS_DIR = pathlib.Path(__file__).parents[2] / "grammar" / "tests"
+REFERENCE_FILES = tuple(sorted((GRAMMAR_TESTS_DIR / "reference").glob("**/*.yaml")))
+INVALID_FILES = tuple(sorted((GRAMMAR_TESTS_DIR / "invalid" / "statements").glob("*.qasm")))
+
+
+def _assert_same_as_antlr(source):
+    """Assert that the fast path produces exactly the same tree as ANTLR, or the same error."""
+    try:
+        expected = openqasm3.parse(source)
+    except Exception as exc:  # pylint: disable=broad-except
+        with pytest.raises(type(exc), match=re.escape(str(exc))):
+            openqasm3.parse(source, fast_path=True)
+        return
+    actual = openqasm3.parse(source, fast_path=True)
+    assert actual == expected
+    assert actual.span == expected.span
+    assert all_spans(actual) == all_spans(expected)
+
+
+def _invalid_statements():
+    return [
+        pytest.param(line, id=f"{path.name}:{number}")
+        for path in INVALID_FILES
+        for number, line in enumerate(path.read_text().splitlines(), start=1)
+        if line.strip() and not line.strip().startswith("//")
+    ]
+
+
+@pytest.fixture
+def no_antlr(monkeypatch):
+    """Fail the test if any part of the program is passed to the ANTLR parser."""
+
+    def fail(*args, **kwargs):
+        raise AssertionError("statement was passed to ANTLR")
+
+    monkeypatch.setattr(parser, "_parse_chunk", fail)
+
+
+@pytest.mark.parametrize(
+    "filename", REFERENCE_FILES, ids=lambda x: str(x.relative_to(GRAMMAR_TESTS_DIR))
+)
+def test_reference_suite_matches_antlr(filename):
+    with open(filename, "r") as file:
+        source = yaml.safe_load(file)["source"]
+    _assert_same_as_antlr(source)
+
+
+def test_examples_match_antlr(example_file):
+    with open(example_file, "r") as file:
+        source = file.read()
+    _assert_same_as_antlr(source)
+
+
+@pytest.mark.parametrize("statement", _invalid_statements())
+def test_invalid_statements_match_antlr(statement):
+    _assert_same_as_antlr(statement)
+
+
+def test_subset_does_not_use_antlr(no_antlr):
+    source = """\
+OPENQASM 3.0;
+include "stdgates.inc";
+#pragma target something
+pragma other
+qubit q;
+qubit[4] qs;
+qreg r[2];
+bit c;
+bit[4] cs;
+creg d[2];
+creg e;
+h q;
+x $0;
+rz(0.5) qs[0];
+U(1, -2.5e-1, - pi) qs[1];
+cx qs[0], qs[3];
+gate_name_with_1_digit(.5, 1., 1e3) r[1], $2;
+barrier;
+barrier qs, q, $1;
+reset qs[2];
+measure q;
+measure qs[1] -> cs[1];
+measure $1 -> c;
+cs[0] = measure qs[0];
+c = measure $3;
+"""
+    program = openqasm3.parse(source, fast_path=True)
+    assert program.version == "3.0"
+    assert len(program.statements) == 24
+
+
+def test_subset_matches_antlr():
+    lines = ["OPENQASM 3.0;", 'include "stdgates.inc";', "qubit[16] q;", "bit[16] c;"]
+    for i in range(200):
+        lines.append(f"rz({i / 7}) q[{i % 16}];")
+        lines.append(f"cx q[{i % 16}], q[{(i + 3) % 16}];")
+        lines.append(f"u3(-{i}, 0.5, -pi)  q[{i % 5}] ;")
+    lines.extend(f"c[{i}] = measure q[{i}];" for i in range(16))
+    _assert_same_as_antlr("\n".join(lines))
+
+
+def test_mixed_program_matches_antlr():
+    _assert_same_as_antlr(
+        "OPENQASM 3;\r\nqubit[2] q;\r\n// comment\r\nh q[0];\r\n"
+        "if (true) { x q[1]; } else { y q[1]; }\r\n\th  q [ 1 ] ;  /* comment */ x q[0];\r\n"
+        "@annotation with content\nh q[0];\nx q[1]; cal { // } \n }\nz q[0];\n"
+        "int[8] i = 1; measure q[0] -> c[0]; ctrl @ x q[0], q[1];\n"
+        "for int j in {0, 1} x q[j]; measure q[1];\n"
+        "defcal x $0 { a { b } c } reset q[0];"
+    )
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "",
+        "// only a comment",
+        "h q;\nOPENQASM 3;",
+        "OPENQASM 3\n.0;",
+        "qubit q; h q",
+        "creg c[0];",
+        "qreg q[0];",
+        "h q; else x q;",
+        "gate g q { reset q; }",
+        "pragma",
+        "h q;\n/* unterminated",
+        "def f() { include 'a'; }",
+    ],
+)
+def test_same_behaviour_as_antlr_on_edge_cases(source):
+    _assert_same_as_antlr(source)
+
+
+def test_fast_path_ignored_if_permissive(no_antlr):
+    with pytest.raises(AssertionError, match="passed to ANTLR"):
+        openqasm3.parse("h q; ctrl @ x q, r;", fast_path=True)
+    assert openqasm3.parse("h q;", permissive=True, fast_path=True) == openqasm3.parse("h q;")
+
+
+def test_keywords_match_lexer():
+    literals = {
+        name.strip("'")
+        for name in parser.qasm3Lexer.literalNames
+        if re.fullmatch(r"'[A-Za-z]+'", name) is not None
+    }
+    assert KEYWORDS == literals | {"pragma", "true", "false"}
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [
+        ("h q; x q;", "h q;"),
+        ("pragma a b; c\nh q;", "pragma a b; c"),
+        ("@ann a; b\nh q; x q;", "@ann a; b\nh q;"),
+        ("if (c) x q; else y q; z q;", "if (c) x q; else y q;"),
+        (
+            "if (c) { x q; }\n// comment\nelse { y q; } z q;",
+            "if (c) { x q; }\n// comment\nelse { y q; }",
+        ),
+        ("gate g a { h a; } h q;", "gate g a { h a; }"),
+        ("array[int[8], 2] a = {1, 2}; h q;", "array[int[8], 2] a = {1, 2};"),
+        ("for int i in {1, 2} { h q; } x q;", "for int i in {1, 2} { h q; }"),
+        ("cal { // } ; \n } x q;", "cal { // }"),
+        ("defcal x $0 { a { b; } c; } x q;", "defcal x $0 { a { b; } c; }"),
+        ("h q", "h q"),
+    ],
+)
+def test_statement_end(source, expected):
+    assert source[: statement_end(source, 0)] == expected
+
+
+def test_skip_trivia():
+    source = "  // a\n /* b\n c */\t\r\nh"
+    assert skip_trivia(source, 0) == len(source) - 1
+    assert skip_trivia("/* unterminated", 0) == 0
+
+
+def _lexer_scan(source):
+    """Find what :func:`scan` should, using the ANTLR lexer."""
+    lexer = parser.qasm3Lexer(InputStream(source))
+    stream = CommonTokenStream(lexer)
+    stream.fill()
+    tokens = [token for token in stream.tokens if token.type != token.EOF]
+    out = {"version": None, "comments": [], "includes": [], "pragmas": []}
+    default = [token for token in tokens if token.channel == token.DEFAULT_CHANNEL]
+    if len(default) > 1 and default[0].type == lexer.OPENQASM:
+        out["version"] = tuple(int(part) for part in default[1].text.split("."))
+    for previous, token in zip([None] + default, default + [None]):
+        if previous is not None and previous.type == lexer.INCLUDE:
+            out["includes"].append(
+                {"filename": token.text[1:-1], "line": previous.line, "column": previous.column}
+            )
+        elif previous is not None and previous.type == lexer.PRAGMA:
+            command = token.text if token and token.type == lexer.RemainingLineContent else ""
+            out["pragmas"].append(
+                {"command": command, "line": previous.line, "column": previous.column}
+            )
+    out["comments"] = [
+        {
+            "type": "line" if token.text.startswith("//") else "block",
+            "text": token.text,
+            "line": token.line,
+            "column": token.column,
+        }
+        for token in tokens
+        if token.channel == token.HIDDEN_CHANNEL
+    ]
+    return out
+
+
+def _assert_scan_matches_lexer(source):
+    assert dataclasses.asdict(scan(source)) == _lexer_scan(source)
+
+
+@pytest.mark.parametrize(
+    "filename", REFERENCE_FILES, ids=lambda x: str(x.relative_to(GRAMMAR_TESTS_DIR))
+)
+def test_scan_reference_suite_matches_lexer(filename):
+    with open(filename, "r") as file:
+        source = yaml.safe_load(file)["source"]
+    _assert_scan_matches_lexer(source)
+
+
+def test_scan_examples_match_lexer(example_file):
+    with open(example_file, "r") as file:
+        source = file.read()
+    _assert_scan_matches_lexer(source)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "/* a */ // b\nOPENQASM 3.1; // d",
+        "OPENQASM 3;\ninclude 'a//b.inc'; /* x */ include\n\"c/*d*/.inc\";",
+        "pragma a // b\n#pragma\n  pragma   c  \r\nh q; // e",
+        "@ann a // b /* c\nh q; /* d */",
+        "cal /* a */ // b\n{ // c\n { /* d */ } } // e",
+        'defcal x(0.5) $0 -> bit /* a */ { "//" } /* b */',
+        'defcalgrammar "openpulse"; // a',
+        'bit[2] b = "01"; // a\n\u03c0 = 1; /* b */ x = 1 // 2;',
+        "include_me = 1; calibrate x; mypragma = 2; // a",
+        "",
+    ],
+)
+def test_scan_matches_lexer(source):
+    _assert_scan_matches_lexer(source)
+
+
+def test_scan_comments_match_get_comments():
+    source = "OPENQASM 3.0;\n// a\nqubit q; /* b\n */ h q;"
+    assert parser.get_comments(source) == scan(source).comments == _lexer_scan(source)["comments"]
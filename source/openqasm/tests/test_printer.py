@@ -1,4 +1,6 @@
 import dataclasses
+import io
+import sys
 
 import pytest
 
@@ -772,6 +774,44 @@ a ** b ** c;
         assert output == expected
         assert openqasm3.parse(output) == input_
 
+    def test_deeply_nested_expressions(self):
+        """Chains of operators from code generators can be much deeper than the recursion limit."""
+        depth = 3 * sys.getrecursionlimit()
+        chain = ast.Identifier("a")
+        for i in range(depth):
+            chain = ast.BinaryExpression(
+                lhs=chain,
+                op=ast.BinaryOperator["+"],
+                rhs=ast.UnaryExpression(ast.UnaryOperator["-"], ast.IntegerLiteral(i)),
+            )
+        nested = ast.Identifier("b")
+        for _ in range(depth):
+            nested = ast.Concatenation(lhs=ast.Identifier("c"), rhs=nested)
+        for _ in range(depth):
+            nested = ast.IndexExpression(collection=nested, index=[ast.IntegerLiteral(0)])
+        program = ast.Program(
+            statements=[
+                ast.ExpressionStatement(chain),
+                ast.AliasStatement(ast.Identifier("d"), nested),
+            ]
+        )
+        output = openqasm3.dumps(program).splitlines()
+        assert output[0] == "a" + "".join(f" + -{i}" for i in range(depth)) + ";"
+        concatenation = "c ++ (" * (depth - 1) + "c ++ b" + ")" * (depth - 1)
+        assert output[1] == f"let d = ({concatenation})" + "[0]" * depth + ";"
+
+    def test_overridden_expression_methods_are_used(self):
+        class BracketingPrinter(openqasm3.printer.Printer):
+            def visit_BinaryExpression(self, node, context):
+                self.stream.write("[")
+                super().visit_BinaryExpression(node, context)
+                self.stream.write("]")
+
+        program = openqasm3.parse("a + b * (c - -d[1 + 2]);")
+        stream = io.StringIO()
+        BracketingPrinter(stream).visit(program)
+        assert stream.getvalue() == "[a + [b * ([c - -d[[1 + 2]]])]];\n"
+
 
 class TestOptions:
     """Test the various keyword arguments to the exporter have the desired effects."""
@@ -995,3 +1035,369 @@ def test_CompoundStatement():
     """.strip()
     output = openqasm3.dumps(program).strip()
     assert output == expected
+
+
+class _CountingStream(io.StringIO):
+    """A text stream that records each string written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, s):
+        self.writes.append(s)
+        return super().write(s)
+
+
+class TestBuffering:
+    def test_large_program_is_written_in_few_pieces(self):
+        program = ast.Program(
+            statements=[
+                ast.QuantumGate(
+                    modifiers=[],
+                    name=ast.Identifier("cx"),
+                    arguments=[],
+                    qubits=[ast.Identifier(f"q{i}"), ast.Identifier(f"q{i + 1}")],
+                )
+                for i in range(10_000)
+            ],
+            version="3.0",
+        )
+        stream = _CountingStream()
+        openqasm3.dump(program, stream)
+        expected = "OPENQASM 3.0;\n" + "".join(f"cx q{i}, q{i + 1};\n" for i in range(10_000))
+        assert stream.getvalue() == expected
+        assert 1 < len(stream.writes) < 20
+        # The output is only split at the ends of lines.
+        assert all(piece.endswith("\n") for piece in stream.writes)
+
+    def test_each_visit_is_flushed(self):
+        stream = _CountingStream()
+        printer = openqasm3.printer.Printer(stream)
+        state = openqasm3.printer.PrinterState()
+        for statement in openqasm3.parse("qubit q; if (true) { x q; }").statements:
+            printer.visit(statement, state)
+            assert stream.getvalue().endswith("\n")
+        assert stream.writes == ["qubit q;\n", "if (true) {\n  x q;\n}\n"]
+
+    def test_direct_visitor_calls_are_not_buffered(self):
+        gate = ast.QuantumGate([], ast.Identifier("h"), [], [ast.Identifier("q")])
+        stream = io.StringIO()
+        printer = openqasm3.printer.Printer(stream)
+        state = openqasm3.printer.PrinterState()
+        printer.visit_QuantumGate(gate, state)
+        assert stream.getvalue() == "h q;\n"
+        printer.visit_Identifier(ast.Identifier("x"), state)
+        assert stream.getvalue() == "h q;\nx"
+        stream = io.StringIO()
+        program = openqasm3.parse("qubit q; // a\nh q; // b\n", comments=True)
+        openqasm3.printer.Printer(stream).visit_Program(program, state)
+        assert stream.getvalue() == "qubit q; // a\nh q; // b\n"
+
+    def test_flush(self):
+        class FlushingPrinter(openqasm3.printer.Printer):
+            def visit_QuantumGate(self, node, context):
+                self.flush()
+                self.seen.append(self.stream.raw.getvalue())
+                super().visit_QuantumGate(node, context)
+
+        stream = io.StringIO()
+        printer = FlushingPrinter(stream)
+        printer.seen = []
+        printer.visit(openqasm3.parse("qubit q;\nx q;\ny q;"))
+        assert printer.seen == ["qubit q;\n", "qubit q;\nx q;\n"]
+        assert stream.getvalue() == "qubit q;\nx q;\ny q;\n"
+
+    def test_stream_attributes_are_forwarded(self):
+        class ReadingPrinter(openqasm3.printer.Printer):
+            def visit_QuantumGate(self, node, context):
+                self.seen.append(self.stream.getvalue())
+                super().visit_QuantumGate(node, context)
+
+        printer = ReadingPrinter(io.StringIO())
+        printer.seen = []
+        printer.visit(openqasm3.parse("qubit q;\nx q;"))
+        assert printer.seen == ["qubit q;\n"]
+
+
+class TestDumpStatements:
+    def test_matches_dump(self):
+        program = openqasm3.parse(
+            """
+            OPENQASM 3.0;
+            qubit[2] q;
+            @ann
+            if (true) { x q[0]; } else { if (false) { y q; } }
+            def f(int a) -> int { return a + 1; }
+            pragma command
+            """
+        )
+        for kwargs in ({}, {"indent": "\t", "chain_else_if": False}):
+            stream = io.StringIO()
+            openqasm3.dump_statements(
+                iter(program.statements), stream, version=program.version, **kwargs
+            )
+            assert stream.getvalue() == openqasm3.dumps(program, **kwargs)
+
+    def test_without_version(self):
+        stream = io.StringIO()
+        openqasm3.dump_statements([], stream)
+        assert stream.getvalue() == ""
+        openqasm3.dump_statements((ast.Include("stdgates.inc") for _ in range(2)), stream)
+        assert stream.getvalue() == 'include "stdgates.inc";\ninclude "stdgates.inc";\n'
+
+    def test_statements_are_consumed_lazily(self):
+        stream = _CountingStream()
+
+        def statements():
+            yield ast.QubitDeclaration(ast.Identifier("q"), ast.IntegerLiteral(2))
+            for i in range(100_000):
+                yield ast.QuantumGate([], ast.Identifier("h"), [], [ast.Identifier(f"q{i}")])
+                # The output is flushed in pieces as the statements are generated.
+                assert len(stream.getvalue()) > i * 8 - 100_000
+
+        openqasm3.dump_statements(statements(), stream, version="3")
+        lines = stream.getvalue().splitlines()
+        assert lines[:3] == ["OPENQASM 3;", "qubit[2] q;", "h q0;"]
+        assert lines[-1] == "h q99999;"
+        assert 10 < len(stream.writes) < 1_000
+
+
+class TestFastPath:
+    """Flat statements are formatted without visiting each of their nodes, which must give the same
+    output as visiting them."""
+
+    PROGRAM = """
+OPENQASM 3.0;
+qubit[4] q;
+bit[4] c;
+bit b;
+int[32] i = 2;
+uint u = n;
+float[64] f = -1.5;
+angle[2 * n] a = pi / 2;
+bool flag;
+complex[float[64]] z = 1;
+bit m = measure q[0];
+@ann
+h q[0];
+x q;
+rz(0.25) q[1];
+u3(0.5, -1.25, pi) q[2];
+rx(theta / 2 + 1) q[0];
+ctrl @ inv @ pow(2) @ x q[0], q[1];
+negctrl(n + 1) @ x q[0], q[1];
+cx q[0:2], q[3];
+cx q[{0, 1}], q[2];
+cx q[i][0], q[i, 1];
+gphase(pi);
+U(1, 2, 3) $0, $1;
+barrier;
+barrier q[0], q;
+reset q[3];
+reset q[0:1];
+c[0] = measure q[0];
+c = measure q;
+measure q[1];
+@ann
+c[1] = measure q[1];
+if (b) {
+  x q[0];
+} else if (!b) {
+  c[2] = measure q[2];
+} else {
+  int[8] k = 1;
+}
+switch (i) {
+  case 1 {
+    barrier q[0];
+  }
+  default {
+    reset q;
+  }
+}
+"""
+
+    class GenericPrinter(openqasm3.printer.Printer):
+        def visit_Identifier(self, node, context):
+            self.stream.write(node.name)
+
+    @pytest.mark.parametrize(
+        "kwargs", [{}, {"old_measurement": True}, {"indent": "\t", "chain_else_if": False}]
+    )
+    def test_output_matches_visitor(self, kwargs):
+        program = openqasm3.parse(self.PROGRAM)
+        stream = io.StringIO()
+        self.GenericPrinter(stream, **kwargs).visit(program)
+        output = openqasm3.dumps(program, **kwargs)
+        assert output == stream.getvalue()
+        if not kwargs:
+            assert output == self.PROGRAM.lstrip()
+
+    def test_overridden_methods_are_used(self):
+        class HexPrinter(openqasm3.printer.Printer):
+            def visit_IntegerLiteral(self, node, context):
+                self.stream.write(hex(node.value))
+
+        class ArrowPrinter(openqasm3.printer.Printer):
+            def visit_QuantumMeasurementStatement(self, node, context):
+                self._start_line(context)
+                self.stream.write("// measurement")
+                self._end_line(context)
+
+        program = openqasm3.parse("int i = 16; cx q[10], q[11]; c[0] = measure q[0]; h q;")
+        stream = io.StringIO()
+        HexPrinter(stream).visit(program)
+        assert stream.getvalue() == (
+            "int i = 0x10;\ncx q[0xa], q[0xb];\nc[0x0] = measure q[0x0];\nh q;\n"
+        )
+        stream = io.StringIO()
+        ArrowPrinter(stream).visit(program)
+        assert stream.getvalue() == "int i = 16;\ncx q[10], q[11];\n// measurement\nh q;\n"
+
+
+class TestParallel:
+    PROGRAM = TestFastPath.PROGRAM + "".join(
+        f"cx q[{i % 4}], q[{(i + 1) % 4}];\n" for i in range(40)
+    )
+
+    @pytest.mark.parametrize("workers", [2, 3])
+    def test_output_matches_serial(self, workers):
+        program = openqasm3.parse(self.PROGRAM)
+        for kwargs in ({}, {"indent": "\t", "old_measurement": True}):
+            assert openqasm3.dumps(program, workers=workers, **kwargs) == openqasm3.dumps(
+                program, **kwargs
+            )
+        stream = io.StringIO()
+        openqasm3.dump(program, stream, workers=workers)
+        assert stream.getvalue() == self.PROGRAM.lstrip()
+
+    def test_statements_are_sent_if_workers_cannot_fork(self, monkeypatch):
+        monkeypatch.setattr(openqasm3.printer, "_FORK_CONTEXT", None)
+        program = openqasm3.parse(self.PROGRAM)
+        program.version = None
+        assert openqasm3.dumps(program, workers=2) == openqasm3.dumps(program)
+
+    def test_small_inputs_are_printed_serially(self):
+        program = ast.Program(statements=[ast.Include("stdgates.inc")], version="3")
+        assert openqasm3.dumps(program, workers=4) == 'OPENQASM 3;\ninclude "stdgates.inc";\n'
+        assert openqasm3.dumps(ast.Identifier("x"), workers=4) == "x"
+
+    def test_invalid_arguments(self):
+        program = openqasm3.parse(self.PROGRAM)
+        with pytest.raises(ValueError, match="at least 1"):
+            openqasm3.dumps(program, workers=0)
+        with pytest.raises(TypeError, match="unknown_option"):
+            openqasm3.dumps(program, workers=2, unknown_option=True)
+
+
+class TestComments:
+    PROGRAM = """\
+// A header.
+OPENQASM 3.0;
+include "stdgates.inc"; /* trailing */
+/* leading */
+gate g a {
+  // inside
+  h a; // after h
+} // after g
+qubit q; /* one */ // two
+if (true) {
+  x q;
+} else if (false) {
+  y q;
+} else {
+  // leading else
+  z q;
+}
+// before a pragma
+pragma a b
+// footer
+"""
+
+    @pytest.mark.parametrize("fast_path", [False, True])
+    def test_round_trip(self, fast_path):
+        program = openqasm3.parse(self.PROGRAM, comments=True, fast_path=fast_path)
+        assert openqasm3.dumps(program) == self.PROGRAM
+
+    def test_parallel(self):
+        program = openqasm3.parse(self.PROGRAM, comments=True)
+        assert openqasm3.dumps(program, workers=2) == self.PROGRAM
+
+    def test_fast_path_is_used_for_uncommented_statements(self):
+        program = openqasm3.parse("qubit[2] q; // a\nh q[0];\ncx q[0], q[1];\n", comments=True)
+        assert openqasm3.dumps(program) == "qubit[2] q; // a\nh q[0];\ncx q[0], q[1];\n"
+
+    @pytest.mark.parametrize("fast_path", [False, True])
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_comments_inside_statements(self, workers, fast_path):
+        source = (
+            "OPENQASM 3.0; // version\n"
+            "qubit[2] q;\n"
+            "h /* inside */ q[0];\n"
+            "cx q[0], // control\n"
+            "  // target\n"
+            "  q[1];\n"
+            "gate g a {\n"
+            "  h a;\n"
+            "  // last\n"
+            "}\n"
+            "x q[0];\n"
+        )
+        program = openqasm3.parse(source, comments=True, fast_path=fast_path)
+        assert openqasm3.dumps(program, workers=workers) == (
+            "OPENQASM 3.0; // version\n"
+            "qubit[2] q;\n"
+            "h q[0]; /* inside */\n"
+            "cx q[0], q[1]; // control\n"
+            "// target\n"
+            "gate g a {\n"
+            "  h a; // last\n"
+            "}\n"
+            "x q[0];\n"
+        )
+
+    @pytest.mark.parametrize("fast_path", [False, True])
+    def test_comments_at_block_ends(self, fast_path):
+        source = (
+            "if (true) {\n"
+            "  x $0;\n"
+            "  // end of block\n"
+            "} // t\n"
+            "else {\n"
+            "  y $0;\n"
+            "}\n"
+            "for int i in [0:1] {\n"
+            "  // empty\n"
+            "}\n"
+            "z $0;\n"
+        )
+        program = openqasm3.parse(source, comments=True, fast_path=fast_path)
+        expected = (
+            "if (true) {\n"
+            "  x $0; // end of block\n"
+            "} else {\n"
+            "  y $0;\n"
+            "} // t\n"
+            "for int i in [0:1] {\n"
+            "} // empty\n"
+            "z $0;\n"
+        )
+        assert openqasm3.dumps(program) == expected
+        reparsed = openqasm3.parse(expected, comments=True, fast_path=fast_path)
+        assert openqasm3.dumps(reparsed) == expected
+
+    def test_constructed_comments(self):
+        statement = ast.QuantumGate([], ast.Identifier("h"), [], [ast.Identifier("q")])
+        statement.comments = [ast.Comment("// before"), ast.Comment("/* after */", trailing=True)]
+        program = ast.Program([statement])
+        program.comments = [ast.Comment("// end", trailing=True)]
+        assert openqasm3.dumps(program) == "// before\nh q; /* after */\n// end\n"
+
+    def test_comments_do_not_chain_else_if(self):
+        inner = ast.BranchingStatement(ast.BooleanLiteral(False), [], [])
+        inner.comments = [ast.Comment("// inner")]
+        outer = ast.BranchingStatement(ast.BooleanLiteral(True), [], [inner])
+        assert openqasm3.dumps(outer) == (
+            "if (true) {\n} else {\n  // inner\n  if (false) {\n  }\n}\n"
+        )
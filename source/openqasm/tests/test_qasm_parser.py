@@ -1,4 +1,8 @@
+import copy
 import dataclasses
+import io
+import os
+import pickle
 import textwrap
 from typing import Any, Optional
 
@@ -80,8 +84,25 @@ from openqasm3.ast import (
     UnaryExpression,
     UnaryOperator,
 )
-from openqasm3.parser import combine_span, parse, QASM3ParsingError, get_comments
-from openqasm3.visitor import QASMVisitor
+from openqasm3 import ast, parser
+from openqasm3.parser import (
+    combine_span,
+    parse,
+    QASM3ParsingError,
+    get_comments,
+    iter_statements,
+    parse_many,
+    IncludeResolver,
+    TextEdit,
+    reparse,
+    ParseCache,
+    Parser,
+    ParserStatistics,
+    QASMNodeVisitor,
+)
+from openqasm3.visitor import QASMTransformer, QASMVisitor
+
+from ._helpers import all_spans
 
 
 def _with_annotations(node, annotations):
@@ -2650,3 +2671,634 @@ def test_rejects_invalid_version(version):
 def test_attempts_invalid_version_when_allowed(version):
     prog = f"OPENQASM {version};"
     assert parse(prog, ignore_version=True) is not None
+
+
+def test_prediction_modes_produce_identical_trees(example_file):
+    with open(example_file, "r") as f:
+        content = f.read()
+    two_stage = parse(content, prediction_mode="two-stage")
+    ll = parse(content, prediction_mode="ll")
+    assert two_stage == ll
+    assert all_spans(two_stage) == all_spans(ll)
+
+
+@pytest.mark.parametrize("prediction_mode", ["two-stage", "ll"])
+def test_prediction_modes_raise_on_invalid_programs(prediction_mode):
+    with pytest.raises(QASM3ParsingError):
+        parse("qubit q; h q", prediction_mode=prediction_mode)
+    with pytest.raises(QASM3ParsingError):
+        parse("gate g a { h a; ", prediction_mode=prediction_mode)
+
+
+def test_two_stage_prediction_falls_back_in_permissive_mode(capsys):
+    source = "qubit q h q;"
+    two_stage = parse(source, permissive=True, prediction_mode="two-stage")
+    two_stage_errors = capsys.readouterr().err
+    ll = parse(source, permissive=True, prediction_mode="ll")
+    ll_errors = capsys.readouterr().err
+    assert two_stage == ll
+    assert all_spans(two_stage) == all_spans(ll)
+    # The failed SLL attempt should not report the error a second time.
+    assert two_stage_errors == ll_errors == "line 1:8 missing ';' at 'h'\n"
+
+
+def test_rejects_unknown_prediction_mode():
+    with pytest.raises(ValueError, match="unknown prediction mode"):
+        parse("qubit q;", prediction_mode="sll")
+
+
+_REUSED_PARSERS = {fast_path: Parser(fast_path=fast_path) for fast_path in (False, True)}
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_reused_parser_matches_parse(example_file, fast_path):
+    with open(example_file, "r") as f:
+        content = f.read()
+    # The same parser objects are shared by every example, so this also checks that no state
+    # leaks from one parse to the next.
+    reused = _REUSED_PARSERS[fast_path].parse(content)
+    expected = parse(content, fast_path=fast_path)
+    assert reused == expected
+    assert all_spans(reused) == all_spans(expected)
+
+
+def test_reused_parser_recovers_from_errors():
+    parser = Parser(fast_path=True)
+    source = "OPENQASM 3.0;\nqubit q;\nh q;\nx q;\n"
+    expected = parse(source)
+    for invalid in ("qubit q; h q", "qubit q; h q; $", "gate g a { h a; ", "OPENQASM 4.0;"):
+        with pytest.raises(QASM3ParsingError):
+            parser.parse(invalid)
+        program = parser.parse(source)
+        assert program == expected
+        assert all_spans(program) == all_spans(expected)
+
+
+def test_reused_parser_reports_errors_like_parse(capsys):
+    source = "qubit q h q;"
+    parser = Parser(permissive=True)
+    for _ in range(2):
+        assert parser.parse(source) == parse(source, permissive=True)
+        errors = capsys.readouterr().err
+        assert errors == "line 1:8 missing ';' at 'h'\n" * 2
+
+
+def test_reused_parser_statistics():
+    source = "qubit[2] q; bit[2] c; h q[0]; cx q[0], q[1]; c = measure q;"
+    parser = Parser()
+    parser.parse(source)
+    parser.reset_statistics()
+    parser.parse(source)
+    statistics = parser.statistics
+    assert statistics.parses == statistics.warm_parses == 1
+    assert statistics.dfa_misses == 0
+    assert statistics.ll_fallbacks == 0
+    # Including the end-of-file token.
+    assert statistics.tokens == 35
+    assert statistics.hit_rate == 1.0
+    with pytest.raises(QASM3ParsingError):
+        parser.parse("qubit q; h q")
+    assert statistics.parses == 2
+    assert statistics.ll_fallbacks == 1
+    # Whether a parse misses depends on what the process has parsed before, but a program that has
+    # just been parsed is always warm.
+    warm, misses = statistics.warm_parses, statistics.dfa_misses
+    parser.parse("if ((((((a ** b) ** c) ** d) ** e) ** f)) {}")
+    assert statistics.warm_parses == warm + (statistics.dfa_misses == misses)
+    warm, misses = statistics.warm_parses, statistics.dfa_misses
+    parser.parse("if ((((((a ** b) ** c) ** d) ** e) ** f)) {}")
+    assert statistics.dfa_misses == misses
+    assert statistics.warm_parses == warm + 1
+    assert statistics.hit_rate == statistics.warm_parses / 4
+    parser.reset_statistics()
+    assert parser.statistics == ParserStatistics()
+    assert parser.statistics.hit_rate == 0.0
+
+
+def test_reused_parser_rejects_unknown_prediction_mode():
+    with pytest.raises(ValueError, match="unknown prediction mode"):
+        Parser(prediction_mode="sll")
+
+
+def test_parse_errors_report_position():
+    with pytest.raises(QASM3ParsingError) as e_info:
+        parse("qubit q;\nh q")
+    assert (e_info.value.line, e_info.value.column) == (2, 3)
+    assert str(e_info.value) == "L2:C3: parse failed"
+    assert e_info.value.filename is None
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many_matches_parse(tmp_path, workers):
+    sources = [
+        "OPENQASM 3.0;\nqubit[2] q;\nx q[0];",
+        "int a = 1 + 2 * 3;\nbit c = measure q;\na -= 2 ** 3;",
+        "input angle[16] theta;\nctrl @ inv @ rz(-theta) q[0], q[1];\ndelay[4us] q;",
+    ]
+    (tmp_path / "file.qasm").write_text(sources[1])
+    inputs = [sources[0], tmp_path / "file.qasm", sources[2]] * 3
+    programs = parse_many(inputs, workers=workers)
+    assert len(programs) == len(inputs)
+    for program, source in zip(programs, sources * 3):
+        expected = parse(source)
+        assert program == expected
+        assert all_spans(program) == all_spans(expected)
+
+
+def test_parse_many_returns_errors_in_order(tmp_path):
+    (tmp_path / "valid.qasm").write_text("qubit q;\nh q;\n")
+    (tmp_path / "invalid.qasm").write_text("qubit q;\nh q\n")
+    inputs = [
+        tmp_path / "valid.qasm",
+        tmp_path / "invalid.qasm",
+        "qubit q; h q",
+        tmp_path / "missing.qasm",
+        "OPENQASM 4.0;",
+        str(tmp_path / "valid.qasm"),
+    ]
+    results = parse_many(inputs, workers=2)
+    assert results[0] == parse("qubit q;\nh q;\n")
+    assert isinstance(results[1], QASM3ParsingError)
+    assert results[1].filename == str(tmp_path / "invalid.qasm")
+    assert (results[1].line, results[1].column) == (3, 0)
+    assert str(results[1]) == f"{tmp_path / 'invalid.qasm'}: L3:C0: parse failed"
+    assert isinstance(results[2], QASM3ParsingError)
+    assert results[2].filename is None
+    assert (results[2].line, results[2].column) == (1, 12)
+    assert isinstance(results[3], FileNotFoundError)
+    assert isinstance(results[4], QASM3ParsingError)
+    assert "unsupported version" in str(results[4])
+    # Strings are always program text, even if they happen to be a path.
+    assert isinstance(results[5], QASM3ParsingError)
+
+
+def test_parse_many_validates_arguments():
+    assert not parse_many([])
+    with pytest.raises(ValueError, match="number of workers"):
+        parse_many(["qubit q;"], workers=0)
+    with pytest.raises(ValueError, match="unknown prediction mode"):
+        parse_many(["qubit q;"], prediction_mode="sll")
+
+
+_CACHED_SOURCE = "OPENQASM 3.0;\nqubit[2] q;\nx q[0];\nint a = 1 + 2;\n"
+
+
+def test_parse_cache_counts_hits_and_misses():
+    cache = ParseCache()
+    expected = parse(_CACHED_SOURCE)
+    for _ in range(3):
+        program = cache.parse(_CACHED_SOURCE)
+        assert program == expected
+        assert all_spans(program) == all_spans(expected)
+    assert (cache.hits, cache.disk_hits, cache.misses) == (2, 0, 1)
+    assert len(cache) == 1
+    # The options that affect the output are part of the key, but the others are not.
+    cache.parse(_CACHED_SOURCE, permissive=True)
+    cache.parse(_CACHED_SOURCE, ignore_version=True)
+    cache.parse(_CACHED_SOURCE, prediction_mode="ll", fast_path=True)
+    assert (cache.hits, cache.misses) == (3, 3)
+    cache.clear()
+    assert (cache.hits, cache.disk_hits, cache.misses, len(cache)) == (0, 0, 0, 0)
+
+
+def test_parse_cache_returns_independent_copies():
+    class Rename(QASMTransformer):
+        def visit_Identifier(self, node):
+            return Identifier("renamed")
+
+    cache = ParseCache()
+    first = cache.parse(_CACHED_SOURCE)
+    Rename().visit(first)
+    first.statements.clear()
+    second = cache.parse(_CACHED_SOURCE)
+    assert second == parse(_CACHED_SOURCE)
+    assert second is not first
+    Rename().visit(second)
+    assert cache.parse(_CACHED_SOURCE) == parse(_CACHED_SOURCE)
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    sources = [f"int a = {i};" for i in range(3)]
+    cache.parse(sources[0])
+    cache.parse(sources[1])
+    cache.parse(sources[0])
+    cache.parse(sources[2])
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.parse(sources[0])
+    assert cache.hits == 2
+    cache.parse(sources[1])
+    assert cache.misses == 4
+    uncached = ParseCache(maxsize=0)
+    uncached.parse(sources[0])
+    uncached.parse(sources[0])
+    assert (len(uncached), uncached.hits, uncached.misses) == (0, 0, 2)
+    with pytest.raises(ValueError, match="maximum size"):
+        ParseCache(maxsize=-1)
+
+
+def test_parse_cache_directory_is_shared(tmp_path):
+    first = ParseCache(directory=tmp_path / "cache")
+    expected = first.parse(_CACHED_SOURCE)
+    second = ParseCache(directory=tmp_path / "cache")
+    program = second.parse(_CACHED_SOURCE)
+    assert program == expected
+    assert all_spans(program) == all_spans(expected)
+    assert (second.hits, second.disk_hits, second.misses) == (0, 1, 0)
+    second.parse(_CACHED_SOURCE)
+    assert (second.hits, second.disk_hits, second.misses) == (1, 1, 0)
+    # Unreadable entries are parsed again and replaced.
+    for path in (tmp_path / "cache").iterdir():
+        path.write_bytes(b"not a pickle")
+    third = ParseCache(directory=tmp_path / "cache")
+    assert third.parse(_CACHED_SOURCE) == expected
+    assert (third.disk_hits, third.misses) == (0, 1)
+    assert ParseCache(directory=tmp_path / "cache").parse(_CACHED_SOURCE) == expected
+
+
+def test_parse_cache_does_not_cache_errors(tmp_path):
+    cache = ParseCache(directory=tmp_path)
+    for _ in range(2):
+        with pytest.raises(QASM3ParsingError):
+            cache.parse("OPENQASM 4.0;")
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+    assert not list(tmp_path.iterdir())
+
+
+class _CountingStream(io.StringIO):
+    """A text stream that records the total number of characters read from it."""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.characters_read = 0
+
+    def read(self, size=-1):
+        out = super().read(size)
+        self.characters_read += len(out)
+        return out
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 16])
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_iter_statements_matches_parse(example_file, block_size, fast_path, monkeypatch):
+    monkeypatch.setattr(parser, "_STREAM_BLOCK_SIZE", block_size)
+    with open(example_file, "r") as f:
+        expected = parse(f.read()).statements
+    actual = list(iter_statements(example_file, fast_path=fast_path))
+    assert actual == expected
+    assert all_spans(actual) == all_spans(expected)
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 1 << 16])
+def test_iter_statements_splits_at_statement_boundaries(block_size, monkeypatch):
+    monkeypatch.setattr(parser, "_STREAM_BLOCK_SIZE", block_size)
+    source = (
+        "OPENQASM 3.0;\r\n/* multi\nline */ qubit[2] q; // comment\n"
+        "if (true) { x q[0]; }\n// between\nelse { y q[0]; } h q[1];\n"
+        "#pragma a; b\n@annotation { x\nh q; cal { a { b; } \n } array[int[8], 2] a = {1, 2};\n"
+        "if (false) { z q; } elsewhere q;\nh q"
+        ";"
+    )
+    expected = parse(source).statements
+    actual = list(iter_statements(io.StringIO(source)))
+    assert actual == expected
+    assert all_spans(actual) == all_spans(expected)
+
+
+def test_iter_statements_reads_lazily(monkeypatch):
+    monkeypatch.setattr(parser, "_STREAM_BLOCK_SIZE", 64)
+    stream = _CountingStream("OPENQASM 3.0;\nqubit q;\n" + "h q;\n" * 10_000)
+    statements = iter_statements(stream)
+    assert next(statements) == QubitDeclaration(qubit=Identifier("q"), size=None)
+    assert stream.characters_read < 1_000
+    assert sum(1 for _ in statements) == 10_000
+
+
+def test_iter_statements_raises_at_bad_statement():
+    statements = iter_statements(io.StringIO("qubit q;\nh q;\nh q\nx q;"))
+    assert isinstance(next(statements), QubitDeclaration)
+    assert isinstance(next(statements), QuantumGate)
+    with pytest.raises(QASM3ParsingError):
+        next(statements)
+
+
+@pytest.mark.parametrize("version", ["2.0", "4.0"])
+def test_iter_statements_checks_version(version):
+    source = f"OPENQASM {version}; qubit q;"
+    with pytest.raises(QASM3ParsingError, match="unsupported version"):
+        list(iter_statements(io.StringIO(source)))
+    assert len(list(iter_statements(io.StringIO(source), ignore_version=True))) == 1
+
+
+def test_iter_statements_rejects_late_version():
+    with pytest.raises(QASM3ParsingError, match="must be the first statement"):
+        list(iter_statements(io.StringIO("qubit q;\nOPENQASM 3.0;")))
+
+
+@pytest.mark.parametrize("source", ["", "  // only a comment\n", "OPENQASM 3;"])
+def test_iter_statements_empty(source):
+    assert not list(iter_statements(io.StringIO(source)))
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.parametrize("spans", ["lazy", "none"])
+def test_span_modes_match_eager(parsed_example, spans, fast_path):
+    with open(parsed_example.filename, "r") as f:
+        program = parse(f.read(), spans=spans, fast_path=fast_path)
+    assert program == parsed_example.ast
+    if spans == "none":
+        assert all(span is None for span in all_spans(program))
+    else:
+        assert all_spans(program) == all_spans(parsed_example.ast)
+
+
+def test_lazy_spans_are_resolved_when_read():
+    source = "creg c[2];\nlet a = b ++ c;\n"
+    program = parse(source, spans="lazy")
+    declaration, alias = program.statements
+    span = declaration.type.span
+    assert isinstance(span, Span)
+    assert span._first is not None  # pylint: disable=protected-access
+    assert span.end_column == 8
+    assert span._first is None  # pylint: disable=protected-access
+    assert span == Span(1, 0, 1, 8)
+    assert Span(1, 0, 1, 8) == span
+    assert span != Span(1, 0, 1, 7)
+    assert repr(span) == "Span(start_line=1, start_column=0, end_line=1, end_column=8)"
+    # Spans combined from several parts are resolved correctly.
+    assert alias.value.span == Span(2, 8, 2, 13)
+    # Pickling and copying produce plain spans.
+    assert type(pickle.loads(pickle.dumps(alias.value.lhs.span))) is Span
+    assert type(copy.deepcopy(alias).value.rhs.span) is Span
+    assert all_spans(copy.deepcopy(program)) == all_spans(parse(source))
+
+
+@pytest.mark.parametrize("spans", ["eager", "lazy"])
+def test_span_fields_can_be_set(spans):
+    program = parse("qubit q;\nh q;\n", spans=spans)
+    span = program.statements[1].span
+    span.start_line = 5
+    span.end_line += 4
+    assert span == Span(5, 0, 6, 3)
+    program.statements[0].span.end_column = 10
+    assert program.statements[0].span == Span(1, 0, 1, 10)
+
+
+def test_register_argument_span():
+    program = parse("def f(creg c[2], creg d) {}")
+    first, second = program.statements[0].arguments
+    assert first.type.span == Span(1, 6, 1, 14)
+    assert second.type.span == Span(1, 17, 1, 20)
+
+
+def test_span_mode_of_reused_parser():
+    for fast_path in (False, True):
+        program = Parser(spans="none", fast_path=fast_path).parse("qubit q;\nx q;\nif (b) x q;")
+        assert program == parse("qubit q;\nx q;\nif (b) x q;")
+        assert all(span is None for span in all_spans(program))
+
+
+def test_unknown_span_mode():
+    with pytest.raises(ValueError, match="unknown span mode 'all'"):
+        parse("qubit q;", spans="all")
+    with pytest.raises(ValueError, match="unknown span mode"):
+        Parser(spans=None)
+
+
+def _attached_comments(program):
+    """Get the comments attached to each statement of a program, in source order, as pairs of the
+    class name of the statement and a list of the comments' text and whether they are trailing."""
+    out = [("Program", [(c.text, c.trailing) for c in program.comments or ()])]
+    for node in _all_statements(program.statements):
+        out.append((type(node).__name__, [(c.text, c.trailing) for c in node.comments or ()]))
+    return out
+
+
+def _all_statements(statements):
+    for statement in statements:
+        yield statement
+        for field in dataclasses.fields(statement):
+            value = getattr(statement, field.name)
+            if isinstance(value, list) and value and isinstance(value[0], ast.Statement):
+                yield from _all_statements(value)
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_comments_are_attached_to_nearest_statement(fast_path):
+    source = textwrap.dedent(
+        """\
+        /* Header */
+        OPENQASM 3.0; // version
+        include "stdgates.inc"; // include
+        qubit q;
+        // gate
+        gate g a {
+            h a; /* h */ // h again
+            // end of body
+        }
+        if (true) { x q; }  // if
+        // footer
+        """
+    )
+    program = parse(source, comments=True, fast_path=fast_path)
+    assert _attached_comments(program) == [
+        ("Program", [("/* Header */", False), ("// footer", True)]),
+        ("Include", [("// include", True)]),
+        ("QubitDeclaration", []),
+        ("QuantumGateDefinition", [("// gate", False)]),
+        ("QuantumGate", [("/* h */", True), ("// h again", True), ("// end of body", True)]),
+        ("BranchingStatement", [("// if", True)]),
+        ("QuantumGate", []),
+    ]
+    assert [(c.text, c.trailing) for c in program.version_comments] == [("// version", True)]
+    assert program == parse(source)
+    assert program.statements[0].comments[0].span == Span(3, 24, 3, 33)
+    assert program.version_comments[0].span == Span(2, 14, 2, 23)
+
+
+def test_comment_spans():
+    program = parse("h q;\n/* a\n bc */ x q;", comments=True)
+    assert program.statements[1].comments[0].span == Span(2, 0, 3, 5)
+
+
+def test_comments_with_lazy_spans():
+    source = "h q; // a\nx q;\n"
+    assert _attached_comments(parse(source, comments=True, spans="lazy")) == _attached_comments(
+        parse(source, comments=True)
+    )
+
+
+def test_comments_need_spans():
+    with pytest.raises(ValueError, match="without the spans"):
+        parse("h q; // a", comments=True, spans="none")
+
+
+def test_include_resolver_inlines_nested_includes(tmp_path):
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "gates.inc").write_text('include "basis.inc";\ngate g a { b a; }\n')
+    (tmp_path / "lib" / "basis.inc").write_text("gate b a { U(0, 0, 0) a; }\n")
+    (tmp_path / "local.inc").write_text("qubit q;\n")
+    resolver = IncludeResolver([tmp_path / "lib"])
+    program = parse('OPENQASM 3.0;\ninclude "gates.inc";\ninclude "local.inc";\ng q;\n')
+    inlined = resolver.inline(program, tmp_path)
+    assert inlined == parse(
+        "OPENQASM 3.0;\ngate b a { U(0, 0, 0) a; }\ngate g a { b a; }\nqubit q;\ng q;\n"
+    )
+    assert inlined.statements[-1] is program.statements[-1]
+    assert program.statements[0] == ast.Include("gates.inc")
+
+    pairs = resolver.resolve(program, tmp_path)
+    assert [include for include, _ in pairs] == program.statements[:2]
+    assert pairs[0][1] == parse("gate b a { U(0, 0, 0) a; }\ngate g a { b a; }\n")
+    assert pairs[1][1] == parse("qubit q;\n")
+
+
+def test_include_resolver_parses_each_file_once(tmp_path):
+    path = tmp_path / "gates.inc"
+    path.write_text("gate g a { U(0, 0, 0) a; }\n")
+    resolver = IncludeResolver([tmp_path])
+    program = parse('include "gates.inc";\n')
+    first = resolver.inline(program)
+    for _ in range(3):
+        assert resolver.inline(program) == first
+    assert (resolver.misses, resolver.hits, len(resolver)) == (1, 3, 1)
+    # Each call gets its own copy of the included statements.
+    assert resolver.inline(program).statements[0] is not first.statements[0]
+
+    path.write_text("gate g a { U(0, 0, 1) a; }\n")
+    os.utime(path, ns=(0, 0))
+    assert resolver.inline(program) == parse("gate g a { U(0, 0, 1) a; }\n")
+    assert resolver.misses == 2
+
+    resolver.clear()
+    assert (resolver.misses, resolver.hits, len(resolver)) == (0, 0, 0)
+
+
+def test_include_resolver_errors(tmp_path):
+    (tmp_path / "a.inc").write_text('include "b.inc";\n')
+    (tmp_path / "b.inc").write_text('qubit q;\ninclude "a.inc";\n')
+    (tmp_path / "bad.inc").write_text("qubit q\n")
+    resolver = IncludeResolver([tmp_path])
+    with pytest.raises(QASM3ParsingError, match=r"b\.inc: L2:C0: include cycle: .*a\.inc -> "):
+        resolver.inline(parse('include "a.inc";'))
+    with pytest.raises(QASM3ParsingError, match="^L1:C9: cannot find the included file 'c.inc'"):
+        resolver.resolve(parse('qubit q; include "c.inc";'))
+    with pytest.raises(QASM3ParsingError, match=r"bad\.inc: ") as excinfo:
+        resolver.inline(parse('include "bad.inc";'))
+    assert excinfo.value.filename == str((tmp_path / "bad.inc").resolve())
+
+
+_REPARSE_SOURCE = """\
+OPENQASM 3.0;
+include "stdgates.inc";
+qubit[2] q;
+bit[2] c;
+h q[0]; cx q[0], q[1];
+if (c[0]) {
+    x q[1];
+}
+@reversible
+gate g a { U(0, 0, 0) a; }
+c = measure q;
+"""
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        pytest.param(TextEdit(5, 0, 5, 1, "x"), id="inside statement"),
+        pytest.param(TextEdit(5, 7, 5, 7, "\n\n"), id="new lines"),
+        pytest.param(TextEdit(5, 1, 5, 1, "   "), id="same line"),
+        pytest.param(TextEdit(8, 1, 8, 1, " else { z q[0]; }"), id="add else"),
+        pytest.param(TextEdit(6, 0, 9, 0, ""), id="delete statements"),
+        pytest.param(TextEdit(10, 26, 10, 26, "\nmeasure q[0];"), id="insert statement"),
+        pytest.param(TextEdit(11, 0, 12, 0, ""), id="delete last"),
+        pytest.param(TextEdit(1, 9, 1, 12, "3"), id="version"),
+        pytest.param(TextEdit(2, 0, 2, 0, "// header\n"), id="header"),
+        pytest.param(TextEdit(3, 0, 12, 0, ""), id="delete all"),
+    ],
+)
+@pytest.mark.parametrize("spans", ["eager", "lazy"])
+def test_reparse_matches_parse(edit, spans):
+    program = parse(_REPARSE_SOURCE, spans=spans)
+    new_source = edit.apply(_REPARSE_SOURCE)
+    expected = parse(new_source)
+    actual = reparse(program, _REPARSE_SOURCE, edit, spans=spans)
+    assert actual == expected
+    assert all_spans(actual) == all_spans(expected)
+
+
+def test_reparse_reuses_later_statements():
+    program = parse(_REPARSE_SOURCE)
+    actual = reparse(program, _REPARSE_SOURCE, TextEdit(5, 0, 5, 1, "x"))
+    assert actual.statements[3] is not program.statements[3]
+    assert actual.statements[5:] == program.statements[5:]
+    assert all(a is b for a, b in zip(actual.statements[5:], program.statements[5:]))
+    # A series of edits stays consistent with the text.
+    source = _REPARSE_SOURCE
+    for edit in [TextEdit(4, 0, 4, 0, "\n"), TextEdit(12, 0, 12, 0, "reset q;\n")]:
+        actual = reparse(actual, source, edit)
+        source = edit.apply(source)
+        assert all_spans(actual) == all_spans(parse(source))
+
+
+def test_reparse_errors_match_parse():
+    program = parse(_REPARSE_SOURCE)
+    edit = TextEdit(5, 6, 5, 7, "")
+    with pytest.raises(QASM3ParsingError) as expected:
+        parse(edit.apply(_REPARSE_SOURCE))
+    with pytest.raises(QASM3ParsingError) as actual:
+        reparse(program, _REPARSE_SOURCE, edit)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_text_edit_apply():
+    assert TextEdit(1, 1, 2, 1, "X").apply("abc\ndef\n") == "aXef\n"
+    assert TextEdit(3, 0, 3, 0, "x;").apply("a\nb\n") == "a\nb\nx;"
+    with pytest.raises(ValueError):
+        TextEdit(4, 0, 4, 0, "").apply("a\n")
+    with pytest.raises(ValueError):
+        TextEdit(1, 3, 1, 2, "").apply("abc\n")
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_share_subtrees(fast_path):
+    source = "qubit[2] q; rz(pi / 2) q[0]; rz(pi / 2) q[0]; x q[1]; float[64] a = pi / 2;"
+    program = parse(source, spans="none", fast_path=fast_path, share_subtrees=True)
+    assert program == parse(source)
+    first, second, third, declaration = program.statements[1:]
+    assert first is not second
+    assert first.arguments[0] is second.arguments[0] is declaration.init_expression
+    assert first.qubits[0] is second.qubits[0]
+    assert first.qubits[0] is not third.qubits[0]
+    with pytest.raises(ValueError, match="subtrees can only be shared if their spans"):
+        parse(source, share_subtrees=True)
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_identifier_names_are_interned(fast_path):
+    first = parse("qubit[2] q; x q[0]; x $1;", fast_path=fast_path)
+    second = parse("qubit[2] q; x q[1]; x $1;", fast_path=fast_path)
+    assert first.statements[1].name.name is second.statements[1].name.name
+    assert first.statements[1].qubits[0].name.name is second.statements[1].qubits[0].name.name
+    assert first.statements[2].qubits[0].name is second.statements[2].qubits[0].name
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_share_identifiers(fast_path):
+    source = "qubit[2] q; rz(pi) q[0]; rz(pi) q[1]; x $0; x $0; for int i in [0:1] { x q[i]; }"
+    program = parse(source, spans="none", fast_path=fast_path, share_identifiers=True)
+    assert program == parse(source)
+    declaration, first, second, third, fourth, loop = program.statements
+    assert first.name is second.name
+    assert first.arguments[0] is second.arguments[0]
+    assert first.qubits[0] is not second.qubits[0]
+    assert first.qubits[0].name is second.qubits[0].name is declaration.qubit
+    assert third.qubits[0] is fourth.qubits[0]
+    assert loop.block[0].qubits[0].name is declaration.qubit
+    assert loop.block[0].qubits[0].indices[0][0] is loop.identifier
+    with pytest.raises(ValueError, match="identifiers can only be shared if their spans"):
+        parse(source, share_identifiers=True)
+    with pytest.raises(ValueError, match="identifiers can only be shared if their spans"):
+        QASMNodeVisitor(spans="lazy", identifiers={})
@@ -0,0 +1,314 @@
+import dataclasses
+import io
+import json
+import mmap
+import os
+import subprocess
+import sys
+
+import pytest
+
+import openqasm3
+from openqasm3 import ast
+from openqasm3.serialize import (
+    dump_binary,
+    dump_json,
+    from_dict,
+    load_binary,
+    load_json,
+    to_dict,
+)
+from openqasm3.serialize import _json_dumps_iteratively
+
+from ._helpers import all_spans
+
+PROGRAM = """
+OPENQASM 3.0;
+include "stdgates.inc";
+input angle[16] theta;
+qubit[2] q;
+bit[2] c;
+@bind q
+@reversible
+gate g(a) x, y { ctrl @ inv @ rz(-a / 2) x, y; }
+switch (c) { case 1, 2 { g(theta) q[0], q[1]; } default { reset q; } }
+const float f = 1.5e-3 + 2.5im;
+duration d = 10ns;
+bool b = !true || false;
+c[0] = measure q[0];
+int i = -12345678901234567890 + 0x7f;
+defcal rx(angle[20] a) $0 { arbitrary body }
+#pragma the rest of the line
+"""
+
+
+def _assert_identical(actual, expected):
+    assert actual == expected
+    assert all_spans(actual) == all_spans(expected)
+
+
+def test_round_trip_program():
+    program = openqasm3.parse(PROGRAM)
+    loaded = load_binary(dump_binary(program))
+    _assert_identical(loaded, program)
+    annotations = [[a.keyword for a in s.annotations] for s in loaded.statements[:-1]]
+    assert annotations == [[], [], [], [], ["bind", "reversible"]] + [[]] * 7
+    assert isinstance(loaded.statements[5].cases[0], tuple)
+    assert openqasm3.dumps(loaded) == openqasm3.dumps(program)
+
+
+def test_round_trip_examples(parsed_example):
+    _assert_identical(load_binary(dump_binary(parsed_example.ast)), parsed_example.ast)
+
+
+def test_round_trip_values():
+    values = [
+        ast.IntegerLiteral(0),
+        ast.IntegerLiteral(-1),
+        ast.IntegerLiteral(2**100),
+        ast.IntegerLiteral(-(2**100)),
+        ast.FloatLiteral(-0.0),
+        ast.FloatLiteral(float("inf")),
+        ast.BooleanLiteral(True),
+        ast.BooleanLiteral(False),
+        ast.Identifier("\N{GREEK SMALL LETTER THETA}\udc80"),
+        ast.DurationLiteral(1.5, ast.TimeUnit.dt),
+        ast.BitstringLiteral(5, 8),
+    ]
+    values[0].span = ast.Span(1_000_000, 2_000, 1_000_001, 0)
+    loaded = load_binary(dump_binary(values))
+    _assert_identical(loaded, values)
+    assert [type(node.value) for node in loaded[:8]] == [int] * 4 + [float] * 2 + [bool] * 2
+    assert str(loaded[4].value) == "-0.0"
+
+
+def test_strings_are_shared():
+    program = load_binary(dump_binary(openqasm3.parse("qubit q; h q; x q; y q;")))
+    names = [statement.qubits[0].name for statement in program.statements[1:]]
+    assert names == ["q", "q", "q"]
+    assert names[0] is names[1] is names[2] is program.statements[0].qubit.name
+
+
+def test_load_from_buffers(tmp_path):
+    program = openqasm3.parse(PROGRAM)
+    data = dump_binary(program)
+    _assert_identical(load_binary(bytearray(data)), program)
+    _assert_identical(load_binary(memoryview(data)), program)
+    _assert_identical(load_binary(memoryview(b"padding" + data)[7:]), program)
+    path = tmp_path / "program.bin"
+    path.write_bytes(data)
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            _assert_identical(load_binary(mapped), program)
+            # No views into the map are left behind, so it can be closed.
+            mapped.close()
+
+
+def test_round_trip_deep_tree():
+    depth = 3 * sys.getrecursionlimit()
+    expression = ast.Identifier("x")
+    for _ in range(depth):
+        expression = ast.UnaryExpression(ast.UnaryOperator["-"], expression)
+    loaded = load_binary(dump_binary(expression))
+    for _ in range(depth):
+        assert loaded.op is ast.UnaryOperator["-"]
+        loaded = loaded.expression
+    assert loaded == ast.Identifier("x")
+
+
+def test_round_trip_unusual_spans():
+    spans = [
+        ast.Span(5, 3, 2, 1),
+        ast.Span(300, 200, 1, 0),
+        ast.Span(-1, -70, -1000, -2),
+        ast.Span(0, 0, 2**70, 2**70),
+    ]
+    nodes = []
+    for span in spans:
+        node = ast.Identifier("x")
+        node.span = span
+        nodes.append(node)
+    program = ast.Program(statements=[ast.QubitDeclaration(node, None) for node in nodes])
+    _assert_identical(load_binary(dump_binary(program)), program)
+
+
+def test_invalid_data_is_rejected():
+    data = dump_binary(openqasm3.parse(PROGRAM))
+    with pytest.raises(ValueError, match="not a serialized AST"):
+        load_binary(b"OQ3" + data[4:])
+    with pytest.raises(ValueError, match="format version"):
+        load_binary(data[:4] + b"\x7f" + data[5:])
+    with pytest.raises(ValueError, match="truncated"):
+        load_binary(data[:50])
+    with pytest.raises(ValueError):
+        load_binary(data[:-1])
+    with pytest.raises(ValueError):
+        load_binary(data + data[-1:])
+    renamed = data.replace(b"QuantumGateDefinition", b"QuantumGateDefinitioN")
+    with pytest.raises(ValueError, match="unknown type 'QuantumGateDefinitioN'"):
+        load_binary(renamed)
+
+
+def test_unsupported_values_are_rejected():
+    @dataclasses.dataclass
+    class Custom(ast.Expression):
+        pass
+
+    with pytest.raises(TypeError, match="not in openqasm3.ast"):
+        dump_binary(ast.ExpressionStatement(Custom()))
+    with pytest.raises(TypeError, match="type 'complex'"):
+        dump_binary(ast.FloatLiteral(1j))  # type: ignore[arg-type]
+
+
+def test_round_trip_slotted_build():
+    script = f"""
+import openqasm3
+from openqasm3 import ast
+from openqasm3.serialize import (
+    dump_binary,
+    dump_json,
+    from_dict,
+    load_binary,
+    load_json,
+    to_dict,
+)
+from openqasm3.serialize import _json_dumps_iteratively
+assert ast.SLOTTED
+program = openqasm3.parse({PROGRAM!r})
+loaded = load_binary(dump_binary(program))
+assert loaded == program
+assert openqasm3.dumps(loaded) == openqasm3.dumps(program)
+assert loaded.statements[0].span == program.statements[0].span
+"""
+    env = {**os.environ, "OPENQASM3_SLOTTED_AST": "1"}
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+
+def test_dict_round_trip_examples(parsed_example):
+    program = parsed_example.ast
+    data = to_dict(program)
+    _assert_identical(from_dict(json.loads(json.dumps(data))), program)
+    stream = io.StringIO()
+    dump_json(program, stream)
+    assert json.loads(stream.getvalue()) == data
+    stream.seek(0)
+    _assert_identical(load_json(stream), program)
+
+
+def test_dict_form():
+    program = openqasm3.parse(PROGRAM)
+    data = to_dict(program)
+    _assert_identical(from_dict(json.loads(json.dumps(data))), program)
+    assert data["_type"] == "Program"
+    assert data["span"] == [2, 0, 17, 8]
+    switch = data["statements"][5]
+    assert switch["_type"] == "SwitchStatement"
+    values, block = switch["cases"][0]
+    assert [value["value"] for value in values] == [1, 2]
+    assert block["_type"] == "CompoundStatement"
+    assert isinstance(from_dict(switch).cases[0], tuple)
+    modifiers = data["statements"][4]["body"][0]["modifiers"]
+    assert [modifier["modifier"] for modifier in modifiers] == ["ctrl", "inv"]
+    duration = data["statements"][7]["init_expression"]
+    assert (duration["value"], duration["unit"]) == (10, "ns")
+    assert to_dict(ast.Identifier("x")) == {"_type": "Identifier", "span": None, "name": "x"}
+
+
+def test_from_dict_defaults_and_errors():
+    program = from_dict({"_type": "Program", "statements": []})
+    assert program == ast.Program(statements=[])
+    assert program.span is None and program.version is None
+    # Mutable defaults are not shared between nodes.
+    declaration = {
+        "_type": "QubitDeclaration",
+        "qubit": {"_type": "Identifier", "name": "q"},
+    }
+    first, second = from_dict(declaration), from_dict(declaration)
+    assert first == ast.QubitDeclaration(ast.Identifier("q"), None)
+    assert first.annotations is not second.annotations
+    with pytest.raises(ValueError, match="missing field 'name' of 'Identifier'"):
+        from_dict({"_type": "Identifier"})
+    with pytest.raises(ValueError, match="unknown node type 'Span'"):
+        from_dict({"_type": "Span"})
+    with pytest.raises(ValueError, match="'_type' key"):
+        from_dict({"name": "x"})
+    with pytest.raises(ValueError, match="invalid value for 'UnaryExpression.op'"):
+        from_dict(
+            {
+                "_type": "UnaryExpression",
+                "op": "+",
+                "expression": {"_type": "Identifier", "name": "x"},
+            }
+        )
+
+
+def test_dict_round_trip_deep_tree():
+    depth = 3 * sys.getrecursionlimit()
+    expression = ast.Identifier("x")
+    for i in range(depth):
+        expression = ast.BinaryExpression(
+            ast.BinaryOperator["+"], expression, ast.IntegerLiteral(i)
+        )
+    data = to_dict(expression)
+    assert dump_binary(from_dict(data)) == dump_binary(expression)
+    stream = io.StringIO()
+    dump_json(expression, stream)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(10 * depth)
+    try:
+        assert stream.getvalue() == json.dumps(data)
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{}, {"indent": 2}, {"indent": "\t"}, {"separators": (",", ":")}, {"sort_keys": True}],
+)
+def test_json_layout_without_recursion(kwargs):
+    data = to_dict(openqasm3.parse(PROGRAM))
+    data["statements"].append({"empty": [], "also_empty": {}})
+    assert _json_dumps_iteratively(data, **kwargs) == json.dumps(data, **kwargs)
+
+
+def test_dump_json_writes_one_statement_at_a_time():
+    class Recorder(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.writes = []
+
+        def write(self, s):
+            self.writes.append(s)
+            return super().write(s)
+
+    program = openqasm3.parse(PROGRAM)
+    stream = Recorder()
+    dump_json(program, stream, indent=1)
+    statements = [json.dumps(to_dict(statement), indent=1) for statement in program.statements]
+    assert all(statement in stream.writes for statement in statements)
+    assert json.loads(stream.getvalue()) == to_dict(program)
+    stream = io.StringIO()
+    dump_json(program.statements[0], stream)
+    assert json.loads(stream.getvalue()) == to_dict(program.statements[0])
+    empty = io.StringIO()
+    dump_json(ast.Program(statements=[]), empty)
+    assert from_dict(json.loads(empty.getvalue())) == ast.Program(statements=[])
+
+
+def test_round_trip_comments():
+    source = "// leading\nOPENQASM 3.0; // version\nqubit q; // trailing\nh q;\n/* last */\n"
+    program = openqasm3.parse(source, comments=True)
+    assert program.comments and program.version_comments
+    stream = io.StringIO()
+    dump_json(program, stream)
+    stream.seek(0)
+    for loaded in (
+        load_json(stream),
+        from_dict(to_dict(program)),
+        load_binary(dump_binary(program)),
+    ):
+        _assert_identical(loaded, program)
+        assert loaded.comments == program.comments
+        assert loaded.version_comments == program.version_comments
+        assert [s.comments for s in loaded.statements] == [s.comments for s in program.statements]
+        assert openqasm3.dumps(loaded) == openqasm3.dumps(program)
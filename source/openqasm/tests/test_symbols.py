@@ -0,0 +1,177 @@
+import pytest
+
+import openqasm3
+from openqasm3 import ast
+from openqasm3.symbols import SymbolKind, SymbolTable
+from openqasm3.visitor import walk
+
+PROGRAM = """
+OPENQASM 3.0;
+include "stdgates.inc";
+const int n = 2;
+qubit[n] q;
+bit[n] c;
+input float theta;
+extern get(int) -> int;
+gate g(a) x { U(a, 0, pi) x; }
+def f(int[32] k, qubit r) -> bit {
+    int m = k + get(n);
+    if (m > n) { let s = r; }
+    return measure r;
+}
+for int i in [0:n - 1] {
+    g(theta) q[i];
+    c[i] = f(i, q[i]);
+}
+if (c[0]) { int n = 3; x q[n]; } else { x q[n]; }
+"""
+
+
+def _uses(table, name):
+    """The names of the declaring nodes of the identifiers called ``name``, in order."""
+    out = []
+    for node in walk(table.program):
+        if isinstance(node, ast.Identifier) and node.name == name:
+            symbol = table.lookup(node)
+            out.append(None if symbol is None else symbol.kind)
+    return out
+
+
+def test_declarations():
+    table = SymbolTable(openqasm3.parse(PROGRAM))
+    assert [(symbol.kind, symbol.name) for symbol in table] == [
+        (SymbolKind.CONST, "n"),
+        (SymbolKind.QUBIT, "q"),
+        (SymbolKind.CLASSICAL, "c"),
+        (SymbolKind.IO, "theta"),
+        (SymbolKind.EXTERN, "get"),
+        (SymbolKind.GATE, "g"),
+        (SymbolKind.ARGUMENT, "a"),
+        (SymbolKind.ARGUMENT, "x"),
+        (SymbolKind.SUBROUTINE, "f"),
+        (SymbolKind.ARGUMENT, "k"),
+        (SymbolKind.ARGUMENT, "r"),
+        (SymbolKind.CLASSICAL, "m"),
+        (SymbolKind.ALIAS, "s"),
+        (SymbolKind.LOOP_VARIABLE, "i"),
+        (SymbolKind.CLASSICAL, "n"),
+    ]
+    assert len(table) == 15
+    program = table.program
+    for symbol in table:
+        assert table.lookup(symbol.identifier) is symbol
+        assert symbol.scope.symbols[symbol.name] is symbol
+    gate = table.global_scope.symbols["g"]
+    assert gate.node is program.statements[6]
+    assert gate.uses == [program.statements[8].block[0].name]
+    assert table.global_scope.lookup("g") is gate
+    assert table.global_scope.lookup("m") is None
+    subroutine = program.statements[7]
+    assert table.lookup(subroutine.arguments[0].name).node is subroutine.arguments[0]
+    assert [identifier.name for identifier in table.unresolved] == ["U", "pi", "x", "x"]
+
+
+def test_scopes():
+    table = SymbolTable(openqasm3.parse(PROGRAM))
+    program = table.program
+    assert table.scopes[0] is table.global_scope
+    assert table.global_scope.node is program
+    assert [(type(scope.node).__name__, scope.definition) for scope in table.scopes[1:]] == [
+        ("QuantumGateDefinition", True),
+        ("SubroutineDefinition", True),
+        ("BranchingStatement", False),
+        ("BranchingStatement", False),
+        ("ForInLoop", False),
+        ("BranchingStatement", False),
+        ("BranchingStatement", False),
+    ]
+    # The inner `n` shadows the constant in the if block, but not in the else block.
+    if_block, else_block = program.statements[-1].if_block, program.statements[-1].else_block
+    inner = table.lookup(if_block[1].qubits[0].indices[0][0])
+    assert inner.kind is SymbolKind.CLASSICAL and inner.scope is table.scopes[-2]
+    assert table.lookup(else_block[0].qubits[0].indices[0][0]).kind is SymbolKind.CONST
+    assert table.global_scope.symbols["n"].uses[-1] is else_block[0].qubits[0].indices[0][0]
+
+
+def test_definitions_only_see_global_constants_and_callables():
+    table = SymbolTable(
+        openqasm3.parse(
+            """
+            int k = 1;
+            qubit q;
+            const int n = 2;
+            def f() { x q; int m = k + n; f(); }
+            gate g a { g a; h q; }
+            """
+        )
+    )
+    assert _uses(table, "q") == [SymbolKind.QUBIT, None, None]
+    assert _uses(table, "k") == [SymbolKind.CLASSICAL, None]
+    assert _uses(table, "n") == [SymbolKind.CONST, SymbolKind.CONST]
+    assert _uses(table, "f") == [SymbolKind.SUBROUTINE, SymbolKind.SUBROUTINE]
+    assert _uses(table, "g") == [SymbolKind.GATE, SymbolKind.GATE]
+
+
+def test_names_are_declared_after_their_initializers():
+    table = SymbolTable(
+        openqasm3.parse("int x = 1; { int x = x + 1; let y = y; } x = y; int z = z;")
+    )
+    inner = table.scopes[1].symbols["x"]
+    outer = table.global_scope.symbols["x"]
+    assert outer.uses == [
+        table.program.statements[1].statements[0].init_expression.lhs,
+        table.program.statements[2].lvalue,
+    ]
+    assert inner.uses == []
+    assert [identifier.name for identifier in table.unresolved] == ["y", "y", "z"]
+
+
+@pytest.mark.parametrize(
+    "source, names",
+    [
+        pytest.param(
+            "switch (1) { case 0 { int a; a = 1; } default { a = 2; } }", ["a", None], id="switch"
+        ),
+        pytest.param("box { int a; a = 1; } a = 2;", ["a", None], id="box"),
+        pytest.param(
+            "duration d = durationof({ int a; a = 1; }); a = 2;", ["a", None], id="durationof"
+        ),
+        pytest.param("while (true) { int a; a = 1; } a = 2;", ["a", None], id="while"),
+        pytest.param(
+            "defcal rx(angle[20] t) q { } defcal rx(angle[20] t) $0 { }",
+            [None, None],
+            id="defcal",
+        ),
+    ],
+)
+def test_block_scopes(source, names):
+    table = SymbolTable(openqasm3.parse(source))
+    assigned = [
+        node.lvalue for node in walk(table.program) if isinstance(node, ast.ClassicalAssignment)
+    ]
+    if assigned:
+        assert [
+            None if table.lookup(lvalue) is None else table.lookup(lvalue).name
+            for lvalue in assigned
+        ] == names
+    else:
+        assert [symbol.name for symbol in table] == ["t", "q", "t"]
+        assert [identifier.name for identifier in table.unresolved] == ["rx", "rx", "$0"]
+
+
+def test_deep_expression():
+    expression = ast.Identifier("a")
+    for _ in range(9_999):
+        expression = ast.BinaryExpression(ast.BinaryOperator["+"], expression, ast.Identifier("a"))
+    program = openqasm3.parse("int a = 0; int b;")
+    program.statements[1].init_expression = expression
+    table = SymbolTable(program)
+    assert len(table.global_scope.symbols["a"].uses) == 10_000
+
+
+def test_examples(parsed_example):
+    table = SymbolTable(parsed_example.ast)
+    identifiers = [node for node in walk(parsed_example.ast) if isinstance(node, ast.Identifier)]
+    resolved = [identifier for identifier in identifiers if table.lookup(identifier) is not None]
+    assert len(resolved) + len(table.unresolved) == len(identifiers)
+    assert len(resolved) == len(table) + sum(len(symbol.uses) for symbol in table)
@@ -0,0 +1,320 @@
+import copy
+import pickle
+import sys
+from typing import List
+
+import pytest
+
+import openqasm3
+from openqasm3 import ast
+from openqasm3.visitor import IterativeVisitor, NodeIndex, QASMTransformer, QASMVisitor, walk
+from openqasm3.visitor import _mark_stale
+
+PROGRAM = """
+OPENQASM 3.0;
+qubit[2] q;
+@ann
+if (true) { cx q[0], q[1]; } else { x q[0]; }
+int a = 1 + b;
+"""
+
+
+class IdentifierNames(QASMVisitor):
+    def __init__(self):
+        self.names = []
+
+    def visit_Identifier(self, node):
+        self.names.append(node.name)
+
+
+class IdentifierNamesWithContext(QASMVisitor[list]):
+    def visit_Identifier(self, node, context):
+        context.append(node.name)
+
+
+class GateNames(IdentifierNames):
+    def visit_QuantumGate(self, node):
+        self.names.append("gate " + node.name.name)
+
+
+class StaticVisitor(QASMVisitor):
+    names: List[str] = []
+
+    @staticmethod
+    def visit_Identifier(node):
+        StaticVisitor.names.append(node.name)
+
+
+def test_visitor_dispatches_on_node_class():
+    program = openqasm3.parse(PROGRAM)
+    visitor = IdentifierNames()
+    visitor.visit(program)
+    assert visitor.names == ["q", "cx", "q", "q", "x", "q", "a", "b"]
+    # The cache of each visitor class is separate from its base class's.
+    visitor = GateNames()
+    visitor.visit(program)
+    assert visitor.names == ["q", "gate cx", "gate x", "a", "b"]
+    visitor = IdentifierNames()
+    visitor.visit(program)
+    assert visitor.names == ["q", "cx", "q", "q", "x", "q", "a", "b"]
+
+
+def test_visitor_passes_context():
+    names = ["start"]
+    IdentifierNamesWithContext().visit(openqasm3.parse(PROGRAM), names)
+    assert names == ["start", "q", "cx", "q", "q", "x", "q", "a", "b"]
+
+
+def test_visitor_supports_static_methods():
+    StaticVisitor.names.clear()
+    StaticVisitor().visit(openqasm3.parse(PROGRAM))
+    assert StaticVisitor.names == ["q", "cx", "q", "q", "x", "q", "a", "b"]
+
+
+def test_visitor_uses_methods_assigned_to_the_instance():
+    program = openqasm3.parse(PROGRAM)
+    # Fill the class's cache before overriding the methods on an instance.
+    IdentifierNames().visit(program)
+    visitor = IdentifierNames()
+    visitor.visit_Identifier = lambda node: visitor.names.append(node.name.upper())
+    visitor.visit_BinaryExpression = lambda node: visitor.names.append("binary")
+    visitor.visit(program)
+    assert visitor.names == ["Q", "CX", "Q", "Q", "X", "Q", "A", "binary"]
+    # An instance's generic_visit replaces the class's for nodes without their own method.
+    visitor = IdentifierNames()
+    visitor.generic_visit = lambda node: visitor.names.append(type(node).__name__)
+    visitor.visit(program)
+    assert visitor.names == ["Program"]
+    # Other instances still use the class's methods.
+    visitor = IdentifierNames()
+    visitor.visit(program)
+    assert visitor.names == ["q", "cx", "q", "q", "x", "q", "a", "b"]
+
+
+def test_visitor_visits_annotations():
+    class Keywords(QASMVisitor):
+        def __init__(self):
+            self.keywords = []
+
+        def visit_Annotation(self, node):
+            self.keywords.append(node.keyword)
+
+    visitor = Keywords()
+    visitor.visit(openqasm3.parse(PROGRAM))
+    assert visitor.keywords == ["ann"]
+
+
+def test_transformer_replaces_and_removes_nodes():
+    class Transform(QASMTransformer):
+        def visit_Identifier(self, node):
+            return ast.Identifier(node.name.upper())
+
+        def visit_QuantumGate(self, node):
+            if node.name.name == "x":
+                return None
+            return self.generic_visit(node)
+
+        def visit_ClassicalDeclaration(self, node):
+            return [node, ast.ExpressionStatement(ast.Identifier("c"))]
+
+    program = Transform().visit(openqasm3.parse(PROGRAM))
+    expected = openqasm3.parse(
+        """
+        OPENQASM 3.0;
+        qubit[2] Q;
+        @ann
+        if (true) { CX Q[0], Q[1]; } else { }
+        int a = 1 + b;
+        c;
+        """
+    )
+    assert program == expected
+
+
+def _deep_chain(depth):
+    chain = ast.Identifier("x0")
+    for i in range(1, depth):
+        chain = ast.BinaryExpression(ast.BinaryOperator["+"], chain, ast.Identifier(f"x{i}"))
+    return chain
+
+
+def test_walk_is_preorder():
+    program = openqasm3.parse("qubit[2] q; x q[1 + 2][3]; switch (i) { case 1, 2 { y q; } }")
+    names = [type(node).__name__ for node in walk(program)]
+    assert names == [
+        "Program",
+        "QubitDeclaration",
+        "Identifier",
+        "IntegerLiteral",
+        "QuantumGate",
+        "Identifier",
+        "IndexedIdentifier",
+        "Identifier",
+        "BinaryExpression",
+        "IntegerLiteral",
+        "IntegerLiteral",
+        "IntegerLiteral",
+        "SwitchStatement",
+        "Identifier",
+        "IntegerLiteral",
+        "IntegerLiteral",
+        "CompoundStatement",
+        "QuantumGate",
+        "Identifier",
+        "Identifier",
+    ]
+
+
+def test_walk_handles_deep_trees():
+    depth = 3 * sys.getrecursionlimit()
+    identifiers = [
+        node.name for node in walk(_deep_chain(depth)) if isinstance(node, ast.Identifier)
+    ]
+    assert identifiers == [f"x{i}" for i in range(depth)]
+
+
+def test_iterative_visitor_pre_and_post_order():
+    class Events(IterativeVisitor[list]):
+        def visit_BinaryExpression(self, node, context):
+            context.append("enter")
+            lhs = yield node.lhs
+            context.append(node.op.name)
+            rhs = yield node.rhs
+            context.append("leave")
+            return f"({lhs} {node.op.name} {rhs})"
+
+        def visit_Identifier(self, node, context):
+            context.append(node.name)
+            return node.name
+
+    events = ["start"]
+    result = Events().visit(openqasm3.parse("a * (b + c);").statements[0], events)
+    assert result is None
+    assert events == ["start", "enter", "a", "*", "enter", "b", "+", "c", "leave", "leave"]
+    expression = openqasm3.parse("a * (b + c);").statements[0].expression
+    assert Events().visit(expression, ["start"]) == "(a * (b + c))"
+
+
+def test_iterative_visitor_handles_deep_trees():
+    class Depth(IterativeVisitor):
+        def generic_visit(self, node, context=None):
+            depth = 0
+            for child in super().generic_visit(node):
+                depth = max(depth, (yield child))
+            return depth + 1
+
+    depth = 3 * sys.getrecursionlimit()
+    assert Depth().visit(_deep_chain(depth)) == depth
+    assert Depth().visit(ast.Program(statements=[ast.ExpressionStatement(_deep_chain(depth))])) == (
+        depth + 2
+    )
+
+
+def test_node_index_finds_nodes_by_type():
+    program = openqasm3.parse(PROGRAM)
+    index = NodeIndex(program)
+    assert len(index) == len(list(walk(program)))
+    for node_type in (ast.QuantumGate, ast.Identifier, ast.Statement, ast.Expression, ast.QASMNode):
+        assert index.find_all(node_type) == [
+            node for node in walk(program) if isinstance(node, node_type)
+        ]
+        assert all(
+            a is b
+            for a, b in zip(
+                index.find_all(node_type),
+                (node for node in walk(program) if isinstance(node, node_type)),
+            )
+        )
+    assert index.find_all(ast.DelayInstruction) == []
+    # The result is a new list each time.
+    index.find_all(ast.QuantumGate).clear()
+    assert len(index.find_all(ast.QuantumGate)) == 2
+
+
+def test_node_index_parents():
+    program = openqasm3.parse(PROGRAM)
+    index = NodeIndex(program)
+    assert index.parent(program) is None
+    branch = program.statements[1]
+    gate = branch.if_block[0]
+    assert index.parent(gate) is branch
+    assert index.parent(gate.qubits[1].indices[0][0]) is gate.qubits[1]
+    assert list(index.ancestors(gate.name)) == [gate, branch, program]
+    with pytest.raises(KeyError, match="Identifier node is not in the index"):
+        index.parent(ast.Identifier("q"))
+
+
+def test_node_index_handles_deep_trees():
+    depth = 3 * sys.getrecursionlimit()
+    index = NodeIndex(_deep_chain(depth))
+    assert [node.name for node in index.find_all(ast.Identifier)] == [f"x{i}" for i in range(depth)]
+
+
+def test_program_find_all_keeps_index_until_transformed():
+    program = openqasm3.parse(PROGRAM)
+    gates = program.find_all(ast.QuantumGate)
+    index = program.index()
+    assert [gate.name.name for gate in gates] == ["cx", "x"]
+    assert program.index() is index and not index.stale
+
+    class RemoveX(QASMTransformer):
+        def visit_QuantumGate(self, node):
+            return None if node.name.name == "x" else node
+
+    RemoveX().visit(program)
+    assert index.stale
+    assert [gate.name.name for gate in program.find_all(ast.QuantumGate)] == ["cx"]
+    assert program.index() is not index
+
+    program.statements.pop(1)
+    assert len(program.find_all(ast.QuantumGate)) == 1
+    assert program.index(refresh=True).find_all(ast.QuantumGate) == []
+
+
+def test_index_is_stale_after_transformer_that_overrides_visit_program():
+    source = "qubit[2] q; h q[0]; cx q[0], q[1];"
+    program = openqasm3.parse(source)
+    other = openqasm3.parse(source)
+    assert len(program.find_all(ast.QuantumGate)) == 2
+    other_index = other.index()
+
+    class RemoveGates(QASMTransformer):
+        def visit_Program(self, node):
+            node.statements = [s for s in node.statements if not isinstance(s, ast.QuantumGate)]
+            return node
+
+    RemoveGates().visit(program)
+    assert program.find_all(ast.QuantumGate) == []
+    # Transforming one tree leaves the indexes of the others fresh.
+    assert not other_index.stale and other.index() is other_index
+
+    index = program.index()
+    QASMTransformer().visit(program.statements[0])
+    assert index.stale
+
+
+def test_transformer_checks_indexes_once_per_call(monkeypatch):
+    indexes = [openqasm3.parse("qubit q; h q;").index() for _ in range(200)]
+    program = openqasm3.parse(PROGRAM)
+    index = program.index()
+    calls = []
+    monkeypatch.setattr(
+        "openqasm3.visitor._mark_stale", lambda node: calls.append(_mark_stale(node))
+    )
+    transformer = QASMTransformer()
+    transformer.visit(program)
+    assert len(calls) == 1
+    assert index.stale
+    assert not any(other.stale for other in indexes)
+    transformer.visit(program.statements[0])
+    assert len(calls) == 2
+
+
+def test_program_index_is_not_copied():
+    program = openqasm3.parse(PROGRAM)
+    index = program.index()
+    for other in (copy.copy(program), copy.deepcopy(program), pickle.loads(pickle.dumps(program))):
+        assert other == program
+        assert other.index() is not index
+        assert other.index().root is other
+    assert "_index" not in repr(program)